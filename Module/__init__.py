@@ -10,14 +10,22 @@ This package provides:
 - Event planning functionality
 """
 
-from .models import Ingredient, Recipe, User
-from .repository import RecipeRepository
-from .vector_store import MockVectorStore
-from .scoring import ScoringEngine
-from .synthesizer import Synthesizer
-from .token_economy import TokenEconomy
-from .event_planner import EventPlanner
-from .controller import KitchenMind
+import importlib
+
+# Exports load on first attribute access (PEP 562), so scripts that only need
+# Module.database do not pay for the synthesizer and its model dependencies.
+_EXPORTS = {
+    'Ingredient': '.models',
+    'Recipe': '.models',
+    'User': '.models',
+    'RecipeRepository': '.repository',
+    'MockVectorStore': '.vector_store',
+    'ScoringEngine': '.scoring',
+    'Synthesizer': '.synthesizer',
+    'TokenEconomy': '.token_economy',
+    'EventPlanner': '.event_planner',
+    'KitchenMind': '.controller',
+}
 
 __version__ = '1.0.0'
 __author__ = 'KitchenMind Team'
@@ -34,3 +42,16 @@ __all__ = [
     'EventPlanner',
     'KitchenMind',
 ]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,5 +1,4 @@
 import os
-import openai
 
 # Utility to call OpenAI for recipe validation
 
@@ -10,6 +9,7 @@ def ai_validate_recipe(recipe_title, ingredients, steps, api_key=None):
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OpenAI API key not set in environment.")
+    import openai  # heavy; only load it when a validation actually runs
     openai.api_key = api_key
 
     prompt = f"""
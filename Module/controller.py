@@ -3,8 +3,9 @@ Main controller for the KitchenMind system.
 Orchestrates all components: recipes, users, synthesis, validation, etc.
 """
 
+import copy
 import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 from .models import User, Recipe, Ingredient
 
 # --- Robust Recipe dataclass conversion utility ---
@@ -79,6 +80,14 @@ from .scoring import ScoringEngine
 from .synthesizer import Synthesizer
 from .token_economy import TokenEconomy
 from .event_planner import EventPlanner
+from .model_pool import DEFAULT_MODEL_NAME
+from .synthesis_cache import get_synthesis_cache, synthesis_cache_key
+from .synthesis_workers import get_synthesis_workers
+from .synthesis_stream import current_stream
+from .prompt_batch import current_prompt_batch, run_batched
+from .synthesis_deadline import DEADLINE_CACHE_LATE, LATENCY_BUDGET_MS, is_deadline_fallback
+from .dish_aggregates import INGREDIENT_PROFILE, PROFILE_DISH, consensus_profile
+from .synthesis_pipeline import ENGINE_AUTO, ENGINE_RULES, FALLBACK, engine_name
 
 
 class KitchenMind:
@@ -91,9 +100,24 @@ class KitchenMind:
         self.vstore = MockVectorStore()
         self.scorer = ScoringEngine()
         self.synth = Synthesizer()
+        self.llm_model = DEFAULT_MODEL_NAME
+        self.synthesis_cache = get_synthesis_cache()
+        self.synthesis_workers = get_synthesis_workers()
         self.tokens = TokenEconomy()
         self.users: Dict[str, User] = {}
 
+    def _synthesize(self, sources: List[Recipe], servings: int, **kwargs) -> Recipe:
+        """Synthesizer.synthesize, in a worker process when KITCHENMIND_SYNTH_WORKERS is set.
+
+        A streamed or batched synthesis stays in this process: its events and its prompt cannot cross
+        the process boundary.
+        """
+        if self.synthesis_workers.enabled and not current_stream().enabled and not current_prompt_batch().enabled:
+            # the worker still honours the deadline, but a late result cannot call back across processes
+            kwargs.pop('on_late_result', None)
+            return self.synthesis_workers.synthesize(sources, servings, **kwargs)
+        return self.synth.synthesize(sources, servings, **kwargs)
+
     def create_user(self, username: str, role: str = 'user') -> User:
         """Create a new user with specified role (user, trainer, admin)."""
         if role not in ['user', 'trainer', 'admin']:
@@ -262,12 +286,18 @@ class KitchenMind:
         
         return suggestions
 
-    def request_recipe(self, user: User, dish_name: str, servings: int = 2, top_k: int = 10, reorder: bool = True, ingredients: list = None, steps: list = None) -> Recipe:
-        """Request a synthesized recipe for a specific dish and serving size, optionally with custom ingredients."""
+    def request_recipe(self, user: User, dish_name: str, servings: int = 2, top_k: int = 10, reorder: bool = True, ingredients: list = None, steps: list = None, trace: Optional[bool] = None, deadline_ms: Optional[float] = None, engine: Optional[str] = None) -> Recipe:
+        """Request a synthesized recipe for a specific dish and serving size, optionally with custom ingredients.
+
+        trace=True attaches the synthesizer's decision trace to metadata['trace'] (bypassing the synthesis cache).
+        deadline_ms is the latency budget of the model (default KITCHENMIND_LATENCY_BUDGET_MS, 0 = wait).
+        engine is 'rules', 'llm' or 'auto' (default KITCHENMIND_SYNTH_ENGINE).
+        """
         if not user:
             raise ValueError("User cannot be None")
         if servings <= 0:
             raise ValueError("Servings must be positive")
+        engine = engine_name(engine)
 
         # Use clean dish name without prefix
         print(f"[DEBUG] dish_name: '{dish_name}', servings: {servings}, created_by: {getattr(user, 'user_id', None)}")
@@ -304,17 +334,23 @@ class KitchenMind:
                 approved=False,
                 rejection_suggestions=[]
             )
-            synthesized = self.synth.synthesize([custom_recipe], servings, reorder=reorder)
-            synthesized = ensure_recipe_dataclass(synthesized)
-            synthesized.approved = False
-            synthesized.metadata['submitted_by_id'] = getattr(user, 'user_id', None)
-            self.recipes.add(synthesized)
-            self.vstore.index(synthesized)
-            self.tokens.reward_user_request(user, amount=0.25)
-            return synthesized
+            synthesized = self._synthesize([custom_recipe], servings, reorder=reorder, trace=trace, engine=engine)
+            return self._record_request(user, synthesized)
 
         # Otherwise, use the normal candidate search and synthesis
-        direct = [r for r in self.recipes.find_by_title(dish_name) if hasattr(r, 'approved') and r.approved]
+        candidates = self._candidates(dish_name, servings, top_k, self.recipes.find_by_title(dish_name))
+        top_n, kwargs, cache_key = self._plan_synthesis(dish_name, servings, candidates, reorder, trace, deadline_ms,
+                                                        engine)
+        synthesized = self.synthesis_cache.get_or_compute(
+            cache_key,
+            [r.id for r in top_n],
+            lambda: self._synthesize(top_n, servings, **kwargs),
+        )
+        return self._record_request(user, synthesized)
+
+    def _candidates(self, dish_name: str, servings: int, top_k: int, found_by_title: List[Recipe]) -> List[Recipe]:
+        """Approved recipes to synthesize dish_name from: title matches, else a vector-store search."""
+        direct = [r for r in found_by_title if hasattr(r, 'approved') and r.approved]
         candidates = []
         if direct:
             candidates = direct
@@ -332,6 +368,12 @@ class KitchenMind:
         named = [r for r in candidates if hasattr(r, 'title') and dish_name.lower() in r.title.lower()]
         if named:
             candidates = named
+        return candidates
+
+    def _plan_synthesis(self, dish_name: str, servings: int, candidates: List[Recipe], reorder: bool,
+                        trace: Optional[bool], deadline_ms: Optional[float] = None,
+                        engine: Optional[str] = None) -> Tuple[List[Recipe], Dict, Optional[Tuple]]:
+        """The sources, synthesize() keyword arguments and cache key for a request."""
         top_candidates = [ensure_recipe_dataclass(r) for r in candidates]
         for idx, r in enumerate(top_candidates):
             if not hasattr(r, 'ingredients'):
@@ -345,15 +387,116 @@ class KitchenMind:
         scored = [(r, self.scorer.score(r)) for r in top_candidates]
         scored.sort(key=lambda x: x[1], reverse=True)
         top_n = [r for r, _ in scored[:2]]
-        synthesized = self.synth.synthesize(top_n, servings, reorder=reorder)
+        # Better-scored sources count more in the merged ingredient quantities
+        weights = [score for _, score in scored[:2]]
+        # KITCHENMIND_INGREDIENT_PROFILE=dish: quantities from every approved version of the dish
+        profile = None
+        if INGREDIENT_PROFILE == PROFILE_DISH:
+            profile = consensus_profile(self.db_session, dish_name)
+        engine = engine_name(engine)
+        if engine == ENGINE_AUTO and not self.synthesis_workers.enabled:
+            # settle auto here (the pool remembers failed loads) so a rule-based recipe is not cached as the model's
+            path, _ = self.synth.resolve_engine(engine, self.llm_model)
+            if path == FALLBACK:
+                engine = ENGINE_RULES
+        model_key = ENGINE_RULES if engine == ENGINE_RULES else self.llm_model
+        # Versions are immutable, so the same sources/servings always synthesize the same recipe
+        # An explicitly traced request must actually run the pipeline, so it skips the cache
+        cache_key = None if trace else synthesis_cache_key(top_n, servings, reorder, model_key, weights, profile)
+        kwargs = dict(reorder=reorder, llm_model=self.llm_model, trace=trace, weights=weights,
+                      ingredient_profile=profile, engine=engine)
+        kwargs['deadline_ms'] = LATENCY_BUDGET_MS if deadline_ms is None else deadline_ms
+        if kwargs['deadline_ms'] and cache_key is not None and DEADLINE_CACHE_LATE:
+            # a generation that missed the deadline still answers the next request for the same sources
+            kwargs['on_late_result'] = lambda late: self.synthesis_cache.put(cache_key, [r.id for r in top_n], late)
+        return top_n, kwargs, cache_key
+
+    def _record_request(self, user: User, synthesized, commit: bool = True) -> Recipe:
+        """Store a synthesized recipe as the user's unapproved draft and reward the request."""
         synthesized = ensure_recipe_dataclass(synthesized)
         synthesized.approved = False
         synthesized.metadata['submitted_by_id'] = getattr(user, 'user_id', None)
-        self.recipes.add(synthesized)
-        self.vstore.index(synthesized)
+        # a deadline fallback is not stored as the draft: find_draft would serve it instead of the
+        # model's late result in the synthesis cache
+        if not is_deadline_fallback(synthesized):
+            self.recipes.add(synthesized, commit=commit)
+            self.vstore.index(synthesized)
         self.tokens.reward_user_request(user, amount=0.25)
         return synthesized
 
+    def request_recipes_batch(self, user: User, items: List[Tuple[str, int, Optional[str]]], top_k: int = 10,
+                              reorder: bool = True, trace: Optional[bool] = None) -> List[Union[Recipe, Exception]]:
+        """request_recipe for several (dish_name, servings, engine) at once.
+
+        Drafts and title matches are looked up with one query each, the syntheses run concurrently and
+        hand their prompts to the model as one batch (prompt_batch), identical requests are synthesized
+        once, and the new drafts are stored in one transaction. Returns, per item, the recipe or the
+        exception that item raised.
+        """
+        if not user:
+            raise ValueError("User cannot be None")
+        results: List[Union[Recipe, Exception, None]] = [None] * len(items)
+        user_id = getattr(user, 'user_id', None)
+        drafts = {}
+        if user_id is not None:
+            drafts = self.recipes.find_drafts(((d, s) for d, s, _ in items if s > 0), user_id)
+        found = self.recipes.find_by_titles(d for d, _, _ in items)
+
+        # identical requests (same cache key) are synthesized once
+        planned: Dict[object, Tuple] = {}  # cache key, or item index when uncached -> (key, sources, servings, kwargs, items)
+        for i, (dish_name, servings, engine) in enumerate(items):
+            if servings <= 0:
+                results[i] = ValueError("Servings must be positive")
+                continue
+            if (dish_name, servings) in drafts:
+                print(f"[DEBUG] Returning existing draft synthesized recipe: {drafts[(dish_name, servings)].id}")
+                results[i] = drafts[(dish_name, servings)]
+                continue
+            found_by_title = found.get(dish_name, [])
+            existing = [r for r in found_by_title if getattr(r, 'title', '').lower() == dish_name.lower()]
+            if existing:
+                print(f"[DEBUG] Returning existing recipe: {existing[0].id}")
+                results[i] = existing[0]
+                continue
+            try:
+                candidates = self._candidates(dish_name, servings, top_k, found_by_title)
+                top_n, kwargs, cache_key = self._plan_synthesis(dish_name, servings, candidates, reorder, trace,
+                                                                engine=engine)
+            except Exception as e:
+                results[i] = e
+                continue
+            plan = planned.setdefault(i if cache_key is None else cache_key, (cache_key, top_n, servings, kwargs, []))
+            plan[4].append(i)
+
+        def _job(cache_key, top_n, servings, kwargs):
+            return lambda: self.synthesis_cache.get_or_compute(
+                cache_key, [r.id for r in top_n], lambda: self._synthesize(top_n, servings, **kwargs))
+
+        plans = list(planned.values())
+        print(f"[DEBUG] request_recipes_batch: {len(items)} items, {len(plans)} syntheses")
+        outcomes = run_batched([_job(*plan[:4]) for plan in plans])
+        synthesized = []
+        for plan, outcome in zip(plans, outcomes):
+            for n, i in enumerate(plan[4]):
+                if isinstance(outcome, Exception):
+                    results[i] = outcome
+                    continue
+                # every item gets a recipe object of its own
+                results[i] = outcome if n == 0 else copy.deepcopy(outcome)
+                synthesized.append(i)
+
+        # one transaction for all drafts; a savepoint per item keeps one failed insert from losing the rest
+        for i in sorted(synthesized):
+            try:
+                with self.db_session.begin_nested():
+                    results[i] = self._record_request(user, results[i], commit=False)
+            except Exception as e:
+                print(f"[DEBUG] request_recipes_batch: could not record {items[i]}: {e}")
+                results[i] = e
+        if synthesized:
+            self.db_session.commit()
+        return results
+
     def rate_recipe(self, user: User, recipe_id: str, rating: float) -> Recipe:
         """Rate a recipe (1.0 to 5.0 stars)."""
         if not user:
@@ -281,6 +281,12 @@ class Step(Base):
     step_order = Column(Integer)
     instruction = Column(Text)
     minutes = Column(Integer)
+    # Precomputed synthesis features (Module/step_features.py)
+    canonical_text = Column(Text)
+    phase = Column(String)
+    fingerprint = Column(Text)
+    temperature = Column(String)
+    features_version = Column(Integer)
     version = relationship("RecipeVersion", back_populates="steps")
 
 class Validation(Base):
@@ -346,6 +352,28 @@ class RecipeScore(Base):
 
 
 
+class DishIngredientAggregate(Base):
+    """Running per-serving totals of one canonical ingredient over a dish's approved versions (dish_aggregates.py)."""
+    __tablename__ = "dish_ingredient_aggregates"
+    dish_key = Column(String, primary_key=True)
+    ingredient = Column(String, primary_key=True)  # canonical name, lowercase
+    dimension = Column(String, primary_key=True)  # canonical unit: g, ml, pc or the raw unit
+    name = Column(String)
+    total = Column(Float, default=0.0)  # sum of per-serving quantities in the canonical unit
+    count = Column(Integer, default=0)
+    position_total = Column(Float, default=0.0)  # sum of the ingredient's list positions
+    unit_counts = Column(Text)  # JSON {raw unit: versions using it}
+
+
+class DishAggregateMember(Base):
+    """A version counted in its dish's aggregates, with what it added (so it can be taken out again)."""
+    __tablename__ = "dish_aggregate_members"
+    version_id = Column(String, primary_key=True)
+    dish_key = Column(String, index=True)
+    contributions = Column(Text)  # JSON list of [ingredient, name, dimension, per-serving quantity, unit, position]
+    added_at = Column(DateTime(timezone=True))
+
+
 class EventPlan(Base):
     __tablename__ = "event_plans"
     event_id = Column(String, primary_key=True)
@@ -0,0 +1,203 @@
+"""
+Per-dish ingredient aggregates, maintained incrementally.
+
+For every dish (keyed by its normalized name) the dish_ingredient_aggregates
+table keeps, per canonical ingredient and unit dimension, the running sum and
+count of per-serving quantities (in the canonical unit, see
+ingredient_merge), the sum of the ingredient's list positions and a histogram
+of the raw units used. A version is added when it is approved and taken out
+again when it is rejected or its recipe is deleted; dish_aggregate_members
+records what each counted version contributed, so both are idempotent and a
+removal subtracts exactly what was added even if the version's rows changed
+since.
+
+consensus_profile() reads a dish's consensus ingredient list (per serving)
+with one indexed query: for each ingredient the dimension most versions used,
+the mean quantity, reported in the raw unit if every version used the same
+one, else in the canonical unit, ordered by mean list position. With
+KITCHENMIND_INGREDIENT_PROFILE=dish the controller synthesizes with that
+profile instead of merging the two best-scored sources' ingredients; the
+default (sources) keeps the weighted merge of the chosen sources.
+
+Rebuild the tables from the latest version of every published recipe with
+`python -m Module.dish_aggregates --rebuild`.
+
+Configuration (environment):
+    KITCHENMIND_INGREDIENT_PROFILE   sources | dish
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from .database import DishAggregateMember, DishIngredientAggregate
+from .ingredient_merge import to_canonical
+from .models import Ingredient
+from .utils_time import get_india_time
+
+PROFILE_SOURCES = 'sources'
+PROFILE_DISH = 'dish'
+
+INGREDIENT_PROFILE = os.getenv("KITCHENMIND_INGREDIENT_PROFILE", PROFILE_SOURCES).strip().lower()
+
+
+def dish_key(dish_name: str) -> str:
+    return ' '.join((dish_name or '').lower().split())
+
+
+def _canonical_name(name: str) -> str:
+    from .synthesizer import Synthesizer
+    return Synthesizer.canonical_name(name).strip()
+
+
+def contributions(ingredients, servings) -> List[list]:
+    """[ingredient, name, dimension, per-serving quantity, unit, position] per ingredient of one version.
+
+    An ingredient listed twice in the same unit dimension is counted once, with the summed quantity.
+    """
+    if not servings or servings <= 0:
+        return []
+    rows: Dict[Tuple[str, str], list] = {}
+    for position, ing in enumerate(ingredients):
+        if ing.quantity is None:
+            continue
+        name = _canonical_name(ing.name)
+        dim, factor = to_canonical(ing.unit)
+        key = (name.lower(), dim)
+        row = rows.get(key)
+        if row is None:
+            rows[key] = [name.lower(), name, dim, ing.quantity / servings * factor, ing.unit, position]
+        else:
+            row[3] += ing.quantity / servings * factor
+    return list(rows.values())
+
+
+def _locked_row(db, key: str, ingredient: str, dim: str) -> Optional[DishIngredientAggregate]:
+    return (db.query(DishIngredientAggregate)
+            .filter_by(dish_key=key, ingredient=ingredient, dimension=dim)
+            .with_for_update().populate_existing().one_or_none())
+
+
+def _ensure_row(db, key: str, ingredient: str, dim: str, name: str) -> DishIngredientAggregate:
+    """The aggregate row, created if missing, locked for this transaction.
+
+    Two versions of a dish approved at once may both create the same row: the insert runs in a
+    savepoint, and the one that loses the race reads the winner's row instead of failing its commit.
+    """
+    for _ in range(3):
+        row = _locked_row(db, key, ingredient, dim)
+        if row is not None:
+            return row
+        try:
+            with db.begin_nested():
+                db.add(DishIngredientAggregate(dish_key=key, ingredient=ingredient, dimension=dim, name=name,
+                                               total=0.0, count=0, position_total=0.0, unit_counts='{}'))
+        except IntegrityError:
+            pass  # inserted by a concurrent transaction (or removed again since): read it back
+    raise RuntimeError(f"dish aggregate row {(key, ingredient, dim)} could not be created")
+
+
+def _apply(db, key: str, items: List[list], sign: int):
+    for ingredient, name, dim, qty, unit, position in items:
+        if sign < 0:
+            row = _locked_row(db, key, ingredient, dim)
+            if row is None:
+                continue
+        else:
+            row = _ensure_row(db, key, ingredient, dim, name)
+        units = json.loads(row.unit_counts or '{}')
+        units[unit] = units.get(unit, 0) + sign
+        if units[unit] <= 0:
+            del units[unit]
+        row.unit_counts = json.dumps(units, sort_keys=True)
+        row.total = (row.total or 0.0) + sign * qty
+        row.count = (row.count or 0) + sign
+        row.position_total = (row.position_total or 0.0) + sign * position
+        if row.count <= 0:
+            db.delete(row)
+
+
+def add_version(db, dish_name: str, version) -> bool:
+    """Count version (database.RecipeVersion) in dish_name's aggregates; False if it already is. Caller commits."""
+    if db.get(DishAggregateMember, version.version_id) is not None:
+        return False
+    key = dish_key(dish_name)
+    items = contributions(version.ingredients, version.base_servings or 1)
+    _apply(db, key, items, +1)
+    db.add(DishAggregateMember(version_id=version.version_id, dish_key=key,
+                               contributions=json.dumps(items), added_at=get_india_time()))
+    db.flush()
+    return True
+
+
+def remove_version(db, version_id: str) -> bool:
+    """Take a version out of its dish's aggregates; False if it was not counted. Caller commits."""
+    member = db.get(DishAggregateMember, version_id)
+    if member is None:
+        return False
+    _apply(db, member.dish_key, json.loads(member.contributions or '[]'), -1)
+    db.delete(member)
+    db.flush()
+    return True
+
+
+def consensus_profile(db, dish_name: str) -> Optional[List[Ingredient]]:
+    """The dish's consensus ingredients for one serving, or None if no version of it is counted."""
+    rows = db.query(DishIngredientAggregate).filter(DishIngredientAggregate.dish_key == dish_key(dish_name)).all()
+    best: Dict[str, DishIngredientAggregate] = {}
+    for row in rows:
+        if row.count <= 0:
+            continue
+        current = best.get(row.ingredient)
+        # dominant dimension: used by the most versions (canonical unit name breaks ties)
+        if current is None or (row.count, current.dimension) > (current.count, row.dimension):
+            best[row.ingredient] = row
+    if not best:
+        return None
+    profile = []
+    for row in sorted(best.values(), key=lambda r: (r.position_total / r.count, r.ingredient)):
+        per_serving = row.total / row.count
+        units = json.loads(row.unit_counts or '{}')
+        unit = row.dimension
+        if len(units) == 1:
+            unit = next(iter(units))
+            per_serving /= to_canonical(unit)[1]
+        profile.append(Ingredient(name=row.name, quantity=round(per_serving, 6), unit=unit))
+    return profile
+
+
+def rebuild(db) -> int:
+    """Recompute every aggregate from the latest version of each published recipe; returns the versions counted."""
+    from .database import Recipe as DBRecipe
+    db.query(DishIngredientAggregate).delete()
+    db.query(DishAggregateMember).delete()
+    counted = 0
+    for recipe in db.query(DBRecipe).filter(DBRecipe.is_published == True).all():
+        if recipe.versions:
+            counted += add_version(db, recipe.dish_name, recipe.versions[-1])
+    db.commit()
+    return counted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the per-dish ingredient aggregates.")
+    parser.add_argument('--rebuild', action='store_true', help='recompute from the published recipes')
+    parser.add_argument('--dish', help='print the consensus profile of this dish')
+    args = parser.parse_args()
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            print(f"Total versions counted: {rebuild(db)}")
+        if args.dish:
+            for ing in consensus_profile(db, args.dish) or []:
+                print(f"{ing.name}: {ing.quantity:g} {ing.unit} per serving")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
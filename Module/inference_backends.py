@@ -0,0 +1,195 @@
+"""
+CPU inference backends for the seq2seq model behind FreeOpenLLM.
+
+    fp32   T5ForConditionalGeneration with its full fp32 weights (as before)
+    int8   the same model with torch dynamic int8 quantization of every nn.Linear
+    onnx   the model exported to ONNX and run by ONNX Runtime (optimum)
+
+int8 and onnx need an export step. It runs once per model and backend, writes
+the result under KITCHENMIND_MODEL_CACHE_DIR, and later loads read that cache
+instead of the fp32 checkpoint. The int8 model is built on the meta device,
+its nn.Linear layers are swapped for empty int8 dynamic-quantized ones and only
+then is storage allocated, so loading the cached state dict never holds the
+fp32 Linear weights (the export itself does, once). An export is written to a
+temporary directory and renamed into place, so a process loading the cache
+never sees a half-written one. Run the export at build time so the first
+request does not pay for it:
+
+    python -m Module.inference_backends --backend int8 onnx [--model google/flan-t5-base]
+
+Otherwise the first load of a backend exports on the spot. The parity of each
+backend with fp32 on the golden recipes is checked by
+benchmarks/bench_inference_backends.py.
+
+Configuration (environment):
+    KITCHENMIND_INFERENCE_BACKEND   fp32 | int8 | onnx
+    KITCHENMIND_MODEL_CACHE_DIR     where exported models are kept
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Optional, Tuple
+
+FP32 = 'fp32'
+INT8 = 'int8'
+ONNX = 'onnx'
+BACKENDS = (FP32, INT8, ONNX)
+
+INFERENCE_BACKEND = os.getenv("KITCHENMIND_INFERENCE_BACKEND", FP32).strip().lower()
+MODEL_CACHE_DIR = os.getenv(
+    "KITCHENMIND_MODEL_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "kitchenmind", "models"),
+)
+
+_INT8_WEIGHTS = "model_int8.pt"
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    name = (backend or INFERENCE_BACKEND or FP32).strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    return name
+
+
+def cache_path(model_name: str, backend: str, cache_dir: Optional[str] = None) -> str:
+    """Directory holding the exported model_name for backend."""
+    return os.path.join(cache_dir or MODEL_CACHE_DIR, model_name.replace("/", "--"), backend)
+
+
+def is_exported(model_name: str, backend: str, cache_dir: Optional[str] = None) -> bool:
+    path = cache_path(model_name, backend, cache_dir)
+    if backend == INT8:
+        return os.path.exists(os.path.join(path, _INT8_WEIGHTS))
+    if backend == ONNX:
+        return os.path.isdir(path) and any(f.endswith(".onnx") for f in os.listdir(path))
+    return True
+
+
+def _quantize(model):
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _swap_linears(module):
+    """Replace every nn.Linear below module by an empty int8 dynamic-quantized Linear (quantize_dynamic's layout)."""
+    import torch
+    from torch.ao.nn.quantized.dynamic import Linear as QuantizedLinear
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Linear):
+            setattr(module, name, QuantizedLinear(child.in_features, child.out_features,
+                                                  bias_=child.bias is not None, dtype=torch.qint8))
+        else:
+            _swap_linears(child)
+
+
+def _empty_int8_model(config):
+    """T5 with int8 Linear layers and uninitialized remaining weights, ready for load_state_dict."""
+    import torch
+    from transformers import T5ForConditionalGeneration
+    with torch.device("meta"):
+        model = T5ForConditionalGeneration(config)
+    _swap_linears(model)
+    # embeddings and layer norms only; the quantized Linear weights already live on the CPU
+    return model.to_empty(device="cpu").eval()
+
+
+def _load_tokenizer(source: str):
+    from transformers import T5Tokenizer
+    return T5Tokenizer.from_pretrained(source, use_fast=False)
+
+
+def export_model(model_name: str, backend: str, cache_dir: Optional[str] = None, force: bool = False) -> Optional[Any]:
+    """Write the backend's cached form of model_name (no-op for fp32 or if already cached).
+
+    Returns the exported model when an export actually ran, so a caller that
+    needs it right away does not load it a second time.
+    """
+    backend = resolve_backend(backend)
+    if backend == FP32 or (is_exported(model_name, backend, cache_dir) and not force):
+        return None
+    path = cache_path(model_name, backend, cache_dir)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    start = time.perf_counter()
+    tmp = tempfile.mkdtemp(prefix=f".{backend}-", dir=parent)
+    try:
+        if backend == INT8:
+            import torch
+            from transformers import T5ForConditionalGeneration
+            model = _quantize(T5ForConditionalGeneration.from_pretrained(model_name).eval())
+            model.config.save_pretrained(tmp)
+            _load_tokenizer(model_name).save_pretrained(tmp)
+            torch.save(model.state_dict(), os.path.join(tmp, _INT8_WEIGHTS))
+        else:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+            model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+            model.save_pretrained(tmp)
+            _load_tokenizer(model_name).save_pretrained(tmp)
+        _publish(tmp, path, replace=force)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    print(f"[DEBUG] inference_backends: exported {model_name} ({backend}) to {path} "
+          f"in {time.perf_counter() - start:.1f}s")
+    return model
+
+
+def _publish(tmp: str, path: str, replace: bool):
+    """Move the finished export tmp to path in one rename (readers see all of it or nothing)."""
+    old = None
+    if os.path.exists(path):
+        if not replace and os.listdir(path):
+            return  # another process finished the same export first; keep theirs
+        old = tempfile.mkdtemp(prefix=".old-", dir=os.path.dirname(path))
+        os.replace(path, os.path.join(old, "export"))
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        if replace or not os.path.isdir(path):
+            raise
+        # lost the race to another process exporting the same model; keep theirs
+    finally:
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def load_model(model_name: str, backend: Optional[str] = None, cache_dir: Optional[str] = None) -> Tuple[Any, Any]:
+    """(model, tokenizer) of model_name for backend, exporting it first if it is not cached yet."""
+    backend = resolve_backend(backend)
+    if backend == FP32:
+        from transformers import T5ForConditionalGeneration
+        return T5ForConditionalGeneration.from_pretrained(model_name), _load_tokenizer(model_name)
+
+    path = cache_path(model_name, backend, cache_dir)
+    exported = export_model(model_name, backend, cache_dir)
+    tokenizer = _load_tokenizer(path)
+    if exported is not None:
+        return exported, tokenizer
+    if backend == INT8:
+        import torch
+        from transformers import T5Config
+        model = _empty_int8_model(T5Config.from_pretrained(path))
+        model.load_state_dict(torch.load(os.path.join(path, _INT8_WEIGHTS), map_location="cpu"))
+        return model, tokenizer
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    return ORTModelForSeq2SeqLM.from_pretrained(path), tokenizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export models for the int8 / onnx inference backends.")
+    parser.add_argument('--model', action='append', help='model name (repeatable; default google/flan-t5-base)')
+    parser.add_argument('--backend', nargs='+', default=[INT8, ONNX], choices=BACKENDS)
+    parser.add_argument('--cache-dir', default=None, help=f'default {MODEL_CACHE_DIR}')
+    parser.add_argument('--force', action='store_true', help='re-export even if cached')
+    args = parser.parse_args()
+    from .model_pool import DEFAULT_MODEL_NAME
+    for model_name in args.model or [DEFAULT_MODEL_NAME]:
+        for backend in args.backend:
+            export_model(model_name, backend, args.cache_dir, force=args.force)
+            print(f"{model_name} [{backend}]: {cache_path(model_name, backend, args.cache_dir)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Micro-batching scheduler for LLM generation.
+
+Concurrent synthesize() calls each used to run their own forward pass through
+the text2text pipeline, one after another. The batcher collects prompts that
+arrive within a short window (up to a maximum batch size), runs them through
+the pipeline as one padded batch and hands every caller its own result via a
+Future.
+
+Configuration (environment):
+    KITCHENMIND_BATCH_WINDOW_MS   how long to wait for more prompts (0 disables batching)
+    KITCHENMIND_BATCH_MAX_SIZE    maximum prompts per forward pass
+    KITCHENMIND_BATCH_TIMEOUT_S   seconds generate() waits for its output
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Tuple
+
+BATCH_WINDOW_MS = float(os.getenv("KITCHENMIND_BATCH_WINDOW_MS", "10"))
+BATCH_MAX_SIZE = int(os.getenv("KITCHENMIND_BATCH_MAX_SIZE", "8"))
+BATCH_TIMEOUT_S = float(os.getenv("KITCHENMIND_BATCH_TIMEOUT_S", "300"))
+
+
+def _kwargs_key(gen_kwargs: Dict) -> Tuple:
+    # Only prompts with identical generation settings can share a forward pass
+    return tuple(sorted((k, repr(v)) for k, v in gen_kwargs.items()))
+
+
+class MicroBatcher:
+    """Collects prompts into batches and runs them on a single worker thread.
+
+    run_batch(prompts, gen_kwargs) must return one generated string per prompt.
+    """
+
+    def __init__(self, run_batch: Callable[[List[str], Dict], List[str]],
+                 window_ms: float = BATCH_WINDOW_MS, max_batch_size: int = BATCH_MAX_SIZE,
+                 name: str = "llm", timeout_s: float = BATCH_TIMEOUT_S):
+        self._run_batch = run_batch
+        self.window_s = max(window_ms, 0) / 1000.0
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.timeout_s = timeout_s
+        self._queue: "queue.Queue[Tuple[str, Dict, Future]]" = queue.Queue()
+        # submit() enqueues and the worker drains on exit under this lock, so no prompt is left behind
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"batches": 0, "prompts": 0, "max_seen_batch": 0}
+        self._worker = threading.Thread(target=self._loop, name=f"micro-batcher-{name}", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str, gen_kwargs: Dict) -> Future:
+        fut: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((prompt, dict(gen_kwargs), fut))
+        return fut
+
+    def generate(self, prompt: str, gen_kwargs: Dict) -> str:
+        """Blocking helper: submit a prompt and wait for its output (at most timeout_s)."""
+        fut = self.submit(prompt, gen_kwargs)
+        try:
+            return fut.result(timeout=self.timeout_s or None)
+        except FutureTimeout:
+            fut.cancel()
+            raise TimeoutError(f"MicroBatcher: no output after {self.timeout_s}s")
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._queue.put(None)
+
+    def _collect(self, first) -> List[Tuple[str, Dict, Future]]:
+        batch = [first]
+        deadline = time.monotonic() + self.window_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    def _exit(self):
+        # Under the lock, so no submit() can enqueue after the final drain
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+                if item is not None and item[2].set_running_or_notify_cancel():
+                    item[2].set_exception(RuntimeError("MicroBatcher is closed"))
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                self._exit()
+                return
+            batch = self._collect(first)
+
+            groups: Dict[Tuple, List[Tuple[str, Dict, Future]]] = {}
+            for item in batch:
+                # callers that gave up waiting (generate() timed out) have cancelled their future
+                if item[2].set_running_or_notify_cancel():
+                    groups.setdefault(_kwargs_key(item[1]), []).append(item)
+
+            for items in groups.values():
+                prompts = [p for p, _, _ in items]
+                try:
+                    outputs = self._run_batch(prompts, items[0][1])
+                    if len(outputs) != len(items):
+                        raise RuntimeError(f"batch returned {len(outputs)} outputs for {len(items)} prompts")
+                except Exception as e:
+                    for _, _, fut in items:
+                        if not fut.done():
+                            fut.set_exception(e)
+                    continue
+                for (_, _, fut), text in zip(items, outputs):
+                    if not fut.done():
+                        fut.set_result(text)
+                self.stats["batches"] += 1
+                self.stats["prompts"] += len(items)
+                self.stats["max_seen_batch"] = max(self.stats["max_seen_batch"], len(items))
+
+            if self._closed:
+                self._exit()
+                return
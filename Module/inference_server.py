@@ -0,0 +1,390 @@
+"""
+Out-of-process inference server shared by all API workers.
+
+Every uvicorn worker (and every synthesis worker process) used to load its own
+FreeOpenLLM copy of the model, multiplying resident memory by the number of
+processes. With KITCHENMIND_INFERENCE_SERVER set, the model pool hands out
+RemoteLLM adapters instead: they forward generate()/generate_batch() to one
+server process that owns the models and their micro-batcher, over a Unix
+socket or a localhost TCP port. Prompts from all API processes then share the
+server's batches as well as its weights.
+
+Start the server with
+
+    python -m Module.inference_server --listen unix:/run/kitchenmind/infer.sock [--preload google/flan-t5-base]
+
+(or, with the deterministic stub model and no transformers install,
+`python -m benchmarks.stub_llm --serve unix:/tmp/km-infer.sock`) and point
+the API at it with KITCHENMIND_INFERENCE_SERVER=unix:/run/kitchenmind/infer.sock.
+
+Protocol: every message is a frame of a 4-byte big-endian body length and the
+body. Strings are a 4-byte length and UTF-8 bytes.
+
+    request   op:u8  model:str  gen_kwargs:str (JSON)  count:u32  prompt:str * count
+    response  status:u8  count:u32  text:str * count
+
+op is OP_AVAILABLE, OP_GENERATE (one prompt, through the server's micro-batcher),
+OP_GENERATE_BATCH (one padded batch) or OP_COUNT_TOKENS (one decimal count per
+prompt, with the model's tokenizer); status is STATUS_OK, STATUS_UNAVAILABLE
+or STATUS_ERROR, the latter two with the message as the only text. A
+connection carries any number of requests, one at a time; clients keep a small
+pool of them.
+
+Configuration (environment):
+    KITCHENMIND_INFERENCE_SERVER      unix:/path/to.sock | tcp:host:port (unset = load models in-process)
+    KITCHENMIND_INFERENCE_TIMEOUT_S   seconds a client waits for one reply
+    KITCHENMIND_INFERENCE_POOL_SIZE   idle connections a client keeps per model
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+INFERENCE_SERVER = os.getenv("KITCHENMIND_INFERENCE_SERVER", "").strip()
+INFERENCE_TIMEOUT_S = float(os.getenv("KITCHENMIND_INFERENCE_TIMEOUT_S", "120"))
+INFERENCE_POOL_SIZE = int(os.getenv("KITCHENMIND_INFERENCE_POOL_SIZE", "8"))
+
+OP_AVAILABLE = 1
+OP_GENERATE = 2
+OP_GENERATE_BATCH = 3
+OP_COUNT_TOKENS = 4
+
+STATUS_OK = 0
+STATUS_UNAVAILABLE = 1
+STATUS_ERROR = 2
+
+_LEN = struct.Struct("!I")
+_BYTE = struct.Struct("!B")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+class ProtocolError(RuntimeError):
+    pass
+
+
+# --- framing -------------------------------------------------------------------
+
+def parse_address(address: str) -> Tuple[int, object]:
+    """(socket family, address) for 'unix:/path', 'tcp:host:port', a bare path or 'host:port'."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    if address.startswith("tcp:"):
+        address = address[len("tcp:"):]
+    elif "/" in address or ":" not in address:
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def _pack_str(s: str) -> bytes:
+    data = s.encode("utf-8")
+    return _LEN.pack(len(data)) + data
+
+
+def _unpack_str(buf: bytes, pos: int) -> Tuple[str, int]:
+    (n,) = _LEN.unpack_from(buf, pos)
+    pos += _LEN.size
+    return buf[pos:pos + n].decode("utf-8"), pos + n
+
+
+def _pack_texts(texts: List[str]) -> bytes:
+    return _LEN.pack(len(texts)) + b"".join(_pack_str(t) for t in texts)
+
+
+def _unpack_texts(buf: bytes, pos: int) -> Tuple[List[str], int]:
+    (count,) = _LEN.unpack_from(buf, pos)
+    pos += _LEN.size
+    texts = []
+    for _ in range(count):
+        text, pos = _unpack_str(buf, pos)
+        texts.append(text)
+    return texts, pos
+
+
+def encode_request(op: int, model: str, gen_kwargs: Dict, prompts: List[str]) -> bytes:
+    return _BYTE.pack(op) + _pack_str(model) + _pack_str(json.dumps(gen_kwargs, sort_keys=True)) + _pack_texts(prompts)
+
+
+def decode_request(body: bytes) -> Tuple[int, str, Dict, List[str]]:
+    (op,) = _BYTE.unpack_from(body, 0)
+    model, pos = _unpack_str(body, _BYTE.size)
+    kwargs, pos = _unpack_str(body, pos)
+    prompts, _ = _unpack_texts(body, pos)
+    return op, model, json.loads(kwargs or "{}"), prompts
+
+
+def encode_response(status: int, texts: List[str]) -> bytes:
+    return _BYTE.pack(status) + _pack_texts(texts)
+
+
+def decode_response(body: bytes) -> Tuple[int, List[str]]:
+    (status,) = _BYTE.unpack_from(body, 0)
+    texts, _ = _unpack_texts(body, _BYTE.size)
+    return status, texts
+
+
+def _recv_exact(sock, n: int) -> Optional[bytes]:
+    chunks, remaining = [], n
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            if remaining == n:
+                return None  # clean end of stream between frames
+            raise ProtocolError("connection closed mid-frame")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def send_frame(sock, body: bytes):
+    sock.sendall(_LEN.pack(len(body)) + body)
+
+
+def recv_frame(sock) -> Optional[bytes]:
+    header = _recv_exact(sock, _LEN.size)
+    if header is None:
+        return None
+    (n,) = _LEN.unpack(header)
+    if n > MAX_FRAME_BYTES:
+        raise ProtocolError(f"frame of {n} bytes exceeds {MAX_FRAME_BYTES}")
+    body = _recv_exact(sock, n)
+    if body is None:
+        raise ProtocolError("connection closed mid-frame")
+    return body
+
+
+# --- server --------------------------------------------------------------------
+
+def _local_pool():
+    """A model pool that always loads in this process (the server must never forward to itself)."""
+    from .model_pool import MODEL_MEMORY_BUDGET_MB, ModelPool
+    from .synthesizer import Synthesizer
+    return ModelPool(loader=lambda name: Synthesizer.FreeOpenLLM(model_name=name),
+                     memory_budget_bytes=MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                body = recv_frame(self.request)
+            except (OSError, ProtocolError):
+                return
+            if body is None:
+                return
+            try:
+                reply = self.server.dispatch(body)
+            except Exception as e:
+                reply = encode_response(STATUS_ERROR, [f"{e.__class__.__name__}: {e}"])
+            try:
+                send_frame(self.request, reply)
+            except OSError:
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class InferenceServer:
+    """Serves the models of pool (a local ModelPool by default) on address."""
+
+    def __init__(self, address: str, pool=None):
+        self.address = address
+        self.pool = pool if pool is not None else _local_pool()
+        family, addr = parse_address(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(addr):
+                os.unlink(addr)  # stale socket of an earlier run
+            self._server = _UnixServer(addr, _Handler)
+        else:
+            self._server = _TCPServer(addr, _Handler)
+        self._server.dispatch = self.dispatch
+        self.stats = {"requests": 0, "prompts": 0, "errors": 0}
+        self._lock = threading.Lock()
+
+    def dispatch(self, body: bytes) -> bytes:
+        op, model, gen_kwargs, prompts = decode_request(body)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["prompts"] += len(prompts)
+        llm = self.pool.get(model)
+        if not llm.available():
+            err = getattr(llm, "_init_error", None)
+            return encode_response(STATUS_UNAVAILABLE, [f"LLM pipeline for {model} is not available. Init error: {err}"])
+        if op == OP_AVAILABLE:
+            return encode_response(STATUS_OK, [])
+        try:
+            if op == OP_GENERATE:
+                texts = [llm.generate(prompts[0], **gen_kwargs)]
+            elif op == OP_GENERATE_BATCH:
+                if hasattr(llm, "generate_batch"):
+                    texts = llm.generate_batch(prompts, **gen_kwargs)
+                else:
+                    texts = [llm.generate(p, **gen_kwargs) for p in prompts]
+            elif op == OP_COUNT_TOKENS:
+                if not hasattr(llm, "count_tokens"):
+                    raise NotImplementedError(f"{model} has no tokenizer")
+                texts = [str(n) for n in llm.count_tokens(prompts)]
+            else:
+                raise ProtocolError(f"unknown op {op}")
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            return encode_response(STATUS_ERROR, [f"{e.__class__.__name__}: {e}"])
+        return encode_response(STATUS_OK, [t if isinstance(t, str) else str(t) for t in texts])
+
+    @property
+    def server_address(self):
+        return self._server.server_address
+
+    def serve_forever(self):
+        print(f"[DEBUG] InferenceServer: listening on {self.address}")
+        self._server.serve_forever()
+
+    def start(self) -> threading.Thread:
+        """serve_forever on a daemon thread (tests, benchmarks)."""
+        thread = threading.Thread(target=self._server.serve_forever, name="inference-server", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        family, addr = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(addr):
+            os.unlink(addr)
+
+
+# --- client --------------------------------------------------------------------
+
+class RemoteLLM:
+    """FreeOpenLLM look-alike that generates on the inference server."""
+
+    def __init__(self, model_name: str, address: str = INFERENCE_SERVER,
+                 timeout_s: float = INFERENCE_TIMEOUT_S, pool_size: int = INFERENCE_POOL_SIZE):
+        self.model_name = model_name
+        self.address = address
+        self.timeout_s = timeout_s
+        self._idle: "queue.LifoQueue" = queue.LifoQueue(maxsize=max(1, pool_size))
+        self._available = False
+        self._init_error = None
+
+    def _connect(self):
+        family, addr = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout_s or None)
+        try:
+            sock.connect(addr)
+        except OSError:
+            sock.close()
+            raise
+        if family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _call(self, op: int, prompts: List[str], gen_kwargs: Dict) -> List[str]:
+        request = encode_request(op, self.model_name, gen_kwargs, prompts)
+        for attempt in (1, 2):
+            sock, reused = None, False
+            if attempt == 1:
+                try:
+                    sock, reused = self._idle.get_nowait(), True
+                except queue.Empty:
+                    pass
+            try:
+                if sock is None:
+                    sock = self._connect()
+                send_frame(sock, request)
+                body = recv_frame(sock)
+                if body is None:
+                    raise ProtocolError("server closed the connection")
+            except socket.timeout:
+                if sock is not None:
+                    sock.close()
+                raise
+            except (OSError, ProtocolError) as e:
+                if sock is not None:
+                    sock.close()
+                # a pooled connection may have been closed by a server restart: retry once on a fresh one
+                if reused:
+                    continue
+                # the server is gone: available() probes again, and the model pool backs off
+                self._available, self._init_error = False, e
+                self.close()
+                raise
+            try:
+                self._idle.put_nowait(sock)
+            except queue.Full:
+                sock.close()
+            status, texts = decode_response(body)
+            if status == STATUS_UNAVAILABLE:
+                self._available, self._init_error = False, (texts[0] if texts else None)
+            if status != STATUS_OK:
+                raise RuntimeError(texts[0] if texts else f"inference server error (status {status})")
+            return texts
+        raise ProtocolError("unreachable")
+
+    def available(self) -> bool:
+        if self._available:
+            return True
+        try:
+            self._call(OP_AVAILABLE, [], {})
+            self._available, self._init_error = True, None
+        except Exception as e:
+            self._init_error = e
+        return self._available
+
+    def generate(self, prompt: str, **gen_kwargs) -> str:
+        return self._call(OP_GENERATE, [prompt], gen_kwargs)[0]
+
+    def generate_batch(self, prompts: List[str], **gen_kwargs) -> List[str]:
+        if not prompts:
+            return []
+        return self._call(OP_GENERATE_BATCH, list(prompts), gen_kwargs)
+
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        return [int(n) for n in self._call(OP_COUNT_TOKENS, list(texts), {})]
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the synthesis models to the API workers.")
+    parser.add_argument('--listen', default=INFERENCE_SERVER or "unix:/tmp/kitchenmind-infer.sock",
+                        help='unix:/path/to.sock or tcp:host:port')
+    parser.add_argument('--preload', nargs='*', default=None, help='models to load before accepting requests')
+    args = parser.parse_args()
+    server = InferenceServer(args.listen)
+    from .model_pool import PRELOAD_MODELS
+    preload = PRELOAD_MODELS if args.preload is None else args.preload
+    if preload:
+        print(f"[DEBUG] InferenceServer: models preloaded {server.pool.preload(preload)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
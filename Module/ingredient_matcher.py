@@ -0,0 +1,249 @@
+"""
+Multi-pattern ingredient matching over recipe steps.
+
+ensure_ingredient_coverage and the post-processing stages after it used to
+ask the same questions one pattern at a time: `tok in all_text` for every
+ingredient token, a word-boundary regex per token per step to find partial
+steps, `'grind' in s.lower()` / `'fenugreek' in s.lower()` scans, and a soy
+sauce regex over every step. Here the ingredient tokens and step keywords of
+one merged ingredient list are compiled once into an Aho-Corasick automaton,
+and one pass over the steps produces a MatchTable saying which terms (and so
+which ingredients) each step mentions, as a substring and as a whole word.
+
+Matching is done on lowercased steps with whitespace runs collapsed to one
+space, so a term like "soy sauce" behaves like the regex r'\\bsoy\\s+sauce\\b'.
+
+Configuration (environment):
+    KITCHENMIND_MATCHER_CACHE_SIZE   automata kept for recently seen ingredient lists
+"""
+
+import os
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from . import synth_patterns as rx
+
+MATCHER_CACHE_SIZE = int(os.getenv("KITCHENMIND_MATCHER_CACHE_SIZE", "256"))
+
+# Keywords the post-processing rules look for besides the ingredient tokens
+STEP_TERMS: Tuple[str, ...] = ('beaten', 'grind', 'water', 'fenugreek', 'soy sauce')
+
+
+def ingredient_tokens(name: str) -> List[str]:
+    """Lowercase alphabetic tokens of an ingredient name (single letters dropped)."""
+    s = rx.NON_ALPHA.sub(' ', name.lower())
+    return [t for t in s.split() if len(t) > 1]
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton over a fixed set of terms (goto trie plus failure links).
+
+    Transitions that need the failure chain are resolved once and memoized per
+    state, so repeated scans cost about one dict lookup per character.
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self.terms: List[str] = list(dict.fromkeys(t for t in terms if t))
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for idx, term in enumerate(self.terms):
+            state = 0
+            for ch in term:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(idx)
+
+        # Breadth-first, so a state's failure target is final before its children need it
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in goto[state].items():
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+                queue.append(nxt)
+        self._goto = goto
+        self._fail = fail
+        self._delta: List[Dict[str, int]] = [dict(g) for g in goto]
+        self._out: List[Tuple[int, ...]] = [tuple(o) for o in out]
+
+    def _step(self, state: int, ch: str) -> int:
+        goto = self._goto
+        s = state
+        while s and ch not in goto[s]:
+            s = self._fail[s]
+        nxt = goto[s].get(ch, 0)
+        self._delta[state][ch] = nxt
+        return nxt
+
+    def find(self, text: str) -> Iterator[Tuple[int, int]]:
+        """Yield (start, term index) for every occurrence, overlapping ones included."""
+        delta = self._delta
+        out = self._out
+        terms = self.terms
+        state = 0
+        for pos, ch in enumerate(text):
+            nxt = delta[state].get(ch)
+            state = self._step(state, ch) if nxt is None else nxt
+            if out[state]:
+                for idx in out[state]:
+                    yield pos - len(terms[idx]) + 1, idx
+
+
+class MatchTable:
+    """Which steps mention which terms, from one scan of the steps.
+
+    Step indices can be kept in sync with later edits of the step list via
+    delete_lines(), move_line() and update_line().
+    """
+
+    def __init__(self, matcher: "IngredientMatcher", num_lines: int,
+                 substring: Dict[str, Set[int]], word: Dict[str, Set[int]]):
+        self.matcher = matcher
+        self.num_lines = num_lines
+        self._substring = substring
+        self._word = word
+
+    def lines_with(self, term: str, whole_word: bool = False) -> List[int]:
+        """Sorted indices of the steps containing term."""
+        hits = (self._word if whole_word else self._substring).get(term)
+        return sorted(hits) if hits else []
+
+    def first(self, term: str, whole_word: bool = False) -> Optional[int]:
+        hits = (self._word if whole_word else self._substring).get(term)
+        return min(hits) if hits else None
+
+    def has(self, term: str, whole_word: bool = False) -> bool:
+        return bool((self._word if whole_word else self._substring).get(term))
+
+    def in_line(self, term: str, index: int, whole_word: bool = False) -> bool:
+        hits = (self._word if whole_word else self._substring).get(term)
+        return bool(hits) and index in hits
+
+    def mentions(self, name: str) -> bool:
+        """True if any token of ingredient name occurs anywhere in the steps."""
+        return any(self._substring.get(t) for t in self.matcher.tokens(name))
+
+    def covers(self, name: str) -> bool:
+        """True if every token of ingredient name occurs as a whole word somewhere in the steps."""
+        toks = self.matcher.tokens(name)
+        return bool(toks) and all(self._word.get(t) for t in toks)
+
+    def ingredient_lines(self, name: str) -> Set[int]:
+        """Indices of the steps mentioning any token of ingredient name as a whole word."""
+        found: Set[int] = set()
+        for tok in self.matcher.tokens(name):
+            found.update(self._word.get(tok, ()))
+        return found
+
+    def ingredients_by_line(self) -> Dict[str, List[int]]:
+        """Ingredient name -> sorted indices of the steps mentioning it."""
+        return {name: sorted(self.ingredient_lines(name)) for name in self.matcher.names}
+
+    def delete_lines(self, indices: Iterable[int]):
+        """Account for the steps at indices having been removed from the list."""
+        removed = sorted(set(indices))
+        if not removed:
+            return
+        gone = set(removed)
+        for table in (self._substring, self._word):
+            for term, hits in table.items():
+                table[term] = {i - bisect_left(removed, i) for i in hits if i not in gone}
+        self.num_lines -= sum(1 for i in gone if 0 <= i < self.num_lines)
+
+    def move_line(self, src: int, dst: int):
+        """Account for list.insert(dst, list.pop(src))."""
+        if src == dst:
+            return
+
+        def remap(i: int) -> int:
+            if i == src:
+                return dst
+            if src < i <= dst:
+                return i - 1
+            if dst <= i < src:
+                return i + 1
+            return i
+
+        for table in (self._substring, self._word):
+            for term, hits in table.items():
+                table[term] = {remap(i) for i in hits}
+
+    def update_line(self, index: int, line: str):
+        """Account for the step at index having been replaced by line."""
+        for table in (self._substring, self._word):
+            for hits in table.values():
+                hits.discard(index)
+        for term, whole_word in self.matcher.scan_line(line):
+            self._substring.setdefault(term, set()).add(index)
+            if whole_word:
+                self._word.setdefault(term, set()).add(index)
+
+
+class IngredientMatcher:
+    """Automaton over the tokens of one merged ingredient list plus the step keywords."""
+
+    def __init__(self, names: Sequence[str], extra_terms: Iterable[str] = STEP_TERMS):
+        self.names: List[str] = [n.strip() for n in names if n and n.strip()]
+        self._tokens: Dict[str, List[str]] = {n: ingredient_tokens(n) for n in self.names}
+        terms = [t for toks in self._tokens.values() for t in toks]
+        terms.extend(extra_terms)
+        self.automaton = AhoCorasick(terms)
+        self.terms: FrozenSet[str] = frozenset(self.automaton.terms)
+
+    @classmethod
+    def for_ingredients(cls, ingredients, extra_terms: Iterable[str] = STEP_TERMS) -> "IngredientMatcher":
+        return cls([ing.name for ing in ingredients], extra_terms)
+
+    def tokens(self, name: str) -> List[str]:
+        toks = self._tokens.get(name.strip())
+        if toks is None:
+            toks = ingredient_tokens(name)
+        return toks
+
+    def scan_line(self, line: str) -> Iterator[Tuple[str, bool]]:
+        """(term, occurs as a whole word) for every term occurrence in one step."""
+        terms = self.automaton.terms
+        text = rx.WHITESPACE.sub(' ', line.lower())
+        end = len(text)
+        for start, idx in self.automaton.find(text):
+            term = terms[idx]
+            stop = start + len(term)
+            yield term, ((start == 0 or not _is_word_char(text[start - 1])) and
+                         (stop == end or not _is_word_char(text[stop])))
+
+    def scan(self, lines: Sequence[str]) -> MatchTable:
+        """Match every term against every step in one pass."""
+        substring: Dict[str, Set[int]] = {}
+        word: Dict[str, Set[int]] = {}
+        for i, line in enumerate(lines):
+            for term, whole_word in self.scan_line(line):
+                substring.setdefault(term, set()).add(i)
+                if whole_word:
+                    word.setdefault(term, set()).add(i)
+        return MatchTable(self, len(lines), substring, word)
+
+
+@lru_cache(maxsize=MATCHER_CACHE_SIZE)
+def _cached_matcher(names: Tuple[str, ...], extra_terms: Tuple[str, ...]) -> IngredientMatcher:
+    return IngredientMatcher(names, extra_terms)
+
+
+def get_ingredient_matcher(ingredients, extra_terms: Iterable[str] = STEP_TERMS) -> IngredientMatcher:
+    """Shared matcher for an ingredient list; repeat requests for a dish reuse its automaton."""
+    return _cached_matcher(tuple(ing.name for ing in ingredients), tuple(extra_terms))
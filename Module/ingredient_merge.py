@@ -0,0 +1,257 @@
+"""
+Weighted, unit-aware merge of source ingredient lists.
+
+Synthesizer.merge_ingredients used to average per-serving quantities as plain
+numbers and pick the most frequent unit string, so "0.2 kg" and "180 g" of
+flour were averaged to ~30 of whichever unit won the vote. Here every
+quantity is first converted to the canonical unit of its dimension (g, ml or
+pieces) through a precomputed table, then each ingredient gets a weighted
+per-serving mean, with one weight per source recipe (the controller passes the
+ScoringEngine scores of the chosen candidates).
+
+The aggregation is a grouped weighted sum: rows are (ingredient, dimension)
+buckets, and the numerators and denominators of all buckets are computed in
+one pass, with numpy.bincount when numpy is installed and the batch is large
+enough to amortize the array setup (numpy is only imported then), or a plain
+loop otherwise. Both backends accumulate in the same order and give
+identical results.
+
+If all sources of an ingredient (in its result's dimension) use the same
+unit, the result is reported in that unit; if they differ, in the canonical
+unit. The result is in the dominant dimension of the ingredient (largest total source weight, first seen
+on ties). Sources measured by volume next to sources measured by weight (e.g.
+"1 tsp" and "6 g" of salt) are converted into it with the ingredient's
+density (DENSITIES) when it is known. Sources that cannot be converted (no
+density, pieces, unknown units, which are their own dimension) are left out
+of the mean; each such drop is reported as a 'merge'/'dropped_quantity' trace
+event.
+
+Configuration (environment):
+    KITCHENMIND_MERGE_BACKEND          auto | numpy | python
+    KITCHENMIND_MERGE_NUMPY_MIN_ROWS   ingredient rows from which auto uses numpy
+"""
+
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .synthesis_trace import current_trace
+
+MERGE_BACKEND = os.getenv("KITCHENMIND_MERGE_BACKEND", "auto").strip().lower()
+MERGE_NUMPY_MIN_ROWS = int(os.getenv("KITCHENMIND_MERGE_NUMPY_MIN_ROWS", "64"))
+
+_numpy_module = None  # numpy once imported, False if it is not installed
+
+
+def numpy_module():
+    """numpy, imported on first use (it is only needed for large merges); None if not installed."""
+    global _numpy_module
+    if _numpy_module is None:
+        try:
+            import numpy
+            _numpy_module = numpy
+        except Exception:
+            _numpy_module = False
+    return _numpy_module or None
+
+
+# Sources with no usable weight still count, just barely
+_MIN_WEIGHT = 1e-9
+
+# unit -> (canonical unit, factor to canonical)
+UNIT_CONVERSIONS: Dict[str, Tuple[str, float]] = {}
+
+
+def _register(canonical: str, factor: float, *aliases: str):
+    for alias in aliases:
+        UNIT_CONVERSIONS[alias] = (canonical, factor)
+
+
+_register('g', 1.0, 'g', 'gm', 'gms', 'gr', 'gram', 'grams', 'gramme', 'grammes')
+_register('g', 1000.0, 'kg', 'kgs', 'kilo', 'kilos', 'kilogram', 'kilograms')
+_register('g', 0.001, 'mg', 'milligram', 'milligrams')
+_register('g', 28.349523125, 'oz', 'ounce', 'ounces')
+_register('g', 453.59237, 'lb', 'lbs', 'pound', 'pounds')
+_register('ml', 1.0, 'ml', 'millilitre', 'millilitres', 'milliliter', 'milliliters')
+_register('ml', 10.0, 'cl')
+_register('ml', 100.0, 'dl')
+_register('ml', 1000.0, 'l', 'ltr', 'litre', 'litres', 'liter', 'liters')
+_register('ml', 4.92892159375, 'tsp', 'teaspoon', 'teaspoons')
+_register('ml', 14.78676478125, 'tbsp', 'tablespoon', 'tablespoons')
+_register('ml', 240.0, 'cup', 'cups')
+_register('pc', 1.0, 'pc', 'pcs', 'piece', 'pieces', 'no', 'nos')
+
+
+# canonical ingredient name (lower case) -> grams per ml, for converting between weight and volume
+DENSITIES: Dict[str, float] = {
+    'water': 1.0,
+    'milk': 1.03,
+    'yogurt': 1.03,
+    'curd': 1.03,
+    'oil': 0.92,
+    'ghee': 0.91,
+    'butter': 0.91,
+    'honey': 1.42,
+    'salt': 1.2,
+    'sugar': 0.85,
+    'flour': 0.53,
+    'all-purpose flour': 0.53,
+    'maida': 0.53,
+    'wheat flour': 0.5,
+    'besan': 0.45,
+    'gram flour': 0.45,
+    'semolina': 0.7,
+    'rava': 0.7,
+    'rice': 0.8,
+    'urad dal': 0.8,
+    'baking soda': 1.0,
+    'baking powder': 0.8,
+}
+
+
+def _cross_factor(src_dim: str, dst_dim: str, density: Optional[float]) -> Optional[float]:
+    """Factor taking a canonical quantity of src_dim to dst_dim, or None if it cannot be converted."""
+    if density is None:
+        return None
+    if (src_dim, dst_dim) == ('ml', 'g'):
+        return density
+    if (src_dim, dst_dim) == ('g', 'ml'):
+        return 1.0 / density
+    return None
+
+
+def to_canonical(unit: str) -> Tuple[str, float]:
+    """(canonical unit, factor) for a unit string; unknown units map to themselves with factor 1."""
+    key = (unit or "").strip().lower()
+    conv = UNIT_CONVERSIONS.get(key)
+    if conv is None:
+        key = key.rstrip('.')
+        conv = UNIT_CONVERSIONS.get(key, (key, 1.0))
+    return conv
+
+
+def source_weights(n: int, weights: Optional[Sequence[float]] = None) -> List[float]:
+    """One weight per source: the given ones (negatives clamped), or 1.0 each if missing/unusable."""
+    if weights is None or len(weights) != n:
+        return [1.0] * n
+    clean = [max(float(w), 0.0) for w in weights]
+    if not any(clean):
+        return [1.0] * n
+    return [max(w, _MIN_WEIGHT) for w in clean]
+
+
+def _sums_python(buckets: List[int], values: List[float], row_weights: List[float], nb: int):
+    num = [0.0] * nb
+    den = [0.0] * nb
+    for b, v, w in zip(buckets, values, row_weights):
+        num[b] += v * w
+        den[b] += w
+    return num, den
+
+
+def _sums_numpy(buckets: List[int], values: List[float], row_weights: List[float], nb: int):
+    np = numpy_module()
+    b = np.asarray(buckets, dtype=np.intp)
+    v = np.asarray(values, dtype=np.float64)
+    w = np.asarray(row_weights, dtype=np.float64)
+    num = np.bincount(b, weights=v * w, minlength=nb)
+    den = np.bincount(b, weights=w, minlength=nb)
+    return num.tolist(), den.tolist()
+
+
+def _use_numpy(rows: int, backend: str) -> bool:
+    if backend == 'python' or (backend != 'numpy' and rows < MERGE_NUMPY_MIN_ROWS):
+        return False
+    return numpy_module() is not None
+
+
+def merge_quantities(recipes, requested_servings: int, canonical_name: Callable[[str], str],
+                     weights: Optional[Sequence[float]] = None,
+                     backend: Optional[str] = None) -> List[Tuple[str, float, str]]:
+    """Merge the ingredients of recipes into (name, quantity, unit) for requested_servings.
+
+    Ingredients are keyed by canonical_name (case-insensitive) and returned in
+    first-seen order; quantities are rounded to 3 decimals.
+    """
+    w_src = source_weights(len(recipes), weights)
+
+    names: List[str] = []
+    group_of: Dict[str, int] = {}
+    bucket_of: Dict[Tuple[int, str], int] = {}
+    group_buckets: List[List[int]] = []
+    bucket_units: List[Optional[str]] = []  # raw unit shared by every row of the bucket, else None
+    bucket_dims: List[str] = []
+    buckets: List[int] = []
+    values: List[float] = []
+    row_weights: List[float] = []
+
+    # Per-call memos: sources repeat the same name and unit strings
+    group_by_raw: Dict[str, int] = {}
+    conv_by_unit: Dict[str, Tuple[str, float]] = {}
+
+    for r_idx, r in enumerate(recipes):
+        if r.ingredients and r.servings <= 0:
+            raise ValueError("Source recipe has invalid servings")
+        servings = r.servings
+        w = w_src[r_idx]
+        for ing in r.ingredients:
+            g = group_by_raw.get(ing.name)
+            if g is None:
+                cname = canonical_name(ing.name).strip()
+                key = cname.lower()
+                g = group_of.get(key)
+                if g is None:
+                    g = group_of[key] = len(names)
+                    names.append(cname)
+                    group_buckets.append([])
+                group_by_raw[ing.name] = g
+            unit = ing.unit
+            conv = conv_by_unit.get(unit)
+            if conv is None:
+                conv = conv_by_unit[unit] = to_canonical(unit)
+            dim, factor = conv
+            b = bucket_of.get((g, dim))
+            if b is None:
+                b = bucket_of[(g, dim)] = len(bucket_dims)
+                bucket_dims.append(dim)
+                bucket_units.append(unit)
+                group_buckets[g].append(b)
+            elif bucket_units[b] is not None and bucket_units[b] != unit:
+                bucket_units[b] = None
+            buckets.append(b)
+            values.append(ing.quantity / servings * factor)
+            row_weights.append(w)
+
+    nb = len(bucket_dims)
+    sums = _sums_numpy if _use_numpy(len(values), backend or MERGE_BACKEND) else _sums_python
+    num, den = sums(buckets, values, row_weights, nb)
+
+    trace = current_trace()
+    merged: List[Tuple[str, float, str]] = []
+    for g, name in enumerate(names):
+        # dominant dimension: largest total source weight, first seen on ties
+        best = group_buckets[g][0]
+        for b in group_buckets[g][1:]:
+            if den[b] > den[best]:
+                best = b
+        total, weight, unit = num[best], den[best], bucket_units[best]
+        density = DENSITIES.get(name.lower())
+        for b in group_buckets[g]:
+            if b == best:
+                continue
+            factor = _cross_factor(bucket_dims[b], bucket_dims[best], density)
+            if factor is not None:
+                # reported in the dominant bucket's unit, like the rows it already holds
+                total += num[b] * factor
+                weight += den[b]
+                continue
+            dropped = {"unit": bucket_units[b] or bucket_dims[b], "per_serving": round(num[b] / den[b], 3)}
+            print(f"[DEBUG] merge_quantities: {name}: {dropped} cannot be converted to {bucket_dims[best]}, left out")
+            if trace.enabled:
+                trace.event('merge', 'dropped_quantity', ingredient=name, kept_dimension=bucket_dims[best], **dropped)
+        per_serving = total / weight
+        if unit is None:
+            unit = bucket_dims[best]
+        else:
+            per_serving /= to_canonical(unit)[1]
+        merged.append((name, round(per_serving * requested_servings, 3), unit))
+    return merged
@@ -0,0 +1,299 @@
+"""
+Process-wide pool of loaded LLM adapters.
+
+Loading a transformers model is the most expensive thing the synthesizer does,
+so every model is loaded at most once per process and shared by all requests.
+The pool keeps loaded models in LRU order and evicts the least recently used
+ones when the configured memory budget is exceeded.
+
+A failed load (no transformers, missing weights, server down) is remembered:
+for the back-off period get() hands out an UnavailableModel at once instead
+of attempting the imports and from_pretrained again, so the synthesizer goes
+straight to the rule engine. A background thread retries the load when the
+back-off expires (doubling it, up to the maximum, while it keeps failing) and
+puts the model in the pool as soon as it loads.
+
+Configuration (environment):
+    KITCHENMIND_MODEL_MEMORY_BUDGET_MB    total budget for loaded models (0 = unlimited)
+    KITCHENMIND_PRELOAD_MODELS            comma separated model names to load at API startup
+    KITCHENMIND_MODEL_RETRY_BACKOFF_S     seconds a failed load is remembered before the first retry
+                                          (0 = retry on every request)
+    KITCHENMIND_MODEL_RETRY_MAX_BACKOFF_S longest back-off between retries
+
+With KITCHENMIND_INFERENCE_SERVER set, the pool holds RemoteLLM adapters that
+generate on the shared inference server (inference_server.py) instead.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_MODEL_NAME = 'google/flan-t5-base'
+
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("KITCHENMIND_MODEL_MEMORY_BUDGET_MB", "0"))
+PRELOAD_MODELS = [
+    name.strip()
+    for name in os.getenv("KITCHENMIND_PRELOAD_MODELS", "").split(",")
+    if name.strip()
+]
+MODEL_RETRY_BACKOFF_S = float(os.getenv("KITCHENMIND_MODEL_RETRY_BACKOFF_S", "60"))
+MODEL_RETRY_MAX_BACKOFF_S = float(os.getenv("KITCHENMIND_MODEL_RETRY_MAX_BACKOFF_S", "900"))
+
+
+def estimate_model_bytes(llm) -> int:
+    """Best-effort size of a loaded adapter's weights in bytes (0 if unknown)."""
+    pipe = getattr(llm, '_pipe', None)
+    model = getattr(pipe, 'model', None)
+    if model is None or not hasattr(model, 'parameters'):
+        return 0
+    try:
+        return int(sum(p.numel() * p.element_size() for p in model.parameters()))
+    except Exception:
+        return 0
+
+
+def _release(llm):
+    """Let an adapter the pool no longer hands out free its resources (micro-batcher thread, sockets)."""
+    close = getattr(llm, 'close', None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            print(f"[DEBUG] ModelPool: closing {getattr(llm, 'model_name', llm)!r} failed: {e!r}")
+
+
+class UnavailableModel:
+    """Stand-in for a model whose load failed recently (see the pool's back-off)."""
+
+    def __init__(self, model_name: str, error):
+        self.model_name = model_name
+        self._init_error = error
+
+    def available(self) -> bool:
+        return False
+
+    def generate(self, prompt: str, **gen_kwargs) -> str:
+        raise RuntimeError(f"LLM pipeline for {self.model_name} is not available. Init error: {self._init_error}")
+
+
+class _Failure:
+    __slots__ = ("model", "backoff_s", "retry_at", "timer")
+
+    def __init__(self, model: UnavailableModel, backoff_s: float):
+        self.model = model
+        self.backoff_s = backoff_s
+        self.retry_at = time.monotonic() + backoff_s
+        self.timer = None
+
+
+class ModelPool:
+    """Thread-safe registry that hands out one shared adapter per model name."""
+
+    def __init__(self, loader: Callable, memory_budget_bytes: int = 0,
+                 retry_backoff_s: float = MODEL_RETRY_BACKOFF_S, max_backoff_s: float = MODEL_RETRY_MAX_BACKOFF_S):
+        self._loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.retry_backoff_s = retry_backoff_s
+        self.max_backoff_s = max(max_backoff_s, retry_backoff_s)
+        self._models: "OrderedDict[str, object]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._failures: Dict[str, _Failure] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self.stats = {"loads": 0, "hits": 0, "misses": 0, "failures": 0, "evictions": 0, "load_seconds": 0.0,
+                      "negative_hits": 0, "retries": 0, "recoveries": 0}
+
+    def _load_lock(self, model_name: str) -> threading.Lock:
+        with self._lock:
+            lock = self._load_locks.get(model_name)
+            if lock is None:
+                lock = threading.Lock()
+                self._load_locks[model_name] = lock
+            return lock
+
+    def _lookup(self, model_name: str):
+        with self._lock:
+            llm = self._models.get(model_name)
+            if llm is not None:
+                self._models.move_to_end(model_name)
+                self.stats["hits"] += 1
+                return llm
+            failure = self._failures.get(model_name)
+            if failure is not None:
+                self.stats["negative_hits"] += 1
+                return failure.model
+            return None
+
+    def get(self, model_name: str = DEFAULT_MODEL_NAME):
+        """Return the shared adapter for model_name, loading it on first use.
+
+        Concurrent callers asking for the same model wait on a per-model lock,
+        so the weights are only read from disk once. A failed load is returned
+        to the caller and, with a back-off configured, remembered: until the
+        background retry succeeds, get() returns an UnavailableModel without
+        trying again.
+        """
+        llm = self._lookup(model_name)
+        if llm is not None:
+            if not isinstance(llm, UnavailableModel) and not llm.available():
+                # a loaded adapter that stopped working (RemoteLLM whose server went away)
+                self._mark_failed(model_name, llm)
+            return llm
+        with self._load_lock(model_name):
+            # Another thread may have finished loading while we waited
+            llm = self._lookup(model_name)
+            if llm is not None:
+                return llm
+            with self._lock:
+                self.stats["misses"] += 1
+            return self._load(model_name)
+
+    def _load(self, model_name: str, backoff_s: Optional[float] = None):
+        # Caller holds the model's load lock
+        start = time.perf_counter()
+        llm = self._loader(model_name)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.stats["load_seconds"] += elapsed
+            if not llm.available():
+                self.stats["failures"] += 1
+                print(f"[DEBUG] ModelPool: load of {model_name!r} failed after {elapsed:.2f}s")
+                self._remember_failure(model_name, llm, backoff_s)
+                return llm
+            self.stats["loads"] += 1
+            self._failures.pop(model_name, None)
+            self._models[model_name] = llm
+            self._sizes[model_name] = estimate_model_bytes(llm)
+            self._evict_over_budget(keep=model_name)
+        print(f"[DEBUG] ModelPool: loaded {model_name!r} in {elapsed:.2f}s ({self._sizes.get(model_name, 0) // (1024 * 1024)} MB)")
+        return llm
+
+    def _mark_failed(self, model_name: str, llm):
+        with self._lock:
+            if self._models.get(model_name) is not llm:
+                return
+            del self._models[model_name]
+            self._sizes.pop(model_name, None)
+            _release(llm)
+            self.stats["failures"] += 1
+            self._remember_failure(model_name, llm, None)
+        print(f"[DEBUG] ModelPool: {model_name!r} is no longer available: {getattr(llm, '_init_error', None)}")
+
+    def _remember_failure(self, model_name: str, llm, backoff_s: Optional[float]):
+        # Caller holds self._lock
+        if self.retry_backoff_s <= 0:
+            return
+        backoff_s = self.retry_backoff_s if backoff_s is None else min(backoff_s, self.max_backoff_s)
+        failure = _Failure(UnavailableModel(model_name, getattr(llm, '_init_error', None)), backoff_s)
+        failure.timer = threading.Timer(backoff_s, self._retry, args=(model_name, failure))
+        failure.timer.daemon = True
+        self._failures[model_name] = failure
+        failure.timer.start()
+
+    def _retry(self, model_name: str, failure: _Failure):
+        """Background retry of a failed load once its back-off has expired."""
+        with self._load_lock(model_name):
+            with self._lock:
+                if self._failures.get(model_name) is not failure:
+                    return  # loaded, registered or cleared meanwhile
+                self.stats["retries"] += 1
+            llm = self._load(model_name, backoff_s=failure.backoff_s * 2)
+            if llm.available():
+                with self._lock:
+                    self.stats["recoveries"] += 1
+                print(f"[DEBUG] ModelPool: {model_name!r} is available again")
+
+    def _evict_over_budget(self, keep: Optional[str] = None):
+        # Caller holds self._lock. In-flight users keep their reference, the
+        # pool simply stops handing the evicted adapter out.
+        if not self.memory_budget_bytes:
+            return
+        while sum(self._sizes.values()) > self.memory_budget_bytes and len(self._models) > 1:
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            _release(self._models.pop(oldest))
+            self._sizes.pop(oldest, None)
+            self.stats["evictions"] += 1
+            print(f"[DEBUG] ModelPool: evicted {oldest!r} (memory budget {self.memory_budget_bytes} bytes)")
+
+    def register(self, model_name: str, llm, size_bytes: int = 0):
+        """Install an already-built adapter (e.g. a stub in benchmarks) under model_name."""
+        with self._lock:
+            self._failures.pop(model_name, None)
+            previous = self._models.get(model_name)
+            if previous is not None and previous is not llm:
+                _release(previous)
+            self._models[model_name] = llm
+            self._models.move_to_end(model_name)
+            self._sizes[model_name] = size_bytes
+            self._evict_over_budget(keep=model_name)
+
+    def preload(self, model_names: List[str]) -> Dict[str, bool]:
+        """Load the given models up front; returns availability per model."""
+        return {name: self.get(name).available() for name in model_names}
+
+    def evict(self, model_name: str) -> bool:
+        with self._lock:
+            llm = self._models.pop(model_name, None)
+            self._sizes.pop(model_name, None)
+            if llm is None:
+                return False
+            _release(llm)
+            self.stats["evictions"] += 1
+            return True
+
+    def clear(self):
+        with self._lock:
+            for llm in self._models.values():
+                _release(llm)
+            self._models.clear()
+            self._sizes.clear()
+            for failure in self._failures.values():
+                failure.timer.cancel()
+            self._failures.clear()
+
+    def loaded_models(self) -> List[str]:
+        with self._lock:
+            return list(self._models.keys())
+
+    def snapshot(self) -> Dict:
+        """Counters and current contents, for health checks and debugging."""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                **self.stats,
+                "loaded": list(self._models.keys()),
+                "unavailable": {
+                    name: {"error": str(f.model._init_error), "retry_in_s": round(max(0.0, f.retry_at - now), 1)}
+                    for name, f in self._failures.items()
+                },
+                "memory_bytes": sum(self._sizes.values()),
+                "memory_budget_bytes": self.memory_budget_bytes,
+            }
+
+
+_pool: Optional[ModelPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool() -> ModelPool:
+    """Return the process-wide model pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from .inference_server import INFERENCE_SERVER
+                if INFERENCE_SERVER:
+                    from .inference_server import RemoteLLM
+                    loader = lambda name: RemoteLLM(name, INFERENCE_SERVER)
+                else:
+                    from .synthesizer import Synthesizer
+                    loader = lambda name: Synthesizer.FreeOpenLLM(model_name=name)
+                _pool = ModelPool(
+                    loader=loader,
+                    memory_budget_bytes=MODEL_MEMORY_BUDGET_MB * 1024 * 1024,
+                )
+    return _pool
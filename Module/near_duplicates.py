@@ -0,0 +1,191 @@
+"""
+Near-duplicate indexes for step deduplication.
+
+_dedupe_steps keeps one step per group of near-duplicates, where two steps
+are near-duplicates when the Jaccard overlap of their fingerprint tokens is
+at least 0.40, and a new step is matched against the *first* kept step (in
+keep order) that is similar enough. Both indexes here answer exactly that
+question ("first similar kept key, or None"):
+
+- ExactIndex scans every kept key. O(kept) per step, exact.
+- MinHashLSHIndex hashes each token set into a MinHash signature and
+  buckets it by bands, so only keys sharing at least one band are verified
+  with the exact Jaccard. Candidate lookup is sublinear; a true match can
+  be missed with small probability (with the default 64 bands x 3 rows a pair
+  at Jaccard 0.40 shares a band with probability ~0.985; a miss only matters
+  when no other kept step is similar enough either).
+
+Configuration (environment):
+    KITCHENMIND_DEDUPE_MODE            exact | lsh | auto (auto = lsh for large step sets)
+    KITCHENMIND_DEDUPE_LSH_MIN_STEPS   step count from which auto switches to lsh
+    KITCHENMIND_DEDUPE_LSH_BANDS       number of bands
+    KITCHENMIND_DEDUPE_LSH_ROWS        rows per band (signature length = bands x rows)
+"""
+
+import os
+import random
+import zlib
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+DEDUPE_SIMILARITY = 0.40
+
+DEDUPE_MODE = os.getenv("KITCHENMIND_DEDUPE_MODE", "auto").strip().lower()
+DEDUPE_LSH_MIN_STEPS = int(os.getenv("KITCHENMIND_DEDUPE_LSH_MIN_STEPS", "500"))
+DEDUPE_LSH_BANDS = int(os.getenv("KITCHENMIND_DEDUPE_LSH_BANDS", "64"))
+DEDUPE_LSH_ROWS = int(os.getenv("KITCHENMIND_DEDUPE_LSH_ROWS", "3"))
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    inter = len(a & b)
+    union = len(a) + len(b) - inter
+    return (inter / union) if union else 0.0
+
+
+class ExactIndex:
+    """Linear scan over kept keys in keep order."""
+
+    def __init__(self, threshold: float = DEDUPE_SIMILARITY):
+        self.threshold = threshold
+        self._keys: Dict[str, FrozenSet[str]] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def add(self, key: str, tokens: FrozenSet[str]):
+        # Re-adding an existing key keeps its original position (dict semantics)
+        self._keys[key] = tokens
+
+    def remove(self, key: str):
+        self._keys.pop(key, None)
+
+    def first_match(self, tokens: FrozenSet[str]) -> Optional[str]:
+        for key, existing in self._keys.items():
+            if not existing:
+                continue
+            if jaccard(tokens, existing) >= self.threshold:
+                return key
+        return None
+
+
+class MinHasher:
+    """MinHash signatures over token sets using seeded universal hashing.
+
+    Token hashes use crc32 rather than hash() so signatures are stable across
+    processes (PYTHONHASHSEED) and can be compared between runs. The permuted
+    hashes of each token are cached, so a signature is an element-wise min
+    over a handful of cached vectors.
+    """
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+        self._token_hashes = lru_cache(maxsize=16384)(self._hash_token)
+        self._signature = lru_cache(maxsize=8192)(self._compute)
+
+    def _hash_token(self, token: str) -> Tuple[int, ...]:
+        h = zlib.crc32(token.encode('utf-8'))
+        return tuple(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for a, b in self._perms)
+
+    def _compute(self, tokens: FrozenSet[str]) -> Tuple[int, ...]:
+        if not tokens:
+            return (_MAX_HASH,) * self.num_perm
+        vectors = [self._token_hashes(t) for t in tokens]
+        if len(vectors) == 1:
+            return vectors[0]
+        return tuple(map(min, *vectors))
+
+    def signature(self, tokens: FrozenSet[str]) -> Tuple[int, ...]:
+        return self._signature(tokens)
+
+
+_hashers: Dict[Tuple[int, int], MinHasher] = {}
+
+
+def get_minhasher(num_perm: int, seed: int = 1) -> MinHasher:
+    """Shared hasher per (num_perm, seed) so signatures are cached across calls."""
+    key = (num_perm, seed)
+    hasher = _hashers.get(key)
+    if hasher is None:
+        hasher = _hashers[key] = MinHasher(num_perm, seed)
+    return hasher
+
+
+class MinHashLSHIndex:
+    """Banded MinHash LSH with exact verification of candidates.
+
+    Keys carry an insertion sequence number so that, among verified
+    candidates, the one kept earliest wins, matching ExactIndex.
+    """
+
+    def __init__(self, threshold: float = DEDUPE_SIMILARITY, bands: int = DEDUPE_LSH_BANDS,
+                 rows: int = DEDUPE_LSH_ROWS, seed: int = 1):
+        self.threshold = threshold
+        self.bands = max(int(bands), 1)
+        self.rows = max(int(rows), 1)
+        self._hasher = get_minhasher(self.bands * self.rows, seed)
+        self._buckets: List[Dict[Tuple[int, ...], Set[str]]] = [{} for _ in range(self.bands)]
+        self._keys: Dict[str, Tuple[FrozenSet[str], Tuple[Tuple[int, ...], ...], int]] = {}
+        self._seq = 0
+        self.stats = {"queries": 0, "candidates": 0}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def _bands(self, tokens: FrozenSet[str]) -> Tuple[Tuple[int, ...], ...]:
+        sig = self._hasher.signature(tokens)
+        r = self.rows
+        return tuple(sig[i * r:(i + 1) * r] for i in range(self.bands))
+
+    def add(self, key: str, tokens: FrozenSet[str]):
+        if key in self._keys:
+            return
+        bands = self._bands(tokens)
+        for band_idx, band in enumerate(bands):
+            self._buckets[band_idx].setdefault(band, set()).add(key)
+        self._keys[key] = (tokens, bands, self._seq)
+        self._seq += 1
+
+    def remove(self, key: str):
+        entry = self._keys.pop(key, None)
+        if entry is None:
+            return
+        for band_idx, band in enumerate(entry[1]):
+            bucket = self._buckets[band_idx].get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_idx][band]
+
+    def candidates(self, tokens: FrozenSet[str]) -> Set[str]:
+        found: Set[str] = set()
+        for band_idx, band in enumerate(self._bands(tokens)):
+            bucket = self._buckets[band_idx].get(band)
+            if bucket:
+                found.update(bucket)
+        return found
+
+    def first_match(self, tokens: FrozenSet[str]) -> Optional[str]:
+        self.stats["queries"] += 1
+        keys = self._keys
+        found = self.candidates(tokens)
+        self.stats["candidates"] += len(found)
+        # Verify in keep order so the first similar key wins, as in ExactIndex
+        for key in sorted(found, key=lambda k: keys[k][2]):
+            existing = keys[key][0]
+            if existing and jaccard(tokens, existing) >= self.threshold:
+                return key
+        return None
+
+
+def make_index(num_steps: int, mode: Optional[str] = None):
+    """Index for deduplicating num_steps steps under mode (default: KITCHENMIND_DEDUPE_MODE)."""
+    mode = (mode or DEDUPE_MODE).lower()
+    if mode == 'lsh' or (mode == 'auto' and num_steps >= DEDUPE_LSH_MIN_STEPS):
+        return MinHashLSHIndex()
+    return ExactIndex()
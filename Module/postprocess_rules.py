@@ -0,0 +1,513 @@
+"""
+Declarative post-processing rules for domain fixes to synthesized steps.
+
+The cuisine-specific fixes (soak before grind, ferment before cooking, soy
+sauce de-dup, fenugreek into the grind, the idli water hint, no salt in the
+steaming step) used to be hand-written passes, each scanning the whole step
+list again. Here each fix is a rule: a condition on the steps (LineTest) and
+an action (move, rewrite, keep-last, fold-into, ensure-mention).
+
+Rules are grouped by the pipeline stage that applies them. Each group is
+compiled once into an automaton over all the terms its line tests mention;
+applying it scans the steps once into a MatchTable (ingredient_matcher.py),
+skips every rule whose trigger terms do not occur, and lets the others find
+their lines through the table instead of re-reading the list. Actions keep
+the table in sync as they move and rewrite lines, so the scan is only
+repeated after a rule rebuilds the list.
+
+Every LineTest names at least one term, so a rule only ever looks at lines
+the scan found; a regex or callable may narrow those lines further.
+
+A new cuisine adds rules (get_rule_engine().add_rule(...)) rather than new
+passes. Rules can be switched off by name, and the old stage names
+(soak_grind_fix, ferment_before_cook, soy_dedupe, ...) are rule names, so
+KITCHENMIND_DISABLED_STAGES keeps working for them.
+
+Configuration (environment):
+    KITCHENMIND_DISABLED_RULES   comma separated rule names to skip
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Pattern, Sequence
+
+from . import synth_patterns as rx
+from .ingredient_matcher import IngredientMatcher, MatchTable
+from .synthesis_pipeline import BOTH_PATHS, FALLBACK, LLM
+from .synthesis_trace import current_trace
+
+DISABLED_RULES = [
+    name.strip()
+    for name in os.getenv("KITCHENMIND_DISABLED_RULES", "").split(",")
+    if name.strip()
+]
+
+
+class LineTest:
+    """Condition on one step: contains any of any_of (and all of all_of), then pattern / test.
+
+    Terms are matched as lowercase substrings (whole words with whole_word);
+    pattern is searched in the lowercased step, test gets the step itself.
+    """
+
+    __slots__ = ("any_of", "all_of", "whole_word", "pattern", "test")
+
+    def __init__(self, any_of: Sequence[str] = (), all_of: Sequence[str] = (), whole_word: bool = False,
+                 pattern: Optional[Pattern] = None, test: Optional[Callable[[str], Any]] = None):
+        if not any_of and not all_of:
+            raise ValueError("A LineTest needs at least one term to be indexed by")
+        self.any_of = tuple(any_of)
+        self.all_of = tuple(all_of)
+        self.whole_word = whole_word
+        self.pattern = pattern
+        self.test = test
+
+    @property
+    def terms(self) -> FrozenSet[str]:
+        return frozenset(self.any_of) | frozenset(self.all_of)
+
+    def lines(self, state: "RuleState", also: Optional[str] = None) -> List[int]:
+        """Sorted indices of the matching steps (that also contain the term `also`)."""
+        table, ww = state.table, self.whole_word
+        if self.any_of:
+            found = set()
+            for term in self.any_of:
+                found.update(table.lines_with(term, ww))
+        else:
+            found = set(table.lines_with(self.all_of[0], ww))
+        for term in self.all_of:
+            found.intersection_update(table.lines_with(term, ww))
+        if also is not None:
+            found.intersection_update(table.lines_with(also))
+        out = []
+        for i in sorted(found):
+            line = state.lines[i]
+            if self.pattern is not None and not self.pattern.search(line.lower()):
+                continue
+            if self.test is not None and not self.test(line):
+                continue
+            out.append(i)
+        return out
+
+    def first(self, state: "RuleState", also: Optional[str] = None) -> Optional[int]:
+        hits = self.lines(state, also)
+        return hits[0] if hits else None
+
+
+class RuleState:
+    """The step list and its match table while a rule group is applied."""
+
+    def __init__(self, matcher: IngredientMatcher, lines: List[str], ctx=None):
+        self.matcher = matcher
+        self.lines = list(lines)
+        self.table: MatchTable = matcher.scan(self.lines)
+        self.ctx = ctx
+        self.scans = 1
+
+    def move(self, src: int, dst: int):
+        self.lines.insert(dst, self.lines.pop(src))
+        self.table.move_line(src, dst)
+
+    def replace(self, index: int, line: str):
+        self.lines[index] = line
+        self.table.update_line(index, line)
+
+    def delete(self, index: int):
+        self.lines.pop(index)
+        self.table.delete_lines([index])
+
+    def reset(self, lines: List[str]):
+        """Replace the whole list (and rescan it)."""
+        self.lines = list(lines)
+        self.table = self.matcher.scan(self.lines)
+        self.scans += 1
+
+
+class Rule:
+    """A named condition -> action applied by one pipeline stage.
+
+    requires lists groups of terms; the rule only runs if every group has a
+    term that occurs somewhere in the steps. when(ctx) can restrict it
+    further (e.g. to idli-style batters).
+    """
+
+    def __init__(self, name: str, stage: str, requires: Sequence[Sequence[str]] = (),
+                 paths: Iterable[str] = BOTH_PATHS, when: Optional[Callable[[Any], bool]] = None):
+        self.name = name
+        self.stage = stage
+        self.requires = tuple(tuple(group) for group in requires)
+        self.paths = frozenset(paths)
+        self.when = when
+
+    @property
+    def terms(self) -> FrozenSet[str]:
+        return frozenset(t for group in self.requires for t in group)
+
+    def triggered(self, table: MatchTable) -> bool:
+        return all(any(table.has(t) for t in group) for group in self.requires)
+
+    def apply(self, state: RuleState):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r}, stage={self.stage!r})"
+
+
+class MoveFirstBefore(Rule):
+    """For each key term: if the first mover line with it comes after the first anchor line with it, move it just before."""
+
+    def __init__(self, name, stage, mover: LineTest, anchor: LineTest, keys: Sequence[str], trace_label: str, **kw):
+        kw.setdefault('requires', (tuple(mover.terms), tuple(anchor.terms), tuple(keys)))
+        super().__init__(name, stage, **kw)
+        self.mover, self.anchor, self.keys, self.trace_label = mover, anchor, tuple(keys), trace_label
+
+    @property
+    def terms(self):
+        return super().terms | self.mover.terms | self.anchor.terms | frozenset(self.keys)
+
+    def apply(self, state):
+        trace = current_trace()
+        for key in self.keys:
+            src = self.mover.first(state, also=key)
+            dst = self.anchor.first(state, also=key)
+            if src is not None and dst is not None and src > dst:
+                line = state.lines[src]
+                state.move(src, dst)
+                if trace.enabled:
+                    trace.event(self.trace_label, 'move_soak_before_grind', token=key, line=line, src=src, dst=dst)
+
+
+class MoveAllBefore(Rule):
+    """Move every mover line that comes after the first anchor line to just before it, keeping their order."""
+
+    def __init__(self, name, stage, mover: LineTest, anchor: LineTest, trace_event=('rules', 'move'), **kw):
+        kw.setdefault('requires', (tuple(mover.terms), tuple(anchor.terms)))
+        super().__init__(name, stage, **kw)
+        self.mover, self.anchor, self.trace_event = mover, anchor, trace_event
+
+    @property
+    def terms(self):
+        return super().terms | self.mover.terms | self.anchor.terms
+
+    def apply(self, state):
+        trace = current_trace()
+        anchor_idx = self.anchor.first(state)
+        if anchor_idx is None:
+            return
+        for src in self.mover.lines(state):
+            # moving a later line up leaves the positions of the lines after it unchanged
+            if src > anchor_idx:
+                line = state.lines[src]
+                state.move(src, anchor_idx)
+                if trace.enabled:
+                    trace.event(*self.trace_event, line=line, src=src, dst=anchor_idx)
+                anchor_idx += 1
+
+
+class RewriteLines(Rule):
+    """Rewrite every matching line with rewrite(line)."""
+
+    def __init__(self, name, stage, match: LineTest, rewrite: Callable[[str], str], trace_event=('rules', 'rewrite'), **kw):
+        kw.setdefault('requires', tuple((t,) for t in match.all_of) or (match.any_of,))
+        super().__init__(name, stage, **kw)
+        self.match, self.rewrite, self.trace_event = match, rewrite, trace_event
+
+    @property
+    def terms(self):
+        return super().terms | self.match.terms
+
+    def apply(self, state):
+        trace = current_trace()
+        for i in self.match.lines(state):
+            before = state.lines[i]
+            after = self.rewrite(before)
+            if after != before:
+                state.replace(i, after)
+                if trace.enabled:
+                    trace.event(*self.trace_event, before=before, after=after)
+
+
+class KeepLastMention(Rule):
+    """When several steps mention term, keep the last one and pass the earlier ones through rewrite (None drops them)."""
+
+    def __init__(self, name, stage, term: str, rewrite: Callable[[str], Optional[str]],
+                 trace_event=('rules', 'keep_last'), **kw):
+        kw.setdefault('requires', ((term,),))
+        super().__init__(name, stage, **kw)
+        self.term, self.rewrite, self.trace_event = term, rewrite, trace_event
+
+    @property
+    def terms(self):
+        return super().terms | {self.term}
+
+    def apply(self, state):
+        mentions = state.table.lines_with(self.term, whole_word=True)
+        if len(mentions) <= 1:
+            return
+        keep = mentions[-1]
+        earlier = set(mentions[:-1])
+        out = []
+        for i, line in enumerate(state.lines):
+            # Autogenerated coverage steps need all their ingredients; only their marker goes
+            if line.startswith('[AUTO-GEN]'):
+                out.append(line.replace('[AUTO-GEN] ', ''))
+            elif i in earlier:
+                rewritten = self.rewrite(line)
+                if rewritten:
+                    out.append(rewritten)
+            else:
+                out.append(line)
+        trace = current_trace()
+        if trace.enabled:
+            trace.event(*self.trace_event, kept=state.lines[keep], before=len(state.lines), after=len(out))
+        state.reset(out)
+
+
+class FoldInto(Rule):
+    """Mention term in the first target line, and trim it from the first line that had it (drop that line if little is left)."""
+
+    def __init__(self, name, stage, term: str, target: LineTest, suffix: str, trim: Callable[[str], str],
+                 trace_event=('rules', 'fold_into'), **kw):
+        kw.setdefault('requires', ((term,), tuple(target.terms)))
+        super().__init__(name, stage, **kw)
+        self.term, self.target, self.suffix, self.trim, self.trace_event = term, target, suffix, trim, trace_event
+
+    @property
+    def terms(self):
+        return super().terms | {self.term} | self.target.terms
+
+    def apply(self, state):
+        src = state.table.first(self.term)
+        dst = self.target.first(state)
+        if src is None or dst is None or src == dst:
+            return
+        if not state.table.in_line(self.term, dst):
+            folded = state.lines[dst].rstrip(' .;') + self.suffix
+            state.replace(dst, folded)
+            trace = current_trace()
+            if trace.enabled:
+                trace.event(*self.trace_event, source=state.lines[src], grind=folded)
+        trimmed = self.trim(state.lines[src]).rstrip(' .;')
+        if len(trimmed.split()) < 3:
+            state.delete(src)
+        else:
+            state.replace(src, trimmed + '.')
+
+
+class EnsureMention(Rule):
+    """Append suffix to the first target line unless it already mentions term."""
+
+    def __init__(self, name, stage, target: LineTest, term: str, suffix: str, trace_event=('rules', 'ensure'), **kw):
+        kw.setdefault('requires', (tuple(target.terms),))
+        super().__init__(name, stage, **kw)
+        self.target, self.term, self.suffix, self.trace_event = target, term, suffix, trace_event
+
+    @property
+    def terms(self):
+        return super().terms | {self.term} | self.target.terms
+
+    def apply(self, state):
+        dst = self.target.first(state)
+        if dst is None or state.table.in_line(self.term, dst):
+            return
+        state.replace(dst, state.lines[dst].rstrip(' .;') + self.suffix)
+        trace = current_trace()
+        if trace.enabled:
+            trace.event(*self.trace_event, step=state.lines[dst])
+
+
+class RuleEngine:
+    """Rules grouped by stage, each group compiled into one automaton."""
+
+    def __init__(self, rules: Iterable[Rule] = (), disabled: Iterable[str] = ()):
+        self._rules: List[Rule] = []
+        self._compiled: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.disabled = set()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        for rule in rules:
+            self.add_rule(rule)
+        for name in disabled:
+            self.disable(name)
+
+    def add_rule(self, rule: Rule, before: Optional[str] = None):
+        """Register rule (at the end of its stage, or before the rule named before)."""
+        with self._lock:
+            if any(r.name == rule.name for r in self._rules):
+                raise ValueError(f"Duplicate post-processing rule {rule.name!r}")
+            pos = len(self._rules)
+            if before is not None:
+                pos = next((i for i, r in enumerate(self._rules) if r.name == before), pos)
+            self._rules.insert(pos, rule)
+            self._compiled.pop(rule.stage, None)
+
+    def has_rule(self, name: str) -> bool:
+        return any(r.name == name for r in self._rules)
+
+    def disable(self, name: str):
+        if not self.has_rule(name):
+            raise ValueError(f"Unknown post-processing rule {name!r}")
+        self.disabled.add(name)
+
+    def enable(self, name: str):
+        self.disabled.discard(name)
+
+    def rules_for(self, stage: str) -> List[Rule]:
+        return [r for r in self._rules if r.stage == stage]
+
+    def _compiled_stage(self, stage: str):
+        compiled = self._compiled.get(stage)
+        if compiled is None:
+            with self._lock:
+                rules = self.rules_for(stage)
+                terms = sorted(set().union(*(r.terms for r in rules))) if rules else []
+                compiled = self._compiled[stage] = (rules, IngredientMatcher([], terms))
+        return compiled
+
+    def apply(self, stage: str, lines: List[str], ctx=None, path: Optional[str] = None) -> List[str]:
+        """Run the rules of stage over lines (one scan) and return the new list."""
+        rules, matcher = self._compiled_stage(stage)
+        if not rules or not lines:
+            return lines
+        path = path or getattr(ctx, 'path', None)
+        state = None
+        for rule in rules:
+            if rule.name in self.disabled or (path is not None and path not in rule.paths):
+                continue
+            if rule.when is not None and not rule.when(ctx):
+                continue
+            if state is None:
+                state = RuleState(matcher, lines, ctx)
+            if not rule.triggered(state.table):
+                continue
+            rule.apply(state)
+            self._count(rule.name)
+        return lines if state is None else state.lines
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {s: [r.name for r in self.rules_for(s)] for s in dict.fromkeys(r.stage for r in self._rules)},
+                "fired": dict(self.stats),
+                "disabled": sorted(self.disabled),
+            }
+
+
+# --- domain predicates and rewrites -------------------------------------------------
+
+def is_pure_soak(s: str) -> bool:
+    """Treat only standalone soak/soaked as a soak step — ignore if other cooking verbs are present."""
+    low = s.lower()
+    # must contain soak / soaked
+    if not rx.SOAK_OR_SOAKED.search(low):
+        return False
+    # if any other cooking verb exists in the same sentence, don't treat as a pure soak
+    if rx.NON_SOAK_ACTIONS.search(low):
+        return False
+    return True
+
+
+def has_idli_base(merged_ings) -> bool:
+    return (any('rice' in ing.name.lower() for ing in merged_ings)
+            and any('urad' in ing.name.lower() for ing in merged_ings))
+
+
+def strip_salt_from_steam(s: str) -> str:
+    """Remove patterns like "add salt and", "add salt,", "add salt" but preserve other salt occurrences."""
+    s = rx.ADD_SALT.sub('', s)
+    s = rx.SALT_COMMA_AND.sub('', s)
+    s = rx.TRAILING_SALT.sub('', s)
+    # cleanup leftover punctuation/whitespace
+    s = rx.WHITESPACE.sub(' ', s).strip()
+    s = rx.SPACE_BEFORE_COMMA.sub(',', s)
+    if s and not s.endswith('.'):
+        s = s + '.'
+    return s
+
+
+def strip_earlier_soy(line: str) -> Optional[str]:
+    """An earlier soy sauce step once a later one adds it: salvage the rest, or drop it."""
+    s2 = rx.ADD_SOY_SAUCE_I.sub('', line)
+    s2 = rx.AND_SOY_SAUCE_I.sub('', s2)
+    s2 = rx.SOY_SAUCE_I.sub('', s2)
+    # If line starts with "Add soy" or "Combine...soy" it's a soy-focused step
+    if rx.SOY_LEAD_I.search(line):
+        s2 = rx.LEADING_AND.sub('', s2).strip()
+        s2 = rx.MULTI_SPACE.sub(' ', s2).strip(' ,.')
+        # Keep only if other substantial ingredients remain (not just action words)
+        if s2 and len(s2.split()) >= 3 and rx.STIR_FRY_INGREDIENTS_I.search(s2):
+            return s2 if s2.endswith('.') else s2 + '.'
+        return None
+    # Mentions soy but is about something else (e.g. "Add vegetables and soy sauce"): keep the rest
+    s2 = rx.DOT_AND_THEN.sub('. ', s2)
+    s2 = rx.LEADING_AND.sub('', s2).strip()
+    s2 = rx.MULTI_SPACE.sub(' ', s2).strip(' ,.')
+    if s2 and not rx.LEADING_AND_THEN.search(s2):
+        return s2 if s2.endswith('.') else s2 + '.'
+    return None
+
+
+def trim_fenugreek(line: str) -> str:
+    cleaned = rx.WITH_SALT_AND_FENUGREEK_I.sub(' with salt', line)
+    return rx.AND_FENUGREEK_I.sub('', cleaned).strip()
+
+
+# Ingredients whose soak line must come before their grind line
+SOAK_GRIND_TOKENS = ['rice', 'urad', 'dal', 'semolina', 'besan', 'flour']
+COOK_WORDS = ('steam', 'cook', 'bake', 'fry', 'grill', 'roast', 'simmer')
+
+_PURE_SOAK = LineTest(any_of=('soak',), test=is_pure_soak)
+_SOAK = LineTest(any_of=('soak',), pattern=rx.SOAK)
+_GRIND_ANYWHERE = LineTest(any_of=('grind',))
+_GRIND = LineTest(any_of=('grind',), pattern=rx.GRIND)
+_FERMENT = LineTest(any_of=('ferment',), pattern=rx.FERMENT)
+_COOK = LineTest(any_of=COOK_WORDS)
+
+
+def _idli_batter(ctx) -> bool:
+    return ctx is not None and has_idli_base(ctx.merged_ings)
+
+
+def default_rules() -> List[Rule]:
+    return [
+        # fallback draft, right after reorder_steps: only standalone soak lines move
+        MoveFirstBefore('soak_before_grind', 'soak_before_grind', _PURE_SOAK, _GRIND_ANYWHERE,
+                        SOAK_GRIND_TOKENS, 'synthesize', paths={FALLBACK}),
+        # start of merge_semantic_steps
+        RewriteLines('steam_salt_strip', 'merge_semantic', LineTest(all_of=('steam', 'salt')),
+                     strip_salt_from_steam, trace_event=('merge', 'strip_salt_from_steam')),
+        # after dedupe: final ordering safety net; model output may fold soaking into other steps
+        MoveFirstBefore('soak_grind_fix', 'order_rules', _PURE_SOAK, _GRIND,
+                        SOAK_GRIND_TOKENS, 'synthesize', paths={FALLBACK}),
+        MoveFirstBefore('soak_grind_fix_llm', 'order_rules', _SOAK, _GRIND,
+                        SOAK_GRIND_TOKENS, 'synthesize', paths={LLM}),
+        MoveAllBefore('ferment_before_cook', 'order_rules', _FERMENT, _COOK,
+                      trace_event=('ferment', 'move_ferment_before_cook')),
+        # model output, last touches
+        KeepLastMention('soy_dedupe', 'finish_rules', 'soy sauce', strip_earlier_soy,
+                        trace_event=('soy', 'dedupe_soy_sauce'), paths={LLM}),
+        FoldInto('idli_fenugreek', 'finish_rules', 'fenugreek', LineTest(any_of=('grind',)),
+                 '; include fenugreek while grinding.', trim_fenugreek,
+                 trace_event=('fenugreek', 'move_into_grind'), paths={LLM}, when=_idli_batter),
+        EnsureMention('idli_water_hint', 'finish_rules', LineTest(any_of=('grind',)), 'water',
+                      '; add water as needed to reach a smooth batter.',
+                      trace_event=('idli', 'water_hint'), paths={LLM}, when=_idli_batter),
+    ]
+
+
+_engine: Optional[RuleEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_rule_engine() -> RuleEngine:
+    """Return the process-wide rule engine with the default rules, configured from the environment on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RuleEngine(default_rules(), disabled=DISABLED_RULES)
+    return _engine
@@ -0,0 +1,157 @@
+"""
+One model batch for the prompts of several concurrent syntheses.
+
+A batch request (POST /recipe/synthesize/batch) synthesizes every dish on a
+thread of its own. Each thread joins a PromptBatch as a participant; when its
+synthesis reaches the model, the prompt is handed to the batch instead of the
+model, and the thread waits. Once every participant has either submitted a
+prompt or finished without needing the model (cache hit, no model loaded,
+error), the last one to arrive runs all prompts through the model at once
+(FreeOpenLLM.generate_batch: one padded forward pass per chunk of
+KITCHENMIND_BATCH_MAX_SIZE) and hands each participant its text.
+
+Unlike the micro-batcher, which groups whatever arrives within a time
+window, this waits for exactly the prompts of the request, so a batch of N
+dishes costs one model call whatever the timing of the other stages.
+
+run_batched() runs a list of syntheses that way. Like the stream, the
+participant of the current thread lives in a context variable and is a shared
+null object outside a batch:
+
+    batch = current_prompt_batch()
+    if batch.enabled:
+        text = batch.generate(llm, prompt, **gen_kwargs)
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .inference_batcher import _kwargs_key
+
+
+class _NullParticipant:
+    """Stand-in outside a batch."""
+
+    enabled = False
+
+    def generate(self, llm, prompt: str, **gen_kwargs) -> str:
+        return llm.generate(prompt, **gen_kwargs)
+
+
+NULL_PARTICIPANT = _NullParticipant()
+
+
+class _Participant:
+    enabled = True
+
+    def __init__(self, batch: "PromptBatch"):
+        self.batch = batch
+        self.submitted = False
+        self.done = threading.Event()
+        self.result: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+    def generate(self, llm, prompt: str, **gen_kwargs) -> str:
+        if self.submitted:
+            # a second prompt from the same synthesis does not wait for anyone
+            return llm.generate(prompt, **gen_kwargs)
+        self.batch._submit(self, llm, prompt, gen_kwargs)
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class PromptBatch:
+    """Collects one prompt per participant and runs them as one model batch once all have arrived."""
+
+    def __init__(self, participants: int):
+        self._waiting = participants
+        self._pending: List[Tuple[_Participant, Any, str, Dict]] = []
+        self._lock = threading.Lock()
+        self.calls = 0  # model invocations made for this batch
+        self.prompts = 0
+
+    @contextmanager
+    def participant(self):
+        """Join the batch for the duration of one synthesis (on the thread running it)."""
+        p = _Participant(self)
+        token = _current.set(p)
+        try:
+            yield p
+        finally:
+            _current.reset(token)
+            if not p.submitted:
+                self._arrive(None)
+
+    def _submit(self, p: _Participant, llm, prompt: str, gen_kwargs: Dict):
+        p.submitted = True
+        self._arrive((p, llm, prompt, gen_kwargs))
+
+    def _arrive(self, item):
+        with self._lock:
+            if item is not None:
+                self._pending.append(item)
+            self._waiting -= 1
+            if self._waiting > 0:
+                return
+            pending, self._pending = self._pending, []
+        self._run(pending)
+
+    def _run(self, pending):
+        # same model and generation settings -> one call
+        groups: Dict[Tuple, List] = {}
+        for item in pending:
+            groups.setdefault((id(item[1]), _kwargs_key(item[3])), []).append(item)
+        for items in groups.values():
+            llm, gen_kwargs = items[0][1], items[0][3]
+            prompts = [prompt for _, _, prompt, _ in items]
+            try:
+                if hasattr(llm, 'generate_batch'):
+                    outs = llm.generate_batch(prompts, **gen_kwargs)
+                    self.calls += 1
+                else:
+                    outs = [llm.generate(prompt, **gen_kwargs) for prompt in prompts]
+                    self.calls += len(prompts)
+                self.prompts += len(prompts)
+                for (p, _, _, _), out in zip(items, outs):
+                    p.result = out
+            except Exception as e:
+                for p, _, _, _ in items:
+                    p.error = e
+            for p, _, _, _ in items:
+                p.done.set()
+
+
+_current: ContextVar = ContextVar("kitchenmind_prompt_batch", default=NULL_PARTICIPANT)
+
+
+def current_prompt_batch():
+    """Participant of the synthesis running on this thread (NULL_PARTICIPANT outside a batch)."""
+    return _current.get()
+
+
+def run_batched(calls: List[Callable[[], Any]]) -> List[Any]:
+    """Run the calls concurrently, one thread each, as the participants of one PromptBatch.
+
+    Returns each call's result, or the exception it raised, in order.
+    """
+    batch = PromptBatch(len(calls))
+    results: List[Any] = [None] * len(calls)
+
+    def _run(i: int, call: Callable[[], Any]):
+        with batch.participant():
+            try:
+                results[i] = call()
+            except Exception as e:
+                results[i] = e
+
+    threads = [threading.Thread(target=_run, args=(i, call), name=f"prompt-batch-{i}", daemon=True)
+               for i, call in enumerate(calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
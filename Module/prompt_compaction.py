@@ -0,0 +1,92 @@
+"""
+Prompt compaction: a bounded model input whatever the number of sources.
+
+The synthesis prompt used to list every canonicalized step of every source
+plus the prep lines derived from the ingredients. Two sources of the same dish
+repeat most of their actions, and every repeat costs encoder time; past the
+model's input length (512 tokens for flan-t5) the tail of the prompt, with
+the instructions on how to answer, was silently truncated.
+
+The compact_prompt stage (LLM path, before generate_llm) now
+
+  1. collapses near-duplicate source actions with the step fingerprints
+     (Synthesizer._dedupe_steps: one action per cluster, the most informative
+     variant, in first-seen order), then
+  2. fits the actions into KITCHENMIND_PROMPT_TOKEN_BUDGET tokens, measured
+     with the model's own tokenizer (llm.count_tokens; an estimate of four
+     characters per token for adapters without one): actions are taken in
+     order and one that does not fit is left out, so a long action does not
+     cost the shorter ones after it their place.
+
+The counts are reported per request in metadata['prompt'] (tokens, source
+and prompt actions, whether the count is exact) and the input token count in
+the synthesize response; process-wide totals are in stats.
+
+Configuration (environment):
+    KITCHENMIND_PROMPT_TOKEN_BUDGET   max input tokens of a synthesis prompt (0 = no limit)
+    KITCHENMIND_PROMPT_DEDUPE         1 (default) = collapse near-duplicate actions | 0 = keep them all
+"""
+
+import math
+import os
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("KITCHENMIND_PROMPT_TOKEN_BUDGET", "512"))
+PROMPT_DEDUPE = os.getenv("KITCHENMIND_PROMPT_DEDUPE", "1").lower() in ("1", "true", "yes")
+
+stats = {"prompts": 0, "tokens": 0, "source_steps": 0, "deduped_steps": 0, "dropped_steps": 0, "estimated": 0}
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for adapters without a tokenizer (about four characters per token)."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def count_tokens(llm, texts: Sequence[str]) -> Tuple[List[int], bool]:
+    """Token count of each text with llm's tokenizer; returns (counts, exact)."""
+    counter = getattr(llm, 'count_tokens', None)
+    if counter is not None:
+        try:
+            return list(counter(list(texts))), True
+        except Exception as e:
+            print(f"[DEBUG] prompt_compaction: count_tokens failed ({e!r}), estimating")
+    return [estimate_tokens(t) for t in texts], False
+
+
+def fit_to_budget(steps: List[str], build: Callable[[List[str]], str], count: Callable[[Sequence[str]], List[int]],
+                  budget: int) -> Tuple[List[str], str, int]:
+    """(kept steps, prompt, prompt tokens) with the prompt built from as many steps as fit in budget tokens.
+
+    Steps keep their order; one that does not fit is skipped. At least one step is kept.
+    """
+    if budget <= 0 or not steps:
+        prompt = build(steps)
+        return steps, prompt, count([prompt])[0]
+    counts = count([build([])] + [f"- {s}" for s in steps])
+    total, kept = counts[0], []
+    for step, n in zip(steps, counts[1:]):
+        if total + n <= budget:
+            kept.append(step)
+            total += n
+    if not kept:
+        kept = steps[:1]
+    prompt = build(kept)
+    tokens = count([prompt])[0]
+    # per-line counts are close but not additive: trim until the whole prompt fits
+    while tokens > budget and len(kept) > 1:
+        kept.pop()
+        prompt = build(kept)
+        tokens = count([prompt])[0]
+    return kept, prompt, tokens
+
+
+def record(prompt_stats: Dict):
+    with _stats_lock:
+        stats["prompts"] += 1
+        stats["tokens"] += prompt_stats["tokens"]
+        stats["source_steps"] += prompt_stats["source_steps"]
+        stats["deduped_steps"] += prompt_stats["source_steps"] - prompt_stats["distinct_steps"]
+        stats["dropped_steps"] += prompt_stats["distinct_steps"] - prompt_stats["steps"]
+        stats["estimated"] += not prompt_stats["exact"]
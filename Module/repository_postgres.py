@@ -1,13 +1,16 @@
 """
 PostgreSQL-based repository implementation for KitchenMind.
 """
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 import uuid
 import datetime
 from .database import Recipe as DBRecipe, Ingredient as DBIngredient, Step as DBStep
 from Module.models import Recipe as RecipeModel, Ingredient
 from Module.utils_time import get_india_time
+from Module.synthesis_cache import get_synthesis_cache
+from Module import dish_aggregates, step_features
 
 
 class PostgresRecipeRepository:
@@ -23,13 +26,41 @@ class PostgresRecipeRepository:
             return self._to_model(db_recipe)
         return None
 
+    def find_drafts(self, keys: Iterable[Tuple[str, int]], created_by: str) -> Dict[Tuple[str, int], RecipeModel]:
+        """find_draft for several (title, servings) pairs of one user, in one query."""
+        keys = set(keys)
+        if not keys:
+            return {}
+        db_recipes = self.db.query(self.model).filter(
+            self.model.dish_name.in_({title for title, _ in keys}),
+            self.model.created_by == created_by,
+            self.model.is_published == False
+        ).all()
+        drafts = {}
+        for db_recipe in db_recipes:
+            key = (db_recipe.dish_name, db_recipe.servings)
+            if key in keys and key not in drafts:
+                drafts[key] = self._to_model(db_recipe)
+        return drafts
+
     @staticmethod
     def extract_minutes(instruction):
-        import re
-        match = re.search(r"(\d+)\s*(minute|min)s?", instruction.lower())
-        if match:
-            return int(match.group(1))
-        return None
+        return step_features.extract_minutes(instruction)
+
+    @staticmethod
+    def _build_steps(version_id, steps):
+        """Step rows for a new version, with their synthesis features computed up front."""
+        rows = []
+        for idx, step_text in enumerate(steps):
+            row = DBStep(
+                step_id=str(uuid.uuid4()),
+                version_id=version_id,
+                step_order=idx,
+                instruction=step_text,
+            )
+            step_features.apply_to_row(row)
+            rows.append(row)
+        return rows
     def list(self) -> list:
         """Return all recipes in the database as RecipeModel objects."""
         db_recipes = self.db.query(self.model).all()
@@ -76,8 +107,11 @@ class PostgresRecipeRepository:
         feedbacks = self.db.query(Feedback).filter(Feedback.version_id == version_id).all()
         return [min(max(fb.rating, 0), 5) for fb in feedbacks if fb.rating is not None]
 
-    def create_recipe(self, title, ingredients, steps, servings, submitted_by=None, approved=False):
-        """Create and persist a new recipe, returning the Recipe model with id. Prevent duplicate drafts."""
+    def create_recipe(self, title, ingredients, steps, servings, submitted_by=None, approved=False, commit=True):
+        """Create and persist a new recipe, returning the Recipe model with id. Prevent duplicate drafts.
+
+        commit=False only flushes, leaving the transaction to the caller (batch synthesis).
+        """
         print(f"[DEBUG] create_recipe called with title={title}, servings={servings}, submitted_by={submitted_by}, approved={approved}")
         # If this is a draft (not approved/published), check for existing draft and update it
         if not approved:
@@ -113,23 +147,15 @@ class PostgresRecipeRepository:
                             ) for ing in safe_ingredients
                         ]
 
-                        version.steps = []
-                        for idx, step_text in enumerate(steps):
-                            minutes = self.extract_minutes(step_text)
-                            version.steps.append(DBStep(
-                                step_id=str(uuid.uuid4()),
-                                version_id=version.version_id,
-                                step_order=idx,
-                                instruction=step_text,
-                                minutes=minutes
-                            ))
+                        version.steps = self._build_steps(version.version_id, steps)
 
                         version.base_servings = servings if servings is not None else db_recipe.servings
                         # Recipe.servings stays immutable (original submission)
                         # version.base_servings holds this version's serving size
                         db_recipe.dish_name = title
 
-                        self.db.commit()
+                        self._commit(commit)
+                        get_synthesis_cache().invalidate_recipe(db_recipe.recipe_id)
                         self.db.refresh(db_recipe)
                         print(f"[DEBUG] Draft updated and returned: id={getattr(db_recipe, 'recipe_id', None)}")
                         return self._to_model(db_recipe)
@@ -157,8 +183,10 @@ class PostgresRecipeRepository:
         # Now set the version_id on the recipe after version is persisted
         db_recipe.version_id = version_id
         self.db.add(db_recipe)
+        if approved:
+            dish_aggregates.add_version(self.db, title, db_version)
         print(f"[DEBUG] db_version and db_recipe added to session")
-        self.db.commit()
+        self._commit(commit)
         print(f"[DEBUG] db_recipe committed")
         self.db.refresh(db_recipe)
         print(f"[DEBUG] After commit: db_recipe.recipe_id={getattr(db_recipe, 'recipe_id', None)}")
@@ -196,20 +224,11 @@ class PostgresRecipeRepository:
                 unit=ing.unit
             ) for ing in safe_ingredients
         ]
-        db_version.steps = []
-        for idx, step_text in enumerate(steps):
-            minutes = self.extract_minutes(step_text)
-            db_version.steps.append(DBStep(
-                step_id=str(uuid.uuid4()),
-                version_id=version_id,
-                step_order=idx,
-                instruction=step_text,
-                minutes=minutes
-            ))
+        db_version.steps = self._build_steps(version_id, steps)
         return db_version
 
-    def add_version_to_recipe(self, recipe_id: str, ingredients, steps, servings, submitted_by=None):
-        """Add a new version to an existing recipe. Returns the updated Recipe model."""
+    def add_version_to_recipe(self, recipe_id: str, ingredients, steps, servings, submitted_by=None, commit=True):
+        """Add a new version to an existing recipe. Returns the updated Recipe model (commit=False: flush only)."""
         import datetime
         db_recipe = self.db.query(DBRecipe).filter(DBRecipe.recipe_id == recipe_id).first()
         if not db_recipe:
@@ -222,7 +241,9 @@ class PostgresRecipeRepository:
         # New version's servings stored in version.base_servings
         
         self.db.add(db_version)
-        self.db.commit()
+        self._commit(commit)
+        # Cached syntheses built from the previous version are no longer current
+        get_synthesis_cache().invalidate_recipe(recipe_id)
         self.db.refresh(db_recipe)
         print(f"[DEBUG] Added version {version_id} to recipe {recipe_id}, new servings: {servings}")
         return self._to_model(db_recipe)
@@ -233,8 +254,14 @@ class PostgresRecipeRepository:
         self.db = db
         self.model = DBRecipe  # Set self.model to the Recipe SQLAlchemy model
     
-    def add(self, recipe: RecipeModel):
-        """Add a new recipe to the database, with a version, ingredients, and steps."""
+    def _commit(self, commit: bool = True):
+        if commit:
+            self.db.commit()
+        else:
+            self.db.flush()
+
+    def add(self, recipe: RecipeModel, commit: bool = True):
+        """Add a new recipe to the database, with a version, ingredients, and steps (commit=False: flush only)."""
         print(f"[DEBUG] PostgresRecipeRepository.add: Adding recipe with id={getattr(recipe, 'id', None)}, title={getattr(recipe, 'title', None)}, approved={getattr(recipe, 'approved', None)}")
         import datetime
         recipe_id = recipe.id if hasattr(recipe, 'id') else str(uuid.uuid4())
@@ -279,7 +306,9 @@ class PostgresRecipeRepository:
         # Now set the version_id on the recipe after version is persisted
         db_recipe.version_id = version_id
         self.db.add(db_recipe)
-        self.db.commit()
+        if recipe.approved:
+            dish_aggregates.add_version(self.db, recipe.title, db_version)
+        self._commit(commit)
         self.db.refresh(db_recipe)
         print(f"[DEBUG] PostgresRecipeRepository.add: DBRecipe after add: recipe_id={db_recipe.recipe_id}, is_published={db_recipe.is_published}, created_by={db_recipe.created_by}")
 
@@ -301,6 +330,17 @@ class PostgresRecipeRepository:
             DBRecipe.dish_name.ilike(f"%{title}%")
         ).all()
         return [self._to_model(r) for r in db_recipes]
+
+    def find_by_titles(self, titles: Iterable[str]) -> Dict[str, List[RecipeModel]]:
+        """find_by_title for several titles in one query; maps each title to its matches."""
+        titles = list(dict.fromkeys(titles))
+        if not titles:
+            return {}
+        db_recipes = self.db.query(DBRecipe).filter(
+            or_(*[DBRecipe.dish_name.ilike(f"%{title}%") for title in titles])
+        ).all()
+        models = [(r.dish_name.lower(), self._to_model(r)) for r in db_recipes if r.dish_name]
+        return {title: [m for name, m in models if title.lower() in name] for title in titles}
     
     def pending(self) -> List[RecipeModel]:
         """Get all pending (unapproved) recipes."""
@@ -334,6 +374,8 @@ class PostgresRecipeRepository:
         # Only set is_published to True if recipe.approved is True
         if recipe.approved:
             db_recipe.is_published = True
+            if db_recipe.versions:
+                dish_aggregates.add_version(self.db, db_recipe.dish_name, db_recipe.versions[-1])
         print(f"[DEBUG] PostgresRecipeRepository.update: DBRecipe after field update: recipe_id={db_recipe.recipe_id}, is_published={db_recipe.is_published}, created_by={db_recipe.created_by}")
 
         # Persist ratings using Feedback table
@@ -365,6 +407,9 @@ class PostgresRecipeRepository:
         # Recalculate avg_rating logic removed (field deleted)
 
         self.db.commit()
+        if recipe.approved:
+            # An approved version changes the candidates and the dish profile cached syntheses were built from
+            get_synthesis_cache().invalidate_recipe(db_recipe.recipe_id)
         self.db.refresh(db_recipe)
         print(f"[DEBUG] PostgresRecipeRepository.update: DBRecipe after commit: recipe_id={db_recipe.recipe_id}, is_published={db_recipe.is_published}, created_by={db_recipe.created_by}")
     
@@ -372,8 +417,11 @@ class PostgresRecipeRepository:
         """Delete a recipe by ID."""
         db_recipe = self.db.query(DBRecipe).filter(DBRecipe.recipe_id == recipe_id).first()
         if db_recipe:
+            for version in db_recipe.versions:
+                dish_aggregates.remove_version(self.db, version.version_id)
             self.db.delete(db_recipe)
             self.db.commit()
+            get_synthesis_cache().invalidate_recipe(recipe_id)
     
     def _to_model(self, db_recipe: DBRecipe) -> RecipeModel:
         """Convert database model to Recipe model."""
@@ -385,11 +433,14 @@ class PostgresRecipeRepository:
                 Ingredient(name=ing.name, quantity=ing.quantity, unit=ing.unit)
                 for ing in current_version.ingredients
             ]
-            steps = [s.instruction for s in sorted(current_version.steps, key=lambda x: x.step_order)]
+            step_rows = sorted(current_version.steps, key=lambda x: x.step_order)
+            steps = [s.instruction for s in step_rows]
+            stored = [step_features.from_row(s) for s in step_rows]
             servings = current_version.base_servings if hasattr(current_version, 'base_servings') and current_version.base_servings else getattr(db_recipe, 'servings', 1)
         else:
             ingredients = []
             steps = []
+            stored = []
             servings = getattr(db_recipe, 'servings', 1)
         # Ensure ingredients and steps are always lists
         if ingredients is None:
@@ -400,6 +451,9 @@ class PostgresRecipeRepository:
         print(f"[DEBUG] _to_model steps: {steps}")
         if servings is None:
             servings = 1
+        metadata = {'version_id': current_version.version_id} if current_version else {}
+        if stored and all(f is not None for f in stored):
+            metadata['step_features'] = stored
         # Fetch ratings from Feedback table and ensure 0-5 limit
         from Module.database import Feedback
         latest_version = db_recipe.versions[-1] if db_recipe.versions else None
@@ -412,7 +466,7 @@ class PostgresRecipeRepository:
             ingredients=ingredients,
             steps=steps,
             servings=servings,
-            metadata={},
+            metadata=metadata,
             ratings=safe_ratings,
             ai_confidence_score=0.0,
             popularity=0,
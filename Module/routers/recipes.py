@@ -1,16 +1,18 @@
-from typing import List
+from typing import List, Optional
 import uuid
 
-from fastapi import Body, Depends, HTTPException, Query
+from fastapi import Body, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from Module.database import get_db, User, RecipeVersion
 from Module.routers.base import api_router
 from Module.routers.auth import get_current_user
 from Module.schemas.recipe import (
-    RecipeCreate, RecipeResponse, RecipeSynthesisRequest, RatingResponse, ApiResponse
+    RecipeCreate, RecipeResponse, RecipeSynthesisRequest, RecipeBatchSynthesisRequest, RatingResponse, ApiResponse
 )
 from Module.services.recipe_service import RecipeService
+from Module.synthesis_jobs import QueueFull
 
 @api_router.post("/recipe", response_model=ApiResponse)
 def submit_recipe(
@@ -70,6 +72,10 @@ def list_recipes(
 @api_router.post("/recipe/synthesize", response_model=ApiResponse)
 def synthesize_recipe(
     request: RecipeSynthesisRequest,
+    response: Response,
+    trace: bool = Query(False, description="Include the synthesis decision trace in the response"),
+    async_: bool = Query(False, alias="async", description="Queue the synthesis and return a job id to poll"),
+    budget_ms: Optional[float] = Query(None, ge=0, description="Latency budget for the model in ms; past it the rule-based recipe is returned (0 = wait)"),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
@@ -79,10 +85,20 @@ def synthesize_recipe(
             raise HTTPException(status_code=401, detail="Could not determine user from token.")
         # Now process the request body (dish_name and servings validation happens here)
         service = RecipeService(db)
-        result = service.synthesize_recipe(request, user_id)
+        if async_:
+            job = service.submit_synthesis_job(request, user_id, trace=trace, budget_ms=budget_ms)
+            response.status_code = 202
+            return ApiResponse(status=True, message="Recipe synthesis queued.", data={
+                "job_id": job.job_id,
+                "status": job.status,
+                "status_url": f"/api/recipe/synthesize/jobs/{job.job_id}",
+            })
+        result = service.synthesize_recipe(request, user_id, trace=trace, budget_ms=budget_ms)
         return ApiResponse(status=True, message="Recipe synthesized successfully.", data=result)
     except HTTPException:
         raise
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except RuntimeError as e:
@@ -91,6 +107,88 @@ def synthesize_recipe(
         print(f"[ERROR] synthesize_recipe exception: {e}")
         raise HTTPException(status_code=500, detail="An unexpected error occurred while synthesizing the recipe. Please try again later.")
 
+@api_router.post("/recipe/synthesize/batch", response_model=ApiResponse)
+def synthesize_recipes_batch(
+    request: RecipeBatchSynthesisRequest,
+    trace: bool = Query(False, description="Include the synthesis decision traces in the response"),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Synthesize several dishes in one request (event menus, meal plans).
+
+    Dish names are resolved and candidates fetched in bulk, the model
+    generates the steps of all dishes as one batch and the new versions are
+    stored in one transaction. data holds one result per item, in order: the
+    recipe, or status_code and error for an item that failed on its own.
+    """
+    try:
+        user_id = current_user.get("user_id")
+        if not user_id:
+            raise HTTPException(status_code=401, detail="Could not determine user from token.")
+        results = RecipeService(db).synthesize_recipes_batch(request, user_id, trace=trace)
+        failed = sum(1 for r in results if r.error)
+        message = "Recipes synthesized successfully." if not failed else f"{len(results) - failed} of {len(results)} recipes synthesized."
+        return ApiResponse(status=True, message=message, data=results)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        print(f"[ERROR] synthesize_recipes_batch exception: {e}")
+        raise HTTPException(status_code=500, detail="An unexpected error occurred while synthesizing the recipes. Please try again later.")
+
+@api_router.post("/recipe/synthesize/stream")
+def stream_synthesized_recipe(
+    request: RecipeSynthesisRequest,
+    trace: bool = Query(False, description="Include the synthesis decision trace in the closing event"),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Synthesize a recipe as server-sent events (text/event-stream).
+
+    Events: "ingredients" (merged list, sent first), "step_delta" (raw step
+    text while the model generates), then "recipe" with the final
+    post-processed RecipeResponse, or "error" with status_code and detail.
+    """
+    user_id = current_user.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Could not determine user from token.")
+    try:
+        events = RecipeService(db).stream_synthesis(request, user_id, trace=trace)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@api_router.get("/recipe/synthesize/jobs/{job_id}", response_model=ApiResponse)
+def get_synthesis_job(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Poll an asynchronous synthesis job.
+
+    The recipe is in data.result once status is "done"; a failed job has
+    status "failed" and the reason in data.error. Finished jobs expire after
+    KITCHENMIND_JOB_TTL_S.
+    """
+    user_id = current_user.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Could not determine user from token.")
+    is_admin = str(current_user.get("role", "")).lower() == "admin"
+    try:
+        job = RecipeService(db).get_synthesis_job(job_id, user_id, is_admin=is_admin)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return ApiResponse(status=True, message=f"Synthesis job {job.status}.", data=job)
+
 @api_router.get("/recipes/pending", response_model=ApiResponse)
 def get_pending_recipes(db: Session = Depends(get_db)):
     service = RecipeService(db)
@@ -98,9 +196,17 @@ def get_pending_recipes(db: Session = Depends(get_db)):
     return ApiResponse(status=True, message="Pending recipes fetched successfully.", data=recipes)
 
 @api_router.get("/recipe/version/{version_id}", response_model=ApiResponse)
-def get_single_recipe_by_version(version_id: str, db: Session = Depends(get_db)):
+def get_single_recipe_by_version(
+    version_id: str,
+    servings: Optional[int] = Query(None, ge=1, le=100, description="Scale the ingredients to this many servings"),
+    db: Session = Depends(get_db)
+):
     """
     Retrieve a recipe by its version ID.
+
+    With ?servings=N the ingredients are scaled from the version's own
+    servings on the fly (scaled_from holds the original size); nothing is
+    synthesized or stored.
     
     Validations:
     - UUID format validation for version_id
@@ -118,7 +224,7 @@ def get_single_recipe_by_version(version_id: str, db: Session = Depends(get_db))
     
     try:
         service = RecipeService(db)
-        result = service.get_recipe_by_version(version_id)
+        result = service.get_recipe_by_version(version_id, servings=servings)
         if not result:
             raise HTTPException(
                 status_code=404, 
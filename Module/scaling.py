@@ -0,0 +1,64 @@
+"""
+Scale-on-read: serve other serving sizes from stored versions.
+
+A recipe version stores one serving size (base_servings). Asking for another
+size used to run the whole synthesis and write a new version with fresh
+ingredient and step rows. With scale-on-read the service instead picks the
+stored version closest in size and scales its ingredients on the way out
+(models.Ingredient.scaled): no model call and no database writes.
+
+GET /recipe/version/{id}?servings=N always scales. The synthesize endpoints
+scale the best version of the dish when the policy allows it and synthesize
+otherwise: a factor beyond KITCHENMIND_SCALE_MAX_FACTOR (either way: 4 allows
+2 -> 8 and 8 -> 2) is left to a true re-synthesis, since step times, pan
+sizes and batch counts stop scaling linearly long before quantities do.
+
+Configuration (environment):
+    KITCHENMIND_SCALE_ON_READ       1 (default) | 0 to always re-synthesize
+    KITCHENMIND_SCALE_MAX_FACTOR    largest scale factor served by scaling
+"""
+
+import math
+import os
+from typing import Iterable, List, Optional
+
+from .models import Ingredient
+
+SCALE_ON_READ = os.getenv("KITCHENMIND_SCALE_ON_READ", "1").lower() in ("1", "true", "yes")
+SCALE_MAX_FACTOR = float(os.getenv("KITCHENMIND_SCALE_MAX_FACTOR", "4"))
+
+
+def allows_scaling(base_servings: Optional[int], servings: int) -> bool:
+    """Whether the policy serves servings by scaling a version of base_servings."""
+    if not SCALE_ON_READ or not base_servings or base_servings <= 0 or servings <= 0:
+        return False
+    factor = servings / base_servings
+    return max(factor, 1.0 / factor) <= SCALE_MAX_FACTOR
+
+
+def best_version(versions: Iterable, servings: int):
+    """The version (database.RecipeVersion) to scale to servings, or None if the policy allows none.
+
+    Closest in size first (by scale factor, so 2 -> 4 and 4 -> 2 are equally far), then the higher AI
+    confidence, then the most recent.
+    """
+    eligible = [v for v in versions if allows_scaling(v.base_servings, servings)]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda v: (
+        abs(math.log(servings / v.base_servings)),
+        -(v.ai_confidence_score or 0.0),
+        -(v.submitted_at.timestamp() if v.submitted_at else 0.0),
+    ))
+
+
+def scaled_ingredients(ingredients: Iterable, base_servings: int, servings: int) -> List[dict]:
+    """Ingredient rows (name, quantity, unit) of a base_servings version, as dicts for servings."""
+    factor = servings / base_servings if base_servings else 1.0
+    out = []
+    for ing in ingredients:
+        quantity = ing.quantity
+        if quantity is not None:
+            quantity = Ingredient(name=ing.name, quantity=quantity, unit=ing.unit).scaled(factor).quantity
+        out.append({"name": ing.name, "quantity": quantity, "unit": ing.unit})
+    return out
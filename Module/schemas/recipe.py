@@ -61,7 +61,7 @@ class RecipeCreate(BaseModel):
 
 class RecipeResponse(BaseModel):
     """Schema for recipe response."""
-    recipe_id: str
+    recipe_id: Optional[str] = Field(None, description="None only for an unsaved deadline fallback of a new dish")
     version_id: Optional[str] = None
     title: str
     servings: int
@@ -69,11 +69,16 @@ class RecipeResponse(BaseModel):
     views: int
     ingredients: list = []
     steps: list = []
+    trace: Optional[dict] = Field(None, description="Synthesis decision trace (only when requested with ?trace=true)")
+    scaled_from: Optional[int] = Field(None, description="Servings of the stored version this was scaled from (scale-on-read)")
+    synthesis_method: Optional[str] = Field(None, description="How a new synthesis was made, e.g. llm:<model>, fallback:no-llm, fallback:deadline")
+    prompt_tokens: Optional[int] = Field(None, description="Input tokens of the model prompt of a new synthesis")
 
 class RecipeSynthesisRequest(BaseModel):
     """Schema for recipe synthesis request."""
     dish_name: str = Field(..., min_length=3, max_length=100, description="Dish name (3-100 chars)")
     servings: int = Field(2, ge=1, le=100, description="Servings must be 1-100")
+    engine: Optional[str] = Field(None, description="rules, llm or auto (default: server setting)")
 
     @field_validator('dish_name')
     @classmethod
@@ -84,6 +89,38 @@ class RecipeSynthesisRequest(BaseModel):
             raise ValueError('Dish name can only contain letters, numbers, spaces, hyphens, dots, commas, apostrophes, ampersands, and parentheses')
         return v
 
+    @field_validator('engine')
+    @classmethod
+    def validate_engine(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return v
+        v = v.strip().lower()
+        if v not in ('rules', 'llm', 'auto'):
+            raise ValueError('Engine must be one of: rules, llm, auto')
+        return v
+
+class SynthesisJobResponse(BaseModel):
+    """Schema for an asynchronous synthesis job (POST /recipe/synthesize?async=true)."""
+    job_id: str
+    status: str = Field(..., description="queued, running, done or failed")
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[RecipeResponse] = Field(None, description="Synthesized recipe once the job is done")
+    error: Optional[str] = Field(None, description="Failure reason when the job failed")
+
+class RecipeBatchSynthesisRequest(BaseModel):
+    """Schema for synthesizing several dishes at once (POST /recipe/synthesize/batch)."""
+    items: List[RecipeSynthesisRequest] = Field(..., min_length=1, max_length=20, description="1-20 dishes")
+
+class RecipeBatchItemResult(BaseModel):
+    """Outcome of one dish of a batch synthesis: the recipe, or why it failed."""
+    dish_name: str
+    servings: int
+    recipe: Optional[RecipeResponse] = None
+    status_code: int = Field(200, description="200, or the status the single synthesis would have failed with")
+    error: Optional[str] = None
+
 class RecipeScoreResponse(BaseModel):
     """Schema for recipe score response (all scores displayed as 0-5 scale)."""
     rating: float = Field(..., description="User rating on 0-5 scale")
@@ -1,17 +1,43 @@
 import uuid
 import os
-from datetime import datetime
-from typing import List
+from typing import Iterator, List
 from sqlalchemy.orm import Session
 from pydantic import parse_obj_as
 
-from Module.database import Recipe as DBRecipe, RecipeVersion, Validation, RecipeScore, User
+from Module.database import Recipe as DBRecipe, RecipeVersion, Validation, RecipeScore, User, SessionLocal
 from Module.repository_postgres import PostgresRecipeRepository
+from Module import dish_aggregates, scaling, step_features
 from Module.utils_time import format_datetime_ampm as format_dt, get_india_time
 from Module.schemas.recipe import (
-    RecipeCreate, RecipeResponse, RecipeSynthesisRequest, 
-    ValidationResponse, IngredientCreate, RecipeScoreResponse
+    RecipeCreate, RecipeResponse, RecipeSynthesisRequest, RecipeBatchSynthesisRequest, RecipeBatchItemResult,
+    ValidationResponse, IngredientCreate, RecipeScoreResponse, SynthesisJobResponse
 )
+from Module.synthesis_deadline import is_deadline_fallback
+from Module.synthesis_jobs import get_synthesis_jobs
+from Module.synthesis_stream import SSE_KEEPALIVE, StreamClosed, SynthesisStream, sse_format, streaming
+
+
+def _synthesize_in_session(request_data: dict, user_id: str, trace: bool, budget_ms: float = None) -> RecipeResponse:
+    """The synchronous synthesis with a session of its own (for jobs and streams off the request thread)."""
+    db = SessionLocal()
+    try:
+        return RecipeService(db).synthesize_recipe(RecipeSynthesisRequest(**request_data), user_id, trace=trace,
+                                                   budget_ms=budget_ms)
+    finally:
+        db.close()
+
+
+def _job_response(job) -> SynthesisJobResponse:
+    return SynthesisJobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        created_at=format_dt(job.created_at) if job.created_at else None,
+        started_at=format_dt(job.started_at) if job.started_at else None,
+        finished_at=format_dt(job.finished_at) if job.finished_at else None,
+        result=job.result,
+        error=job.error,
+    )
+
 
 class RecipeService:
     """Service for recipe-related business logic."""
@@ -146,118 +172,81 @@ class RecipeService:
             ))
         return response
     
-    def synthesize_recipe(self, request: RecipeSynthesisRequest, user_id: str) -> RecipeResponse:
-        """Synthesize multiple recipes into one."""
-        print(f"[DEBUG] synthesize_recipe called with dish_name='{request.dish_name}', servings={request.servings}, user_id={user_id}")
-        from Module.database import User as DBUser
-        user = self.db.query(DBUser).filter(DBUser.user_id == user_id).first()
-        if not user:
-            raise ValueError("No user found with the provided user ID")
-        
-        # Check if dish_name exists in database; if not, find similar one
-        dish_name = request.dish_name
-        existing_recipes = self.db.query(DBRecipe).distinct(DBRecipe.dish_name).all()
-        existing_dish_names = [r.dish_name for r in existing_recipes if r.dish_name]
-        
+    @staticmethod
+    def _match_dish_name(dish_name: str, existing_dish_names: List[str]) -> str:
+        """The stored dish name dish_name refers to: exact (case-insensitive) match, else the closest one."""
         # Try exact match (case-insensitive)
-        exact_match = None
         for existing_name in existing_dish_names:
             if existing_name.lower() == dish_name.lower():
-                exact_match = existing_name
-                break
-        
-        if exact_match:
-            dish_name = exact_match
-            print(f"[DEBUG] Found exact match (case-insensitive): {dish_name}")
-        else:
-            # Find similar dish name using fuzzy matching (case-insensitive)
-            import difflib
-            existing_names_lower = [name.lower() for name in existing_dish_names]
-            close_matches = difflib.get_close_matches(dish_name.lower(), existing_names_lower, n=1, cutoff=0.5)
-            if close_matches:
-                # Get original name with proper casing
-                matched_idx = existing_names_lower.index(close_matches[0])
-                dish_name = existing_dish_names[matched_idx]
-                print(f"[DEBUG] Found similar match for '{request.dish_name}': {dish_name}")
-            else:
-                print(f"[DEBUG] No similar match found for '{request.dish_name}'")
-        
-        # Update request with matched/corrected dish_name
-        request.dish_name = dish_name
-        
-        # Validate dish_name is genuine (after user_id is verified)
-        dish_name = request.dish_name.lower()
+                print(f"[DEBUG] Found exact match (case-insensitive): {existing_name}")
+                return existing_name
+        # Find similar dish name using fuzzy matching (case-insensitive)
+        import difflib
+        existing_names_lower = [name.lower() for name in existing_dish_names]
+        close_matches = difflib.get_close_matches(dish_name.lower(), existing_names_lower, n=1, cutoff=0.5)
+        if close_matches:
+            # Get original name with proper casing
+            matched_idx = existing_names_lower.index(close_matches[0])
+            print(f"[DEBUG] Found similar match for '{dish_name}': {existing_dish_names[matched_idx]}")
+            return existing_dish_names[matched_idx]
+        print(f"[DEBUG] No similar match found for '{dish_name}'")
+        return dish_name
+
+    @staticmethod
+    def _check_dish_name(dish_name: str):
+        """Reject placeholder and degenerate dish names (ValueError)."""
+        name = dish_name.lower()
         placeholder_values = {
             "string", "test", "dish", "recipe", "food", "meal", "dish name",
             "placeholder", "example", "sample", "demo", "x", "y", "z",
             "aaa", "bbb", "ccc", "ddd", "eee", "fff", "hhh", "iii", "jjj"
         }
         
-        if dish_name in placeholder_values:
+        if name in placeholder_values:
             raise ValueError('Please provide a genuine dish name (e.g., "Pasta Carbonara", "Biryani", "Tacos"), not placeholder text')
         
         # Reject names that are just repeated characters
-        if len(set(dish_name.replace(" ", ""))) == 1:
+        if len(set(name.replace(" ", ""))) == 1:
             raise ValueError('Dish name must contain varied characters, not just repetition')
         
         # Reject very generic single-word dishes if they're too short
-        if len(request.dish_name.split()) == 1 and len(request.dish_name) < 4:
+        if len(dish_name.split()) == 1 and len(dish_name) < 4:
             raise ValueError('Single-word dish names must be at least 4 characters long')
+
+    @staticmethod
+    def _existing_version_response(recipe: DBRecipe, version: RecipeVersion, servings: int = None) -> RecipeResponse:
+        """A stored version as a response, scaled on read when servings differs from its own."""
+        ingredients = [{"name": ing.name, "quantity": ing.quantity, "unit": ing.unit} for ing in version.ingredients]
+        steps = [step.instruction for step in sorted(version.steps, key=lambda x: x.step_order)]
+        views = version.views if version.views is not None else 0
+        scaled_from = None
+        if servings and version.base_servings and servings != version.base_servings:
+            ingredients = scaling.scaled_ingredients(version.ingredients, version.base_servings, servings)
+            scaled_from = version.base_servings
         
-        from api import km_instance
-        kwargs = {
-            'user': user,
-            'dish_name': request.dish_name,
-            'servings': request.servings
-        }
-        
-        # Check if a recipe for this dish already exists (exact match across all users)
-        print(f"[DEBUG] Searching for existing recipes with dish_name='{request.dish_name}'")
-        
-        existing_recipes = self.db.query(DBRecipe).filter(
-            DBRecipe.dish_name == request.dish_name
-        ).all()
-        
-        print(f"[DEBUG] Found {len(existing_recipes)} recipe(s) matching dish name '{request.dish_name}'")
-        for r in existing_recipes:
-            print(f"[DEBUG]   - {r.recipe_id}: {r.dish_name} (servings={r.servings}, published={r.is_published})")
-        
-        existing_recipe = None
-        if existing_recipes:
-            # Prefer published recipes as base, fallback to first unpublished
-            existing_recipe = next((r for r in existing_recipes if r.is_published), existing_recipes[0])
-            print(f"[DEBUG] Using recipe {existing_recipe.recipe_id} as base for versioning")
-            
-            # Check if a version with this EXACT servings already exists
-            existing_version = self.db.query(RecipeVersion).filter(
-                RecipeVersion.recipe_id == existing_recipe.recipe_id,
-                RecipeVersion.base_servings == request.servings
-            ).first()
-            
-            if existing_version:
-                print(f"[DEBUG] Version with servings={request.servings} already exists, returning it (deduplication)")
-                # Return existing version (deduplication - same dish, same servings)
-                ingredients = [{"name": ing.name, "quantity": ing.quantity, "unit": ing.unit} for ing in existing_version.ingredients]
-                steps = [step.instruction for step in sorted(existing_version.steps, key=lambda x: x.step_order)]
-                views = existing_version.views if existing_version.views is not None else 0
-                
-                return RecipeResponse(
-                    recipe_id=existing_recipe.recipe_id,
-                    version_id=existing_version.version_id,
-                    title=existing_recipe.dish_name,
-                    servings=existing_version.base_servings,
-                    approved=existing_recipe.is_published,
-                    views=views,
-                    ingredients=ingredients,
-                    steps=steps
-                )
-            else:
-                print(f"[DEBUG] No version found for servings={request.servings}, will add a new version to recipe {existing_recipe.recipe_id}")
-        
-        # Synthesize the recipe
-        print(f"[DEBUG] Synthesizing recipe for {request.dish_name} with {request.servings} servings")
-        result = km_instance.request_recipe(**kwargs)
-        
+        return RecipeResponse(
+            recipe_id=recipe.recipe_id,
+            version_id=version.version_id,
+            title=recipe.dish_name,
+            servings=servings or version.base_servings,
+            approved=recipe.is_published,
+            views=views,
+            ingredients=ingredients,
+            steps=steps,
+            scaled_from=scaled_from
+        )
+
+    def _scaled_response(self, recipe: DBRecipe, servings: int, versions=None):
+        """The best version of recipe scaled to servings, or None when the scaling policy wants a re-synthesis."""
+        version = scaling.best_version(recipe.versions if versions is None else versions, servings)
+        if version is None:
+            return None
+        print(f"[DEBUG] Scaling version {version.version_id} from servings={version.base_servings} to {servings} (scale-on-read)")
+        return self._existing_version_response(recipe, version, servings)
+
+    def _store_synthesized(self, request: RecipeSynthesisRequest, user, result, existing_recipe,
+                           trace: bool = False, commit: bool = True) -> RecipeResponse:
+        """Persist a synthesized recipe as a new version of existing_recipe, or as a new recipe."""
         from Module.controller import ensure_recipe_dataclass
         result = ensure_recipe_dataclass(result)
         
@@ -268,7 +257,24 @@ class RecipeService:
             ings = result.ingredients
         except Exception:
             raise RuntimeError("Problem accessing the recipe ingredients")
-        
+
+        if is_deadline_fallback(result):
+            # A stopgap for this response only: storing it would make the dedupe serve it for good and
+            # hide the model's late result, which the synthesis cache answers the next request with
+            print(f"[DEBUG] Not storing deadline fallback for {request.dish_name} ({request.servings} servings)")
+            return RecipeResponse(
+                recipe_id=existing_recipe.recipe_id if existing_recipe else None,
+                title=request.dish_name,
+                servings=request.servings,
+                approved=False,
+                views=0,
+                ingredients=[{"name": ing.name, "quantity": ing.quantity, "unit": ing.unit} for ing in ings],
+                steps=result.steps,
+                trace=(getattr(result, 'metadata', None) or {}).get('trace') if trace else None,
+                synthesis_method=result.metadata.get('synthesis_method'),
+                prompt_tokens=(result.metadata.get('prompt') or {}).get('tokens')
+            )
+
         # If recipe exists, add a new version to it; otherwise create new recipe
         if existing_recipe:
             print(f"[DEBUG] Adding version to existing recipe {existing_recipe.recipe_id}")
@@ -277,7 +283,8 @@ class RecipeService:
                 ingredients=[{"name": ing.name, "quantity": ing.quantity, "unit": ing.unit} for ing in ings],
                 steps=result.steps,
                 servings=request.servings,
-                submitted_by=user.user_id
+                submitted_by=user.user_id,
+                commit=commit
             )
             # Get the newly created version ID (latest version)
             db_recipe = self.db.query(DBRecipe).filter(DBRecipe.recipe_id == existing_recipe.recipe_id).first()
@@ -291,7 +298,8 @@ class RecipeService:
                 steps=result.steps,
                 servings=request.servings,
                 submitted_by=user.user_id,
-                approved=getattr(result, 'approved', False)
+                approved=getattr(result, 'approved', False),
+                commit=commit
             )
             version_id = None
             db_recipe = self.db.query(DBRecipe).filter(DBRecipe.recipe_id == recipe_obj.id).first()
@@ -312,9 +320,231 @@ class RecipeService:
             approved=recipe_obj.approved,
             views=views,
             ingredients=[{"name": ing.name, "quantity": ing.quantity, "unit": ing.unit} for ing in getattr(recipe_obj, 'ingredients', [])],
-            steps=getattr(recipe_obj, 'steps', [])
+            steps=getattr(recipe_obj, 'steps', []),
+            trace=(getattr(result, 'metadata', None) or {}).get('trace') if trace else None,
+            synthesis_method=(getattr(result, 'metadata', None) or {}).get('synthesis_method'),
+            prompt_tokens=((getattr(result, 'metadata', None) or {}).get('prompt') or {}).get('tokens')
         )
+
+    def synthesize_recipe(self, request: RecipeSynthesisRequest, user_id: str, trace: bool = False,
+                          budget_ms: float = None) -> RecipeResponse:
+        """Synthesize multiple recipes into one (budget_ms: latency budget of the model, see synthesis_deadline)."""
+        print(f"[DEBUG] synthesize_recipe called with dish_name='{request.dish_name}', servings={request.servings}, user_id={user_id}")
+        from Module.database import User as DBUser
+        user = self.db.query(DBUser).filter(DBUser.user_id == user_id).first()
+        if not user:
+            raise ValueError("No user found with the provided user ID")
+        
+        # Check if dish_name exists in database; if not, find similar one
+        existing_recipes = self.db.query(DBRecipe).distinct(DBRecipe.dish_name).all()
+        existing_dish_names = [r.dish_name for r in existing_recipes if r.dish_name]
+        
+        # Update request with matched/corrected dish_name
+        request.dish_name = self._match_dish_name(request.dish_name, existing_dish_names)
+        
+        # Validate dish_name is genuine (after user_id is verified)
+        self._check_dish_name(request.dish_name)
+        
+        from api import km_instance
+        kwargs = {
+            'user': user,
+            'dish_name': request.dish_name,
+            'servings': request.servings,
+            'trace': trace or None,
+            'deadline_ms': budget_ms,
+            'engine': request.engine
+        }
+        
+        # Check if a recipe for this dish already exists (exact match across all users)
+        print(f"[DEBUG] Searching for existing recipes with dish_name='{request.dish_name}'")
+        
+        existing_recipes = self.db.query(DBRecipe).filter(
+            DBRecipe.dish_name == request.dish_name
+        ).all()
+        
+        print(f"[DEBUG] Found {len(existing_recipes)} recipe(s) matching dish name '{request.dish_name}'")
+        for r in existing_recipes:
+            print(f"[DEBUG]   - {r.recipe_id}: {r.dish_name} (servings={r.servings}, published={r.is_published})")
+        
+        existing_recipe = None
+        if existing_recipes:
+            # Prefer published recipes as base, fallback to first unpublished
+            existing_recipe = next((r for r in existing_recipes if r.is_published), existing_recipes[0])
+            print(f"[DEBUG] Using recipe {existing_recipe.recipe_id} as base for versioning")
+            
+            # Check if a version with this EXACT servings already exists
+            existing_version = self.db.query(RecipeVersion).filter(
+                RecipeVersion.recipe_id == existing_recipe.recipe_id,
+                RecipeVersion.base_servings == request.servings
+            ).first()
+            
+            if existing_version:
+                print(f"[DEBUG] Version with servings={request.servings} already exists, returning it (deduplication)")
+                # Return existing version (deduplication - same dish, same servings)
+                return self._existing_version_response(existing_recipe, existing_version)
+            # A traced request must actually run the pipeline, so it is never served scaled
+            scaled = None if trace else self._scaled_response(existing_recipe, request.servings)
+            if scaled is not None:
+                return scaled
+            print(f"[DEBUG] No version found for servings={request.servings}, will add a new version to recipe {existing_recipe.recipe_id}")
+        
+        # Synthesize the recipe
+        print(f"[DEBUG] Synthesizing recipe for {request.dish_name} with {request.servings} servings")
+        result = km_instance.request_recipe(**kwargs)
+        return self._store_synthesized(request, user, result, existing_recipe, trace=trace)
+
+    def synthesize_recipes_batch(self, request: RecipeBatchSynthesisRequest, user_id: str,
+                                 trace: bool = False) -> List[RecipeBatchItemResult]:
+        """synthesize_recipe for several dishes: bulk lookups, one model batch, one transaction.
+
+        Each item is matched, validated and deduplicated as a single request would be; an item that
+        fails carries its error (and the status the single endpoint would answer) instead of a recipe.
+        """
+        print(f"[DEBUG] synthesize_recipes_batch called with {len(request.items)} items, user_id={user_id}")
+        user = self.db.query(User).filter(User.user_id == user_id).first()
+        if not user:
+            raise ValueError("No user found with the provided user ID")
+
+        results: List[RecipeBatchItemResult] = [
+            RecipeBatchItemResult(dish_name=item.dish_name, servings=item.servings) for item in request.items
+        ]
+
+        def _fail(i: int, e: Exception):
+            results[i].status_code = 404 if isinstance(e, (ValueError, LookupError)) else 500
+            results[i].error = str(e) or e.__class__.__name__
+
+        # Dish names: one query for all items
+        existing_dish_names = [name for (name,) in self.db.query(DBRecipe.dish_name).distinct().all() if name]
+        items = []
+        for i, item in enumerate(request.items):
+            item = RecipeSynthesisRequest(dish_name=self._match_dish_name(item.dish_name, existing_dish_names),
+                                          servings=item.servings, engine=item.engine)
+            results[i].dish_name = item.dish_name
+            try:
+                self._check_dish_name(item.dish_name)
+            except ValueError as e:
+                _fail(i, e)
+                continue
+            items.append((i, item))
+
+        # Recipes to version and versions to deduplicate against: one query each
+        names = {item.dish_name for _, item in items}
+        by_name = {}
+        for r in self.db.query(DBRecipe).filter(DBRecipe.dish_name.in_(names)).all() if names else []:
+            by_name.setdefault(r.dish_name, []).append(r)
+        base = {name: next((r for r in recipes if r.is_published), recipes[0]) for name, recipes in by_name.items()}
+        versions = {}
+        if base:
+            base_ids = [r.recipe_id for r in base.values()]
+            for v in self.db.query(RecipeVersion).filter(RecipeVersion.recipe_id.in_(base_ids)).all():
+                versions.setdefault(v.recipe_id, []).append(v)
+
+        pending = []
+        for i, item in items:
+            existing_recipe = base.get(item.dish_name)
+            if existing_recipe is None:
+                pending.append((i, item))
+                continue
+            recipe_versions = versions.get(existing_recipe.recipe_id, [])
+            existing_version = next((v for v in recipe_versions if v.base_servings == item.servings), None)
+            if existing_version:
+                print(f"[DEBUG] Version of '{item.dish_name}' with servings={item.servings} already exists, returning it (deduplication)")
+                results[i].recipe = self._existing_version_response(existing_recipe, existing_version)
+                continue
+            if not trace:
+                results[i].recipe = self._scaled_response(existing_recipe, item.servings, recipe_versions)
+            if results[i].recipe is None:
+                pending.append((i, item))
+        if not pending:
+            return results
+
+        from api import km_instance
+        print(f"[DEBUG] Synthesizing {len(pending)} recipes in one batch")
+        outcomes = km_instance.request_recipes_batch(
+            user, [(item.dish_name, item.servings, item.engine) for _, item in pending], trace=trace or None
+        )
+
+        # All new versions in one transaction; the same dish twice in the batch shares its recipe
+        stored = {}
+        try:
+            for (i, item), outcome in zip(pending, outcomes):
+                if isinstance(outcome, Exception):
+                    _fail(i, outcome)
+                    continue
+                key = (item.dish_name, item.servings)
+                if key in stored:
+                    results[i].recipe = stored[key]
+                    continue
+                existing_recipe = base.get(item.dish_name)
+                response = self._store_synthesized(item, user, outcome, existing_recipe, trace=trace, commit=False)
+                if existing_recipe is None:
+                    base[item.dish_name] = self.db.query(DBRecipe).filter(DBRecipe.recipe_id == response.recipe_id).first()
+                stored[key] = results[i].recipe = response
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return results
     
+    def submit_synthesis_job(self, request: RecipeSynthesisRequest, user_id: str, trace: bool = False,
+                             budget_ms: float = None) -> SynthesisJobResponse:
+        """Queue synthesize_recipe as a background job; poll it with get_synthesis_job."""
+        user = self.db.query(User).filter(User.user_id == user_id).first()
+        if not user:
+            raise ValueError("No user found with the provided user ID")
+        job = get_synthesis_jobs().submit(
+            _synthesize_in_session, request.model_dump(), user_id, trace, budget_ms, owner=user_id
+        )
+        print(f"[DEBUG] Queued synthesis job {job.job_id} for dish_name='{request.dish_name}'")
+        return _job_response(job)
+
+    def get_synthesis_job(self, job_id: str, user_id: str, is_admin: bool = False) -> SynthesisJobResponse:
+        """Status (and, once done, the recipe) of a synthesis job owned by user_id."""
+        job = get_synthesis_jobs().get(job_id)
+        if job is None or (job.owner != user_id and not is_admin):
+            raise ValueError(f"Synthesis job not found or expired: {job_id}")
+        return _job_response(job)
+
+    def stream_synthesis(self, request: RecipeSynthesisRequest, user_id: str, trace: bool = False) -> Iterator[str]:
+        """synthesize_recipe as server-sent events: ingredients, step text as generated, then the recipe.
+
+        The synthesis runs as a job of the bounded job queue (QueueFull when it is at capacity) and
+        stops at its next event once the returned generator is closed.
+        """
+        user = self.db.query(User).filter(User.user_id == user_id).first()
+        if not user:
+            raise ValueError("No user found with the provided user ID")
+        stream = SynthesisStream()
+        request_data = request.model_dump()
+
+        def _run():
+            if stream.closed:
+                return  # the client left while the job was queued
+            with streaming(stream):
+                try:
+                    result = _synthesize_in_session(request_data, user_id, trace)
+                    stream.emit('recipe', **result.model_dump())
+                except StreamClosed:
+                    print(f"[DEBUG] stream_synthesis: client went away, synthesis of '{request_data['dish_name']}' stopped")
+                except Exception as e:
+                    print(f"[ERROR] stream_synthesis exception: {e}")
+                    status_code = 404 if isinstance(e, (ValueError, LookupError)) else 500
+                    try:
+                        stream.emit('error', status_code=status_code, detail=str(e) or e.__class__.__name__)
+                    except StreamClosed:
+                        pass
+
+        get_synthesis_jobs().submit(_run, owner=user_id)
+
+        def _events():
+            try:
+                for item in stream.events():
+                    yield SSE_KEEPALIVE if item is None else sse_format(*item)
+            finally:
+                stream.close()
+
+        return _events()
+
     def get_pending_recipes(self) -> List[dict]:
         """Get all pending (unapproved) recipes."""
         recipes = self.repo.pending()
@@ -364,6 +594,13 @@ class RecipeService:
         
         if approved:
             recipe.is_published = True
+            dish_aggregates.add_version(self.db, recipe.dish_name, version)
+        else:
+            dish_aggregates.remove_version(self.db, version_id)
+        # versions stored before step features existed (or with an older FEATURES_VERSION)
+        refreshed = step_features.refresh_rows(version.steps)
+        if refreshed:
+            print(f"[DEBUG] validate_recipe: recomputed features of {refreshed} steps")
         
         self.db.commit()
         self.db.refresh(validation)
@@ -407,8 +644,8 @@ class RecipeService:
             feedback=validation.feedback
         )
     
-    def get_recipe_by_version(self, version_id: str) -> RecipeResponse:
-        """Get a single recipe by version ID."""
+    def get_recipe_by_version(self, version_id: str, servings: int = None) -> RecipeResponse:
+        """Get a single recipe by version ID, its ingredients scaled to servings if given."""
         version = self.db.query(RecipeVersion).filter(RecipeVersion.version_id == version_id).first()
         if not version:
             raise ValueError("No recipe version found with the provided ID")
@@ -428,15 +665,24 @@ class RecipeService:
         # Use version.views (integer count) not score.popularity_score (float 0-5)
         views = version.views if version.views is not None else 0
         
+        base_servings = version.base_servings if hasattr(version, 'base_servings') and version.base_servings else getattr(recipe, 'servings', 1)
+        ingredients = [{"name": ing.name, "quantity": ing.quantity, "unit": ing.unit} for ing in getattr(version, 'ingredients', [])]
+        scaled_from = None
+        if servings and servings != base_servings:
+            # Scale on read: nothing is synthesized or stored for the new size
+            ingredients = scaling.scaled_ingredients(getattr(version, 'ingredients', []), base_servings, servings)
+            scaled_from = base_servings
+        
         return RecipeResponse(
             recipe_id=recipe.recipe_id,
             version_id=version.version_id,
             title=recipe.dish_name,
-            servings=version.base_servings if hasattr(version, 'base_servings') and version.base_servings else getattr(recipe, 'servings', 1),
+            servings=servings or base_servings,
             approved=approved,
             views=views,
-            ingredients=[{"name": ing.name, "quantity": ing.quantity, "unit": ing.unit} for ing in getattr(version, 'ingredients', [])],
-            steps=[step.instruction for step in sorted(getattr(version, 'steps', []), key=lambda x: x.step_order)]
+            ingredients=ingredients,
+            steps=[step.instruction for step in sorted(getattr(version, 'steps', []), key=lambda x: x.step_order)],
+            scaled_from=scaled_from
         )
     
     def rate_recipe(self, version_id: str, user_id: str, rating: float, comment: str = None) -> dict:
@@ -0,0 +1,180 @@
+"""
+Per-step features computed once, when a recipe version is stored.
+
+Source steps never change after a RecipeVersion is created, yet every
+synthesis used to re-derive the same things from them: the normalized and
+canonicalized text, the cooking phase, the dedupe fingerprint, the duration
+and the temperature. PostgresRecipeRepository computes them in
+_create_version (and refreshes stale rows when a version is validated) and
+keeps them in the steps table next to the instruction; _to_model hands them
+to the synthesizer in recipe.metadata['step_features'].
+
+synthesize() then takes the canonical text straight from the stored
+features and seeds the process-wide memos (fingerprints, phases) with the
+rest, so a cold process or an evicted cache does not redo the regex work for
+steps it has already seen.
+
+FEATURES_VERSION is stored with every row. Bump it whenever canonicalization,
+phase classification or fingerprinting change: rows with another version are
+recomputed when read (and can be rewritten with
+`python -m Module.step_features --backfill`).
+"""
+
+import argparse
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from . import step_fingerprints as fp
+from . import synth_patterns as rx
+
+FEATURES_VERSION = 1
+
+
+@dataclass(frozen=True)
+class StepFeatures:
+    """What the synthesizer derives from one source step."""
+    text: str  # whitespace-normalized, canonical ingredient names
+    phase: str
+    fingerprint: str
+    minutes: Optional[int] = None
+    temperature: Optional[str] = None
+
+
+def extract_minutes(instruction: str) -> Optional[int]:
+    match = rx.MINUTES_VALUE.search(instruction.lower())
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def extract_temperature(instruction: str) -> Optional[str]:
+    """First temperature in the step, normalized to e.g. '180°C'."""
+    match = rx.TEMPERATURE_VALUE_I.search(instruction)
+    if not match:
+        return None
+    return f"{match.group(1)}°{match.group(2).upper()}"
+
+
+_synth = None
+
+
+def _synthesizer():
+    global _synth
+    if _synth is None:
+        from .synthesizer import Synthesizer
+        _synth = Synthesizer()
+    return _synth
+
+
+def canonical_text(instruction: str) -> str:
+    synth = _synthesizer()
+    return synth.canonicalize_step_text(synth._normalize_step_text(instruction))
+
+
+def compute_step_features(instruction: str) -> StepFeatures:
+    synth = _synthesizer()
+    text = canonical_text(instruction)
+    return StepFeatures(
+        text=text,
+        phase=synth.classify_phase(text),
+        fingerprint=fp.fingerprint(text),
+        minutes=extract_minutes(instruction),
+        temperature=extract_temperature(instruction),
+    )
+
+
+def apply_to_row(row, instruction: Optional[str] = None) -> StepFeatures:
+    """Compute the features of a steps row (database.Step) and store them on it."""
+    features = compute_step_features(row.instruction if instruction is None else instruction)
+    row.canonical_text = features.text
+    row.phase = features.phase
+    row.fingerprint = features.fingerprint
+    row.minutes = features.minutes
+    row.temperature = features.temperature
+    row.features_version = FEATURES_VERSION
+    return features
+
+
+def from_row(row) -> Optional[StepFeatures]:
+    """The stored features of a steps row, or None if they are missing or from another FEATURES_VERSION."""
+    if getattr(row, 'features_version', None) != FEATURES_VERSION or row.canonical_text is None:
+        return None
+    return StepFeatures(
+        text=row.canonical_text,
+        phase=row.phase,
+        fingerprint=row.fingerprint or "",
+        minutes=row.minutes,
+        temperature=row.temperature,
+    )
+
+
+def refresh_rows(rows: Iterable) -> int:
+    """Recompute the rows whose stored features are missing or stale; returns how many changed."""
+    changed = 0
+    for row in rows:
+        if from_row(row) is None:
+            apply_to_row(row)
+            changed += 1
+    return changed
+
+
+# --- memo seeding -------------------------------------------------------------------
+
+_phases: Dict[str, str] = {}
+_phases_lock = threading.Lock()
+
+
+def known_phase(text: str) -> Optional[str]:
+    """Phase of a step text whose stored features were loaded (None if unknown)."""
+    return _phases.get(text)
+
+
+def seed(features: Iterable[StepFeatures]):
+    """Make stored features known to the fingerprint and phase memos."""
+    with _phases_lock:
+        for f in features:
+            fp.seed(f.text, f.fingerprint)
+            if f.text not in _phases:
+                if len(_phases) >= fp.FINGERPRINT_CACHE_SIZE:
+                    _phases.clear()
+                _phases[f.text] = f.phase
+
+
+def canonical_steps(recipe) -> List[str]:
+    """Canonical text of each of recipe's steps, from its stored features when they match its steps."""
+    stored = (getattr(recipe, 'metadata', None) or {}).get('step_features')
+    if stored and len(stored) == len(recipe.steps):
+        seed(stored)
+        return [f.text for f in stored]
+    return [canonical_text(s) for s in recipe.steps]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the stored step features of existing recipe versions.")
+    parser.add_argument('--backfill', action='store_true', help='rewrite missing or stale rows')
+    parser.add_argument('--batch', type=int, default=500, help='rows per commit')
+    args = parser.parse_args()
+    from .database import SessionLocal, Step
+    db = SessionLocal()
+    try:
+        stale = db.query(Step).filter(
+            (Step.features_version.is_(None)) | (Step.features_version != FEATURES_VERSION)
+        )
+        print(f"steps with missing or stale features: {stale.count()}")
+        if not args.backfill:
+            return
+        done = 0
+        while True:
+            rows = stale.limit(args.batch).all()
+            if not rows:
+                break
+            done += refresh_rows(rows)
+            db.commit()
+        print(f"Total steps updated: {done}")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Memoized step fingerprints.
+
+A fingerprint is the order-insensitive token key the synthesizer uses to
+decide whether two steps say the same thing: repeated words collapsed,
+soak/grind/beaten-egg variants unified, times and temperatures replaced by
+placeholders, and stopwords, filler verbs, units and noise adjectives dropped.
+
+Building one takes eight regex passes. The same step strings are
+fingerprinted by dedupe, merge_semantic_steps and the prep-survival check
+(which used to re-fingerprint every existing line once per prep line), so
+fingerprints and their token sets are computed once per distinct string and
+kept in a bounded, process-wide LRU. Fingerprints of stored source steps
+can be seeded into it (seed()), so they are not recomputed after a restart.
+Weighted similarity reuses memoized per-token-set weight totals.
+
+Configuration (environment):
+    KITCHENMIND_FINGERPRINT_CACHE_SIZE   distinct strings remembered (0 disables memoization)
+"""
+
+import os
+from functools import lru_cache
+from typing import Dict, FrozenSet, Optional
+
+from . import synth_patterns as rx
+
+FINGERPRINT_CACHE_SIZE = int(os.getenv("KITCHENMIND_FINGERPRINT_CACHE_SIZE", "8192"))
+
+EMPTY_TOKENS: FrozenSet[str] = frozenset()
+
+
+def compute_fingerprint(s: str) -> str:
+    """Uncached fingerprint of a step text ("" for empty input)."""
+    if not s:
+        return ""
+
+    # collapse repeated words
+    s = rx.REPEATED_WORDS.sub(r'\1', s)
+
+    # lowercase
+    s = s.lower()
+
+    # soak → unify variants
+    s = rx.SOAKED.sub('soak', s)
+
+    # beaten eggs → unify variants
+    s = rx.BEATEN_EGG_VARIANTS.sub('beaten_eggs', s)
+
+    # grind / grinding / ground → grind
+    s = rx.GRIND_VARIANTS.sub('grind', s)
+
+    # time & temperature normalization
+    s = rx.DURATION_I.sub(' time ', s)
+    s = rx.TEMPERATURE_I.sub(' temp ', s)
+
+    # remove punctuation & digits, collapse whitespace
+    s = rx.NON_ALPHA.sub(' ', s)
+    s = rx.WHITESPACE.sub(' ', s).strip()
+
+    tokens = s.split()
+
+    # keep tokens that are likely ingredients / important nouns
+    kept = []
+    for t in tokens:
+        if t in rx.DEDUPE_NOISE_WORDS:
+            continue
+        # short tokens like 'of' filtered already; skip 1-char tokens
+        if len(t) <= 1:
+            continue
+        # drop obvious adjectives that add noise ('smooth', 'golden', 'fresh')
+        if t in rx.DEDUPE_NOISE_ADJECTIVES:
+            continue
+        kept.append(t)
+
+    if not kept:
+        # fallback: use tokens excluding pure punctuation/stopwords
+        kept = [t for t in tokens if t not in rx.DEDUPE_STOPWORDS]
+
+    # produce order-insensitive fingerprint: unique sorted tokens
+    return " ".join(sorted(set(kept)))
+
+
+# Fingerprints computed ahead of time (stored step features, see step_features.py)
+_seeded: Dict[str, str] = {}
+
+
+def seed(s: str, key: str):
+    """Remember a precomputed fingerprint of s; a later cache miss uses it instead of computing."""
+    if FINGERPRINT_CACHE_SIZE <= 0:
+        return
+    if len(_seeded) >= FINGERPRINT_CACHE_SIZE:
+        _seeded.clear()
+    _seeded[s] = key
+
+
+@lru_cache(maxsize=FINGERPRINT_CACHE_SIZE)
+def fingerprint(s: str) -> str:
+    """Memoized compute_fingerprint."""
+    key = _seeded.get(s)
+    return compute_fingerprint(s) if key is None else key
+
+
+@lru_cache(maxsize=FINGERPRINT_CACHE_SIZE)
+def key_tokens(key: str) -> FrozenSet[str]:
+    """Token set of a fingerprint key (shared, immutable)."""
+    return frozenset(key.split()) if key else EMPTY_TOKENS
+
+
+def token_set(s: str) -> FrozenSet[str]:
+    """Token set of a step text's fingerprint."""
+    return key_tokens(fingerprint(s)) if s else EMPTY_TOKENS
+
+
+class TokenWeights:
+    """Per-token weights for weighted Jaccard similarity.
+
+    The weight total of each token set is memoized, so comparing one step
+    against many only sums the weights of the intersection.
+    """
+
+    def __init__(self, weights: Dict[str, float], default: float = 1.0, max_entries: int = 4096):
+        self.weights = {tok: float(w) for tok, w in weights.items()}
+        self.default = float(default)
+        self._totals: Dict[FrozenSet[str], float] = {}
+        self._max_entries = max_entries
+
+    def weight(self, tok: str) -> float:
+        return self.weights.get(tok, self.default)
+
+    def total(self, tokens: FrozenSet[str]) -> float:
+        try:
+            return self._totals[tokens]
+        except KeyError:
+            pass
+        value = sum(self.weights.get(t, self.default) for t in tokens)
+        if len(self._totals) >= self._max_entries:
+            self._totals.clear()
+        self._totals[tokens] = value
+        return value
+
+    def jaccard(self, a: FrozenSet[str], b: FrozenSet[str]) -> float:
+        if not a and not b:
+            return 1.0
+        if not a or not b:
+            return 0.0
+        a = a if isinstance(a, frozenset) else frozenset(a)
+        b = b if isinstance(b, frozenset) else frozenset(b)
+        w_inter = sum(self.weights.get(t, self.default) for t in a & b)
+        w_union = self.total(a) + self.total(b) - w_inter
+        if w_union <= 0:
+            return 0.0
+        return w_inter / w_union
+
+
+def cache_info() -> Dict[str, Optional[int]]:
+    """Hit/miss counters of the fingerprint and token-set caches."""
+    fp = fingerprint.cache_info()
+    kt = key_tokens.cache_info()
+    return {
+        "fingerprint_hits": fp.hits, "fingerprint_misses": fp.misses, "fingerprint_size": fp.currsize,
+        "token_set_hits": kt.hits, "token_set_misses": kt.misses, "token_set_size": kt.currsize,
+        "max_size": fp.maxsize,
+    }
+
+
+def clear_caches():
+    fingerprint.cache_clear()
+    _seeded.clear()
+    key_tokens.cache_clear()
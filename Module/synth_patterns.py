@@ -0,0 +1,214 @@
+"""
+Precompiled regular expressions and word lists used by the synthesizer.
+
+Every step of every synthesis runs through dozens of searches and rewrites.
+Compiling them once at import time (instead of passing literal patterns to
+re.search/re.sub on each call) removes the per-call pattern-cache lookup, and
+the alias table is handled by one combined alternation instead of a loop.
+Patterns whose name ends in _I are case-insensitive.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+# Generic text cleanup
+WHITESPACE = re.compile(r'\s+')
+MULTI_SPACE = re.compile(r'\s{2,}')
+NBSP_OR_SPACE = re.compile(r'[\u00A0\s]+')
+SPACE_BEFORE_COMMA = re.compile(r'\s+,')
+NON_ALPHA = re.compile(r'[^a-z\s]')
+NON_ALNUM = re.compile(r'[^a-z0-9\s]')
+BRACKETS_COMMAS = re.compile(r'[\(\)\[\]\,]')
+REPEATED_WORDS = re.compile(r'\b(\w+)(?: \1\b)+', re.I)
+SENTENCE_SPLIT = re.compile(r'(?<=[\.\?\!])\s+')
+LEADING_STEP_NUMBER = re.compile(r'^\s*(?:step\s*)?\d+[\:\.\)]\s*', re.I)
+
+# Step vocabulary
+SOAK = re.compile(r'\bsoak\b')
+SOAK_I = re.compile(r'\bsoak\b', re.I)
+SOAKED = re.compile(r'\bsoaked\b')
+SOAK_OR_SOAKED = re.compile(r'\bsoak(?:ed)?\b')
+GRIND = re.compile(r'\bgrind\b')
+GRIND_I = re.compile(r'\bgrind\b', re.I)
+GRIND_VARIANTS = re.compile(r'\b(grind(?:ing)?|ground)\b')
+FERMENT = re.compile(r'\bferment(?:ed|ing)?\b')
+FERMENT_I = re.compile(r'\bferment(?:ed|ing)?\b', re.I)
+COOK = re.compile(r'\bcook\b')
+BAKE = re.compile(r'\bbake\b')
+FRY = re.compile(r'\bfry\b')
+SIMMER = re.compile(r'\bsimmer\b')
+STEAM = re.compile(r'\bsteam\b')
+STIR_FRY = re.compile(r'\bstir[- ]?fry\b')
+BEAT_PREFIX = re.compile(r'\bbeat')
+OIL = re.compile(r'\b(oil)\b')
+HEAT_VERBS = re.compile(r'\b(heat|preheat)\b')
+COOK_VERBS = re.compile(r'\b(cook|bake|fry|simmer|steam)\b')
+ACTIVE_COOK_VERBS = re.compile(r'\b(stir|fry|simmer|sauté|saute)\b')
+MIX_ADD_VERBS = re.compile(r'\b(mix|combine|whisk|add|stir|fold)\b')
+MIX_LIKE_VERBS_I = re.compile(r'\b(grind|mix|combine|knead|stir|beat|whisk|fold)\b', re.I)
+NON_SOAK_ACTIONS = re.compile(r'\b(grind|mix|combine|spread|cook|fry|whisk|blend|pulse|beat|stir|bake|roast|saute)\b')
+REST_WORDS_I = re.compile(r"\b(rest|rise|proof|prove|ferment)\b", re.I)
+ADD_MIX_LINE_I = re.compile(r'^\s*(add|mix|combine)\b.*$', re.I)
+BATTER_MIX_VERBS_I = re.compile(r'\b(grind|mix|combine|whisk|beat|fold|blend|stir)\b', re.I)
+PREP_ACTION_VERBS = re.compile(r'\b(beat|whisk|mix|combine|stir|fold|knead|blend|whisked|beaten)\b')
+PREP_ACTION_VERBS_I = re.compile(r'\b(beat|whisk|mix|combine|stir|fold|knead|blend|whisked|beaten)\b', re.I)
+HEAT_ACTION_VERBS = re.compile(r'\b(heat|cook|fry|sauté|saute|bake|roast|grill|steam|simmer)\b')
+HEAT_ACTION_VERBS_I = re.compile(r'\b(heat|cook|fry|sauté|saute|bake|roast|grill|steam|simmer)\b', re.I)
+FLOUR_WORDS = re.compile(r"(gram flour|besan|semolina|suji|maida|atta|rice|[a-z ]+flour)")
+YOGURT_WORDS = re.compile(r"(yogurt|curd|dahi|yoghurt)")
+BEATEN_EGG_VARIANTS = re.compile(r'\b(beaten|beaten eggs|egg mixture)\b')
+THEN_SPLIT = re.compile(r'\b(?:then|and then|, then|;| and | then )\b', re.I)
+
+# Time / temperature
+DURATION_I = re.compile(r'\b\d+\s*(?:[-–]\s*\d+)?\s*(?:hours?|hrs?|minutes?|mins?)\b', re.I)
+TEMPERATURE_I = re.compile(r'\b\d+\s*(?:°\s?[cf]|°c|°f)\b', re.I)
+TEMPERATURE_VALUE_I = re.compile(r'\b(\d+)\s*°\s?([cf])\b', re.I)
+TIME_HINT_FALLBACK = re.compile(r'\b(\d+\s*(?:-|\u2013)?\d*\s*(?:min|mins|minutes|h|hr|hour|hours)|\d+°C|\d+°F|for \d+|overnight)\b')
+MINUTES_VALUE = re.compile(r"(\d+)\s*(?:mins?|minutes?)")
+HOURS_RANGE = re.compile(r'(\d+(?:\.\d*)?)\s*[-–to]+\s*(\d+(?:\.\d*)?)\s*(?:hours?|hrs?|h)\b')
+HOURS_SINGLE = re.compile(r'(\d+(?:\.\d*)?)\s*(?:hours?|hrs?|h)\b')
+NUMBER = re.compile(r'\b(\d+(?:\.\d*)?)\b')
+TIME_OR_TEMP_UNIT = re.compile(r'\b(min|minute|minutes|hr|hour|°c|°f|degrees|°)\b')
+TIME_OR_TEMP_VALUE_I = re.compile(r'\b(\d+\s?(mins?|minutes?|hrs?|hours?|°\s?[CF]|°C|°F|degrees))\b', re.I)
+EXPLICIT_DURATION_I = re.compile(r'\b(overnight|overnight\.?|for\s+\d+\s*(hours?|hrs?|h|minutes?|mins?)|at\s*\d+°[CF])\b', re.I)
+HOURS = re.compile(r'\b\d+\s*(hours?|hrs?)\b')
+HOURS_I = re.compile(r'\b\d+\s*(hours?|hrs?)\b', re.I)
+HOURS_WORD_I = re.compile(r'\b\d+\s*hours?\b', re.I)
+HOURS_RANGE_I = re.compile(r'\d+\s*[-–]\s*\d+\s*hours?', re.I)
+
+# Rewrites
+ADD_SALT = re.compile(r'\badd\s+salt\s*(?:and\s*)?', re.I)
+SALT_COMMA_AND = re.compile(r'\b(salt\s*,\s*and\s*)', re.I)
+TRAILING_SALT = re.compile(r'\b(salt)\b(?=\s*(for|until|when|to|and|,|\.|$))', re.I)
+BAKING_SODA = re.compile(r'\b(baking soda|soda)\b', re.I)
+AND_AND = re.compile(r'\band\s+and\b', re.I)
+AND_BEFORE_PUNCT = re.compile(r'\b(and)\s*(?=[\.,;:])', re.I)
+TRAILING_AND = re.compile(r'\band\s*$', re.I)
+LEADING_AND = re.compile(r'^\s*and\s+', re.I)
+LEADING_AND_THEN = re.compile(r'^(and|then)\s+', re.I)
+DOT_AND_THEN = re.compile(r'\.\s*(and|then)\b', re.I)
+FERMENT_CLAUSE_I = re.compile(r'[,;]?\s*(and\s+)?(?:may\s+)?(?:then\s+)?(?:allow\s+to\s+)?(?:to\s+)?ferment(?:\s+if\s+required|\s+if\s+needed|(?:\s+for\s+[^\.,;]+)?)?', re.I)
+FERMENT_TAIL_I = re.compile(r';?\s*ferment.*', re.I)
+SOY_SAUCE_I = re.compile(r'\bsoy\s+sauce\b', re.I)
+SOY_LEAD_I = re.compile(r'^(add\s+soy|then\s+add\s+soy|combine.*soy)', re.I)
+ADD_SOY_SAUCE_I = re.compile(r'\b(?:then\s+)?add\s+soy\s+sauce\b', re.I)
+AND_SOY_SAUCE_I = re.compile(r'\band\s+soy\s+sauce\b', re.I)
+STIR_FRY_INGREDIENTS_I = re.compile(r'\b(oil|water|salt|garlic|ginger|onion|pepper|carrot|broccoli|vegetable)\b', re.I)
+WITH_SALT_AND_FENUGREEK_I = re.compile(r'\s*with\s+salt\s+and\s+fenugreek', re.I)
+AND_FENUGREEK_I = re.compile(r'\s*and\s+fenugreek', re.I)
+
+# LLM output sanitizing
+BLANK_LINE_RUNS = re.compile(r'\n{3,}')
+HANDLEBARS = re.compile(r'\{\{.*?\}\}')
+DOUBLE_ANGLE = re.compile(r'<\s*<.*?>')
+ANGLE_RUNS = re.compile(r'[<>]{2,}')
+ANGLE_TAG = re.compile(r'<[^>\n]{0,60}>')
+TEMPLATE_TOKENS = re.compile(r'\b(step[>\:\s]*|<step>|<\s*step\s*>|template|placeholder)\b', re.I)
+LINE_BREAKS = re.compile(r'[\n\r]+')
+PUNCT_ONLY = re.compile(r'[\W_]+')
+WORD = re.compile(r'\b\w+\b')
+NON_SPACE_RUN = re.compile(r'\S+')
+LLM_PREAMBLE = re.compile(r'^[`\-"\']*\s*(?:step[>\:\s]*|sure[>\:\s]*|ok[>\:\s]*|got it[>\:\s]*|\banswer\b[>\:\s]*)', re.I)
+STEP_LABEL = re.compile(r'(?i)\bstep\s*(\d+)\s*(?:[:\-\.\)])')
+LINE_NUMBER_PAREN = re.compile(r'(?m)^\s*(\d+)\s*[\)\:]\s*')
+LINE_NUMBER_DOT = re.compile(r'(?m)^\s*(\d+)\s*\.\s*')
+INLINE_NUMBER = re.compile(r'(?<!\n)(?<=\S)\s+(\d+)\s*[:\.]\s*')
+NUMBERED_ITEM = re.compile(r'^\s*(\d+)[\:\.]\s*(.+?)(?=\n\s*\d+[\:\.]|\Z)', re.S | re.M)
+LEAD_BEFORE_NUMBERED = re.compile(r'^(.*?)\n\s*(?:Step\s*)?\d+[\:\.]', re.S | re.I)
+
+# Titles
+TITLE_SERVINGS_SUFFIX = re.compile(r'\s*\(for \d+ servings\)$')
+TITLE_SYNTH_PREFIX = re.compile(r'^Synthesized\s*--\s*')
+
+
+# Word lists for step fingerprints (_normalize_for_dedupe)
+DEDUPE_STOPWORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'to', 'for', 'of', 'in', 'on', 'with',
+    'then', 'so', 'by', 'at', 'from', 'as', 'into', 'until', 'that'
+})
+DEDUPE_ACTION_VERBS = frozenset({
+    # common verbs we don't want to rely on for fingerprint
+    'mix', 'mixing', 'whisk', 'whisking', 'stir', 'stirring', 'combine', 'combining',
+    'add', 'adding', 'fold', 'folding', 'beat', 'beating', 'blend', 'blending',
+    'grind', 'grinding', 'soak', 'soaking', 'steam', 'steaming', 'bake', 'baking',
+    'fry', 'frying', 'cook', 'cooking', 'heat', 'press', 'pressing', 'serve', 'serving',
+    'let', 'allow', 'rest', 'stand', 'proof', 'prove', 'garnish', 'sprinkle', 'drizzle',
+    'make', 'making', 'prepare', 'preparing', 'measure', 'measuring', 'adjust', 'adjusting',
+    'together', 'together,', 'together.', 'gently', 'gradually', 'until', 'into', 'form'
+})
+DEDUPE_UNIT_WORDS = frozenset({
+    'g', 'gram', 'grams', 'kg', 'ml', 'l', 'cup', 'cups', 'tbsp', 'tsp', 'teaspoon', 'tablespoon',
+    'pinch', 'piece', 'pieces', 'slice', 'slices', 'small', 'large', 'medium'
+})
+DEDUPE_NOISE_WORDS = DEDUPE_STOPWORDS | DEDUPE_ACTION_VERBS | DEDUPE_UNIT_WORDS
+DEDUPE_NOISE_ADJECTIVES = frozenset({'smooth', 'golden', 'fresh', 'warm', 'hot', 'cold'})
+
+
+@lru_cache(maxsize=1024)
+def word(token: str) -> "re.Pattern":
+    """Compiled whole-word pattern for a literal token (e.g. an ingredient word)."""
+    return re.compile(r'\b' + re.escape(token) + r'\b')
+
+
+@lru_cache(maxsize=64)
+def any_of(patterns: Tuple[str, ...]) -> "re.Pattern":
+    """One alternation equivalent to any(re.search(p, s) for p in patterns)."""
+    return re.compile('|'.join(f'(?:{p})' for p in patterns))
+
+
+class AliasReplacer:
+    """Replace whole-word aliases in a single pass.
+
+    All aliases are folded into one case-insensitive alternation (longest
+    first) and the replacement is a dict lookup on the matched word. Alias
+    chains (a -> b, b -> c) are resolved up front.
+    """
+
+    def __init__(self, aliases: Dict[str, str], transform=str.title):
+        resolved = {}
+        for alias in aliases:
+            target, seen = aliases[alias], {alias}
+            while target in aliases and aliases[target] != target and target not in seen:
+                seen.add(target)
+                target = aliases[target]
+            resolved[alias.lower()] = transform(target)
+        self._replacement = resolved
+        alternation = '|'.join(re.escape(a) for a in sorted(resolved, key=len, reverse=True))
+        self._pattern = re.compile(r'\b(?:' + alternation + r')\b', re.I) if resolved else None
+
+    def sub(self, text: str) -> str:
+        if self._pattern is None:
+            return text
+        return self._pattern.sub(lambda m: self._replacement[m.group(0).lower()], text)
+
+
+class PhaseKeywordTable:
+    """Flattened keyword -> phase table in priority order.
+
+    classify_phase uses substring semantics ('heat' matches 'preheat'). For
+    short step texts a flat scan of `kw in text` beats a combined regex
+    alternation, so the table is flattened once and results are memoized per
+    step text (the same steps are classified several times per synthesis).
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]], priority: Iterable[str], max_entries: int = 4096):
+        self._table = tuple((kw, phase) for phase in priority for kw in keywords.get(phase, ()))
+        self._memo: Dict[str, Optional[Tuple[str, str]]] = {}
+        self._max_entries = max_entries
+
+    def lookup(self, low: str) -> Optional[Tuple[str, str]]:
+        """Return (phase, keyword) of the first keyword found in low, or None."""
+        try:
+            return self._memo[low]
+        except KeyError:
+            pass
+        hit = None
+        for kw, phase in self._table:
+            if kw in low:
+                hit = (phase, kw)
+                break
+        if len(self._memo) >= self._max_entries:
+            self._memo.clear()
+        self._memo[low] = hit
+        return hit
@@ -0,0 +1,192 @@
+"""
+Cache of synthesized recipes.
+
+Synthesis is a pure function of the source versions, the requested servings,
+the reorder flag, the model and the source merge weights, so repeat requests for the same dish can be
+answered from memory. Entries are evicted LRU-first and expire after a TTL;
+adding a version to (or deleting) any source recipe invalidates every entry
+built from it.
+
+With stale-while-revalidate enabled, an expired entry is still served for a
+grace period while a background thread recomputes it.
+
+A rule-based recipe returned because the model missed its latency budget
+(synthesis_deadline.py) is not stored; the model's own result is, once it
+arrives.
+
+Configuration (environment):
+    KITCHENMIND_SYNTH_CACHE_SIZE    maximum number of cached results (0 disables the cache)
+    KITCHENMIND_SYNTH_CACHE_TTL_S   seconds an entry is fresh
+    KITCHENMIND_SYNTH_CACHE_SWR_S   extra seconds an expired entry may be served while refreshing (0 = off)
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Sequence, Set, Tuple
+
+from .models import Recipe
+from .synthesis_deadline import is_deadline_fallback
+
+SYNTH_CACHE_SIZE = int(os.getenv("KITCHENMIND_SYNTH_CACHE_SIZE", "256"))
+SYNTH_CACHE_TTL_S = float(os.getenv("KITCHENMIND_SYNTH_CACHE_TTL_S", "3600"))
+SYNTH_CACHE_SWR_S = float(os.getenv("KITCHENMIND_SYNTH_CACHE_SWR_S", "0"))
+
+
+def synthesis_cache_key(sources: Iterable[Recipe], servings: int, reorder: bool, model_name: str,
+                        weights: Optional[Sequence[float]] = None, profile=None) -> Optional[Tuple]:
+    """Build the cache key for a synthesis request, or None if a source has no stored version.
+
+    weights are the per-source merge weights (scores change with ratings while
+    versions stay the same, so they are part of the key, rounded). profile is
+    the ingredient profile used instead of merging the sources, if any (it
+    changes as versions of the dish are approved).
+    """
+    version_ids = []
+    for r in sources:
+        version_id = (getattr(r, 'metadata', None) or {}).get('version_id')
+        if not version_id:
+            return None
+        version_ids.append(str(version_id))
+    weight_key = None
+    if weights is not None:
+        weight_key = tuple(sorted(zip(version_ids, (round(float(w), 3) for w in weights))))
+    key = (tuple(sorted(version_ids)), int(servings), bool(reorder), model_name, weight_key)
+    if profile:
+        key += (tuple((ing.name, round(float(ing.quantity), 6), ing.unit) for ing in profile),)
+    return key
+
+
+class _Entry:
+    __slots__ = ("recipe", "stored_at", "recipe_ids", "refreshing")
+
+    def __init__(self, recipe: Recipe, recipe_ids: Set[str]):
+        self.recipe = recipe
+        self.stored_at = time.monotonic()
+        self.recipe_ids = recipe_ids
+        self.refreshing = False
+
+
+class SynthesisCache:
+    """LRU + TTL cache of synthesized Recipe objects with per-recipe invalidation."""
+
+    def __init__(self, max_size: int = SYNTH_CACHE_SIZE, ttl_s: float = SYNTH_CACHE_TTL_S,
+                 stale_while_revalidate_s: float = SYNTH_CACHE_SWR_S):
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.stale_while_revalidate_s = stale_while_revalidate_s
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._by_recipe: Dict[str, Set[Tuple]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale_hits": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def get_or_compute(self, key: Optional[Tuple], recipe_ids: Iterable[str], compute: Callable[[], Recipe]) -> Recipe:
+        """Return a copy of the cached result for key, computing and storing it on a miss."""
+        if key is None or not self.enabled:
+            return compute()
+        recipe_ids = {str(rid) for rid in recipe_ids if rid}
+        refresh = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.stored_at
+                if age <= self.ttl_s:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return copy.deepcopy(entry.recipe)
+                if age <= self.ttl_s + self.stale_while_revalidate_s:
+                    self._entries.move_to_end(key)
+                    self.stats["stale_hits"] += 1
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        refresh = True
+                    stale = copy.deepcopy(entry.recipe)
+                else:
+                    self._drop(key)
+                    entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+        if entry is not None:
+            if refresh:
+                threading.Thread(target=self._refresh, args=(key, recipe_ids, compute), daemon=True).start()
+            return stale
+        result = compute()
+        self.put(key, recipe_ids, result)
+        return result
+
+    def _refresh(self, key: Tuple, recipe_ids: Set[str], compute: Callable[[], Recipe]):
+        try:
+            self.put(key, recipe_ids, compute())
+        except Exception as e:
+            print(f"[DEBUG] SynthesisCache: background refresh failed for {key}: {e!r}")
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refreshing = False
+
+    def put(self, key: Tuple, recipe_ids: Iterable[str], recipe: Recipe):
+        if key is None or not self.enabled or is_deadline_fallback(recipe):
+            return
+        recipe_ids = {str(rid) for rid in recipe_ids if rid}
+        stored = copy.deepcopy(recipe)
+        # A sampled trace describes one particular run, not the cached result
+        stored.metadata.pop('trace', None)
+        stored.metadata.pop('trace_file', None)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = _Entry(stored, recipe_ids)
+            for rid in recipe_ids:
+                self._by_recipe.setdefault(rid, set()).add(key)
+            while len(self._entries) > self.max_size:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats["evictions"] += 1
+
+    def _drop(self, key: Tuple):
+        # Caller holds self._lock
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for rid in entry.recipe_ids:
+            keys = self._by_recipe.get(rid)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_recipe[rid]
+
+    def invalidate_recipe(self, recipe_id: str) -> int:
+        """Drop every entry synthesized from recipe_id; returns the number removed."""
+        with self._lock:
+            keys = list(self._by_recipe.get(str(recipe_id), ()))
+            for key in keys:
+                self._drop(key)
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_recipe.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[SynthesisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_synthesis_cache() -> SynthesisCache:
+    """Return the process-wide synthesis cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SynthesisCache()
+    return _cache
@@ -0,0 +1,133 @@
+"""
+Deadline-aware synthesis: a speculative rule-based result for slow models.
+
+With a latency budget, Synthesizer.synthesize starts the LLM pipeline on a
+thread of a small pool and, at the same time, runs the rule-based pipeline
+(the fallback:no-llm path, a few milliseconds) on the calling thread. If the
+model has not finished when the budget is spent, the rule-based recipe is
+returned, tagged metadata['synthesis_method'] = 'fallback:deadline'. The
+generation is not interrupted (a forward pass cannot be): when it completes,
+on_late is called with its recipe, which the controller uses to store it in
+the synthesis cache, so the next caller for the same sources gets the model's
+answer at once. Deadline fallbacks themselves are never cached.
+
+A generation still waiting for a pool thread when its budget is spent is
+cancelled (nobody waits for it, and it would only delay the requests queued
+behind it). At most KITCHENMIND_DEADLINE_MAX_LATE generations keep running
+after their deadline; while that many are, further budgeted requests are
+answered by the rule-based pipeline alone instead of queueing more work
+behind a model that is not keeping up.
+
+Streamed and batched syntheses wait for the model: their output is the
+generation itself.
+
+Configuration (environment):
+    KITCHENMIND_LATENCY_BUDGET_MS     default budget per synthesis request (0 = wait for the model)
+    KITCHENMIND_DEADLINE_WORKERS      threads running generations that race a deadline
+    KITCHENMIND_DEADLINE_CACHE_LATE   1 (default) = cache generations that missed their deadline
+    KITCHENMIND_DEADLINE_MAX_LATE     generations allowed to run on after missing their deadline
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextvars import copy_context
+from typing import Callable, Optional, Tuple, TypeVar
+
+LATENCY_BUDGET_MS = float(os.getenv("KITCHENMIND_LATENCY_BUDGET_MS", "0"))
+DEADLINE_WORKERS = int(os.getenv("KITCHENMIND_DEADLINE_WORKERS", "4"))
+DEADLINE_CACHE_LATE = os.getenv("KITCHENMIND_DEADLINE_CACHE_LATE", "1").lower() in ("1", "true", "yes")
+DEADLINE_MAX_LATE = int(os.getenv("KITCHENMIND_DEADLINE_MAX_LATE", str(DEADLINE_WORKERS)))
+
+DEADLINE_METHOD = "fallback:deadline"
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+stats = {"met": 0, "missed": 0, "cancelled": 0, "shed": 0, "late_done": 0, "late_failed": 0, "late_running": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str, n: int = 1):
+    with _stats_lock:
+        stats[key] += n
+
+
+def get_deadline_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, DEADLINE_WORKERS),
+                                               thread_name_prefix="synth-deadline")
+    return _executor
+
+
+def is_deadline_fallback(recipe) -> bool:
+    return (getattr(recipe, 'metadata', None) or {}).get('synthesis_method') == DEADLINE_METHOD
+
+
+def race(primary: Callable[[], T], fallback: Callable[[], T], budget_ms: float,
+         on_late: Optional[Callable[[T], None]] = None) -> Tuple[T, bool]:
+    """primary()'s result if it finishes within budget_ms, else fallback()'s; returns (result, missed).
+
+    primary runs on the deadline pool (in a copy of the caller's context) while fallback runs on the
+    calling thread. An error from primary within the budget is raised as without a deadline. After a
+    miss, on_late receives primary's result once it is done, unless primary had not started yet (it is
+    cancelled then). With DEADLINE_MAX_LATE generations already running late, primary is not started.
+    """
+    with _stats_lock:
+        shed = stats["late_running"] >= DEADLINE_MAX_LATE
+        if shed:
+            stats["shed"] += 1
+    if shed:
+        try:
+            return fallback(), True
+        except Exception as e:
+            print(f"[DEBUG] synthesis_deadline: fallback failed ({e!r}), waiting for the model")
+            return primary(), False
+
+    start = time.perf_counter()
+    future = get_deadline_executor().submit(copy_context().run, primary)
+    try:
+        speculative, speculative_error = fallback(), None
+    except Exception as e:
+        speculative, speculative_error = None, e
+    remaining_s = max(0.0, budget_ms / 1000.0 - (time.perf_counter() - start))
+    try:
+        result = future.result(timeout=remaining_s)
+        _count("met")
+        return result, False
+    except FutureTimeoutError:
+        if speculative_error is not None:
+            # nothing to fall back on: wait for the model after all
+            print(f"[DEBUG] synthesis_deadline: fallback failed ({speculative_error!r}), waiting for the model")
+            return future.result(), False
+    _count("missed")
+    if future.cancel():
+        # still queued behind other generations: drop it rather than run it for nobody
+        _count("cancelled")
+        return speculative, True
+    _count("late_running")
+
+    def _late(f):
+        _count("late_running", -1)
+        try:
+            late = f.result()
+        except Exception as e:
+            _count("late_failed")
+            print(f"[DEBUG] synthesis_deadline: late generation failed: {e!r}")
+            return
+        _count("late_done")
+        if on_late is not None:
+            try:
+                on_late(late)
+            except Exception as e:
+                print(f"[DEBUG] synthesis_deadline: on_late failed: {e!r}")
+
+    future.add_done_callback(_late)
+    return speculative, True
@@ -0,0 +1,186 @@
+"""
+In-process job queue for asynchronous recipe synthesis.
+
+POST /api/recipe/synthesize?async=true enqueues the whole synthesis (dish
+lookup, generation, persisting the version) as a job and returns its id at
+once; GET /api/recipe/synthesize/jobs/{id} reports queued / running / done /
+failed and, when done, the RecipeResponse.
+
+Jobs wait in a bounded queue (submissions beyond it are refused, so the API
+sheds load instead of piling up work) and run on a fixed number of worker
+threads, which caps how many syntheses run at once. With synthesis workers
+enabled (synthesis_workers.py) the CPU work itself still happens in worker
+processes. Finished jobs are kept for a TTL and then forgotten; expired jobs
+are swept on submit and lookup.
+
+The queue object only needs put_nowait()/get(), so a broker-backed queue can
+replace the local queue.Queue without touching the job bookkeeping.
+
+Configuration (environment):
+    KITCHENMIND_JOB_WORKERS      synthesis jobs running concurrently
+    KITCHENMIND_JOB_QUEUE_SIZE   jobs that may wait; further submissions are refused
+    KITCHENMIND_JOB_TTL_S        seconds a finished job stays retrievable
+    KITCHENMIND_JOB_MAX_KEPT     finished jobs kept at most (oldest dropped first)
+"""
+
+import os
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .utils_time import get_india_time
+
+JOB_WORKERS = int(os.getenv("KITCHENMIND_JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("KITCHENMIND_JOB_QUEUE_SIZE", "100"))
+JOB_TTL_S = float(os.getenv("KITCHENMIND_JOB_TTL_S", "3600"))
+JOB_MAX_KEPT = int(os.getenv("KITCHENMIND_JOB_MAX_KEPT", "1000"))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class QueueFull(RuntimeError):
+    """Raised by submit() when the job queue is at capacity."""
+
+
+class Job:
+    """One queued call and its outcome."""
+
+    __slots__ = ("job_id", "owner", "fn", "args", "kwargs", "status", "result", "error",
+                 "created_at", "started_at", "finished_at")
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict, owner: Optional[str] = None):
+        self.job_id = str(uuid.uuid4())
+        self.owner = owner
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = get_india_time()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED) and self.finished_at is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class SynthesisJobQueue:
+    """Bounded job queue served by a fixed pool of worker threads."""
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queued: int = JOB_QUEUE_SIZE,
+                 ttl_s: float = JOB_TTL_S, max_kept: int = JOB_MAX_KEPT, backend: Optional[Any] = None):
+        self.workers = max(int(workers), 1)
+        self.ttl_s = ttl_s
+        self.max_kept = max_kept
+        self._queue = backend if backend is not None else queue.Queue(maxsize=max(int(max_queued), 1))
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.stats = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0, "expired": 0}
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"synthesis-job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            job.status = RUNNING
+            job.started_at = get_india_time()
+            status, result, error = FAILED, None, None
+            try:
+                result = job.fn(*job.args, **job.kwargs)
+                status = DONE
+            except Exception as e:
+                print(f"[DEBUG] SynthesisJobQueue: job {job.job_id} failed: {e!r}")
+                status, error = FAILED, str(e) or e.__class__.__name__
+            finally:
+                job.finished_at = get_india_time()
+                job.fn = job.args = job.kwargs = None
+                # the terminal status goes last, under the lock _sweep holds: a finished job has finished_at
+                with self._lock:
+                    job.result, job.error = result, error
+                    job.status = status
+                    self.stats[status] += 1
+                if hasattr(self._queue, 'task_done'):
+                    self._queue.task_done()
+
+    def _sweep(self, now: datetime):
+        """Forget finished jobs past their TTL, and the oldest ones beyond max_kept (lock held)."""
+        finished = [j for j in self._jobs.values() if j.finished]
+        expired = [j for j in finished if (now - j.finished_at).total_seconds() > self.ttl_s]
+        overflow = len(finished) - len(expired) - self.max_kept
+        if overflow > 0:
+            expired_ids = {j.job_id for j in expired}
+            expired.extend([j for j in finished if j.job_id not in expired_ids][:overflow])
+        for j in expired:
+            self._jobs.pop(j.job_id, None)
+        self.stats["expired"] += len(expired)
+
+    def submit(self, fn: Callable, *args, owner: Optional[str] = None, **kwargs) -> Job:
+        """Queue fn(*args, **kwargs); raises QueueFull when the queue is at capacity."""
+        self._ensure_workers()
+        job = Job(fn, args, kwargs, owner)
+        with self._lock:
+            self._sweep(get_india_time())
+            self._jobs[job.job_id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+                self.stats["rejected"] += 1
+            raise QueueFull("Too many synthesis jobs are queued; please retry shortly")
+        with self._lock:
+            self.stats["submitted"] += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._sweep(get_india_time())
+            return self._jobs.get(job_id)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for j in self._jobs.values():
+                counts[j.status] = counts.get(j.status, 0) + 1
+            return {"workers": self.workers, "jobs": counts, **self.stats}
+
+
+_jobs: Optional[SynthesisJobQueue] = None
+_jobs_lock = threading.Lock()
+
+
+def get_synthesis_jobs() -> SynthesisJobQueue:
+    """Return the process-wide job queue, configured from the environment on first use."""
+    global _jobs
+    if _jobs is None:
+        with _jobs_lock:
+            if _jobs is None:
+                _jobs = SynthesisJobQueue()
+    return _jobs
@@ -0,0 +1,252 @@
+"""
+Staged synthesis pipeline.
+
+Synthesizer.synthesize runs as an ordered list of named stages over a shared
+SynthesisContext. The fallback (no model) and LLM paths use the same list;
+a stage declares which paths it runs on, so the steps both paths have in
+common (reorder, merge, coverage, dedupe, soak/grind and ferment fixes, ...)
+are implemented once. The domain fixes themselves are declarative rules
+(postprocess_rules.py) that a few stages apply.
+
+Every stage is timed. The per-request breakdown ends up in
+recipe.metadata['stage_timings_ms'], process-wide totals are available from
+SynthesisPipeline.snapshot(), and hooks registered with add_hook() see each
+stage as it finishes (for metrics exporters or ad-hoc profiling). Stages that
+are not required can be switched off, e.g. to measure what a post-processing
+pass costs or to bisect a bad output; a name that is not a stage but a rule
+(soy_dedupe, ferment_before_cook, ...) switches off just that rule.
+
+Which path runs is chosen by the engine: 'rules' always takes the fallback
+path without touching the model pool, 'llm' requires the model (and fails if
+it cannot be loaded), 'auto' uses the model when it is available. A model
+that failed to load is remembered by the pool for a back-off period
+(model_pool.py), so 'auto' does not retry the load on every request.
+
+Configuration (environment):
+    KITCHENMIND_SYNTH_ENGINE      default engine: auto | rules | llm
+    KITCHENMIND_DISABLED_STAGES   comma separated stage names to skip (required stages cannot be disabled)
+    KITCHENMIND_STAGE_ALLOC       1 = also record peak allocation per stage with tracemalloc (slow; profiling only)
+"""
+
+import os
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional
+
+from .models import Ingredient, Recipe
+from .synthesis_trace import current_trace
+
+FALLBACK = 'fallback'
+LLM = 'llm'
+BOTH_PATHS = frozenset({FALLBACK, LLM})
+
+ENGINE_RULES = 'rules'
+ENGINE_LLM = 'llm'
+ENGINE_AUTO = 'auto'
+ENGINES = (ENGINE_AUTO, ENGINE_RULES, ENGINE_LLM)
+
+SYNTH_ENGINE = os.getenv("KITCHENMIND_SYNTH_ENGINE", ENGINE_AUTO).strip().lower()
+
+
+def engine_name(engine: Optional[str]) -> str:
+    """The normalized engine name (None = KITCHENMIND_SYNTH_ENGINE); ValueError for an unknown one."""
+    name = (engine or SYNTH_ENGINE).strip().lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown synthesis engine {name!r}; expected one of {', '.join(ENGINES)}")
+    return name
+
+DISABLED_STAGES = [
+    name.strip()
+    for name in os.getenv("KITCHENMIND_DISABLED_STAGES", "").split(",")
+    if name.strip()
+]
+STAGE_ALLOC_TRACKING = os.getenv("KITCHENMIND_STAGE_ALLOC", "0").lower() in ("1", "true", "yes")
+
+
+@dataclass
+class SynthesisContext:
+    """State handed from stage to stage during one synthesize() call."""
+    top_recipes: List[Recipe]
+    requested_servings: int
+    llm_model: str
+    reorder: bool
+    path: str
+    llm: Any = None
+    weights: Optional[List[float]] = None
+    ingredient_profile: Optional[List[Ingredient]] = None
+    merged_ings: List[Ingredient] = field(default_factory=list)
+    prep_from_ings: List[str] = field(default_factory=list)
+    raw_steps: List[str] = field(default_factory=list)
+    out_lines: List[str] = field(default_factory=list)
+    prompt: Optional[str] = None
+    prompt_stats: Dict[str, Any] = field(default_factory=dict)
+    generated_text: str = ""
+    ingredient_matcher: Any = None
+    result: Optional[Recipe] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    allocations: Dict[str, int] = field(default_factory=dict)
+
+
+class Stage:
+    """A named step of the pipeline, implemented by a Synthesizer method taking the context."""
+
+    __slots__ = ("name", "method", "paths", "required")
+
+    def __init__(self, name: str, method: str, paths: FrozenSet[str] = BOTH_PATHS, required: bool = False):
+        self.name = name
+        self.method = method
+        self.paths = frozenset(paths)
+        self.required = required
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, paths={sorted(self.paths)}, required={self.required})"
+
+
+DEFAULT_STAGES = [
+    Stage('merge_ingredients', '_stage_merge_ingredients', required=True),
+    Stage('prep_from_ingredients', '_stage_prep_from_ingredients'),
+    Stage('canonicalize', '_stage_canonicalize', required=True),
+    Stage('draft_fallback', '_stage_draft_fallback', {FALLBACK}, required=True),
+    Stage('compact_prompt', '_stage_compact_prompt', {LLM}),
+    Stage('generate_llm', '_stage_generate_llm', {LLM}, required=True),
+    Stage('reorder', '_stage_reorder'),
+    Stage('soak_before_grind', '_stage_soak_before_grind', {FALLBACK}),
+    Stage('merge_semantic', '_stage_merge_semantic'),
+    Stage('leavening_cleanup', '_stage_leavening_cleanup'),
+    Stage('prep_survival', '_stage_prep_survival'),
+    Stage('collapse_words', '_stage_collapse_words'),
+    Stage('strip_numbering', '_stage_strip_numbering', {LLM}),
+    Stage('coverage', '_stage_coverage'),
+    Stage('reorder_after_coverage', '_stage_reorder', {LLM}),
+    Stage('ferment_cleanup', '_stage_ferment_cleanup'),
+    Stage('dedupe', '_stage_dedupe'),
+    Stage('order_rules', '_stage_order_rules'),
+    Stage('collapse_grind', '_stage_collapse_grind', {LLM}),
+    Stage('idli_ferment', '_stage_idli_ferment', {LLM}),
+    Stage('soak_duration', '_stage_soak_duration', {LLM}),
+    Stage('strip_autogen', '_stage_strip_autogen', {LLM}),
+    Stage('finish_rules', '_stage_finish_rules', {LLM}),
+    Stage('finalize', '_stage_finalize', required=True),
+]
+
+# hook(stage_name, ctx, elapsed_ms, alloc_bytes) — alloc_bytes is None unless allocation tracking is on
+StageHook = Callable[[str, SynthesisContext, float, Optional[int]], None]
+
+
+class SynthesisPipeline:
+    """Runs stages in order, timing each one and skipping disabled stages."""
+
+    def __init__(self, stages: Iterable[Stage] = DEFAULT_STAGES, disabled: Iterable[str] = (),
+                 track_allocations: bool = STAGE_ALLOC_TRACKING):
+        self.stages: List[Stage] = list(stages)
+        self._by_name = {s.name: s for s in self.stages}
+        self.disabled = set()
+        self.track_allocations = track_allocations
+        self._hooks: List[StageHook] = []
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, float]] = {}
+        for name in disabled:
+            self.disable(name)
+
+    def disable(self, name: str):
+        stage = self._by_name.get(name)
+        if stage is None:
+            from .postprocess_rules import get_rule_engine
+            if get_rule_engine().has_rule(name):
+                get_rule_engine().disable(name)
+                return
+            raise ValueError(f"Unknown synthesis stage {name!r}")
+        if stage.required:
+            raise ValueError(f"Synthesis stage {name!r} is required and cannot be disabled")
+        self.disabled.add(name)
+
+    def enable(self, name: str):
+        if name not in self._by_name:
+            from .postprocess_rules import get_rule_engine
+            get_rule_engine().enable(name)
+        self.disabled.discard(name)
+
+    def add_hook(self, hook: StageHook):
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: StageHook):
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def stages_for(self, path: str) -> List[Stage]:
+        """Stages that will run for path, in order, with disabled ones removed."""
+        return [s for s in self.stages if path in s.paths and s.name not in self.disabled]
+
+    def run(self, owner, ctx: SynthesisContext) -> Recipe:
+        trace = current_trace()
+        track = self.track_allocations
+        started_tracing = track and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        try:
+            self._run_stages(owner, ctx, trace, track)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+        if ctx.result is None:
+            raise RuntimeError("Synthesis pipeline finished without producing a recipe")
+        return ctx.result
+
+    def _run_stages(self, owner, ctx: SynthesisContext, trace, track: bool):
+        for stage in self.stages_for(ctx.path):
+            alloc = None
+            if track:
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+            getattr(owner, stage.method)(ctx)
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            if track:
+                _, peak = tracemalloc.get_traced_memory()
+                alloc = max(0, peak - base)
+                ctx.allocations[stage.name] = alloc
+            ctx.timings[stage.name] = round(elapsed_ms, 3)
+            self._record(stage.name, elapsed_ms)
+            if trace.enabled:
+                trace.event('pipeline', 'stage', name=stage.name, ms=round(elapsed_ms, 3), lines=len(ctx.out_lines))
+            for hook in self._hooks:
+                hook(stage.name, ctx, elapsed_ms, alloc)
+
+    def _record(self, name: str, elapsed_ms: float):
+        with self._lock:
+            st = self.stats.get(name)
+            if st is None:
+                st = self.stats[name] = {"calls": 0, "total_ms": 0.0, "max_ms": 0.0}
+            st["calls"] += 1
+            st["total_ms"] += elapsed_ms
+            st["max_ms"] = max(st["max_ms"], elapsed_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-stage call counts and timings since startup, plus the disabled stages and rules."""
+        from .postprocess_rules import get_rule_engine
+        with self._lock:
+            stages = {
+                name: {**st, "avg_ms": st["total_ms"] / st["calls"] if st["calls"] else 0.0}
+                for name, st in self.stats.items()
+            }
+        return {"stages": stages, "disabled": sorted(self.disabled | get_rule_engine().disabled)}
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats.clear()
+
+
+_pipeline: Optional[SynthesisPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_synthesis_pipeline() -> SynthesisPipeline:
+    """Return the process-wide pipeline, configured from the environment on first use."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = SynthesisPipeline(disabled=DISABLED_STAGES)
+    return _pipeline
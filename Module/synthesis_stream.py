@@ -0,0 +1,123 @@
+"""
+Incremental events from a running synthesis, for server-sent-event streaming.
+
+A synchronous /recipe/synthesize call answers only after the model has
+produced all of its tokens and post-processing has run. The streaming endpoint
+instead sends what is known as soon as it is known:
+
+    ingredients   the merged ingredient list (right after merge_ingredients)
+    step_delta    raw step text as the model emits it (LLM path only)
+    recipe        the final, post-processed and persisted recipe (closing event)
+    error         the synthesis failed (closing event)
+
+Streamed step text is the model's raw output; the steps in the closing
+`recipe` event are the post-processed ones and replace it.
+
+When the client goes away the response closes the stream; the next emit()
+then raises StreamClosed, which ends the synthesis (and stops the model's
+generation) instead of producing events nobody reads.
+
+Like the decision trace, the stream of the current synthesis lives in a
+context variable and is a shared null object when nobody is listening, so
+stages emit with a single attribute check:
+
+    stream = current_stream()
+    if stream.enabled:
+        stream.emit('ingredients', ingredients=[...])
+
+Configuration (environment):
+    KITCHENMIND_STREAM_KEEPALIVE_S   seconds without an event after which an SSE comment is sent
+                                     (keeps proxies from closing the connection while the model loads)
+"""
+
+import json
+import os
+import queue
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+STREAM_KEEPALIVE_S = float(os.getenv("KITCHENMIND_STREAM_KEEPALIVE_S", "15"))
+
+CLOSING_EVENTS = frozenset({'recipe', 'error'})
+
+
+class _NullStream:
+    """Stand-in used when nobody streams the synthesis; every call is a no-op."""
+
+    enabled = False
+
+    def emit(self, event: str, **data):
+        pass
+
+    def text(self, chunk: str):
+        pass
+
+
+NULL_STREAM = _NullStream()
+
+
+class StreamClosed(Exception):
+    """Raised by emit() once the consumer has closed the stream."""
+
+
+class SynthesisStream:
+    """Events of one synthesis, produced on the synthesis thread and consumed by the response."""
+
+    enabled = True
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue()
+        self.closed = False
+
+    def close(self):
+        """Nobody reads the events any more (client disconnected)."""
+        self.closed = True
+
+    def emit(self, event: str, **data):
+        if self.closed:
+            raise StreamClosed(event)
+        self._queue.put((event, data))
+
+    def text(self, chunk: str):
+        """Callback for the model's token streamer."""
+        if chunk:
+            self.emit('step_delta', text=chunk)
+
+    def events(self, keepalive_s: float = STREAM_KEEPALIVE_S) -> Iterator[Optional[Tuple[str, Dict[str, Any]]]]:
+        """Yield (event, data) until a closing event; None marks keepalive_s without events."""
+        while True:
+            try:
+                item = self._queue.get(timeout=keepalive_s or None)
+            except queue.Empty:
+                yield None
+                continue
+            yield item
+            if item[0] in CLOSING_EVENTS:
+                return
+
+
+def sse_format(event: str, data: Dict[str, Any]) -> str:
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+SSE_KEEPALIVE = ": keep-alive\n\n"
+
+
+_current: ContextVar = ContextVar("kitchenmind_synthesis_stream", default=NULL_STREAM)
+
+
+def current_stream():
+    """Return the stream of the synthesis running in this context (the null stream if none)."""
+    return _current.get()
+
+
+@contextmanager
+def streaming(stream):
+    """Make stream the current stream for the duration of the block."""
+    token = _current.set(stream)
+    try:
+        yield stream
+    finally:
+        _current.reset(token)
@@ -0,0 +1,120 @@
+"""
+Structured decision trace for recipe synthesis.
+
+The synthesizer used to print every intermediate decision to stdout, which
+cost real time on every request and was impossible to read under concurrency.
+Instead, each stage now records what it decided (which steps were merged by
+dedupe, which phase a step was classified into, which soak/grind lines were
+moved, which coverage step was inserted, ...) on the trace of the current
+request.
+
+Tracing is off by default. A request can ask for a trace explicitly, or a
+fraction of requests can be sampled. When no trace is active the current trace
+is a shared null object whose `enabled` flag is False, so call sites guard
+their event construction with a single attribute check:
+
+    trace = current_trace()
+    if trace.enabled:
+        trace.event('dedupe', 'merge', kept=a, dropped=b)
+
+Configuration (environment):
+    KITCHENMIND_TRACE_SAMPLE_RATE   fraction of synthesize() calls traced without being asked (0 = only on request)
+    KITCHENMIND_TRACE_DIR           if set, every finished trace is also written there as JSON
+    KITCHENMIND_TRACE_MAX_EVENTS    events kept per trace; later events are counted but dropped
+"""
+
+import json
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+TRACE_SAMPLE_RATE = float(os.getenv("KITCHENMIND_TRACE_SAMPLE_RATE", "0"))
+TRACE_DIR = os.getenv("KITCHENMIND_TRACE_DIR", "")
+TRACE_MAX_EVENTS = int(os.getenv("KITCHENMIND_TRACE_MAX_EVENTS", "2000"))
+
+
+class _NullTrace:
+    """Stand-in used when tracing is off; every call is a no-op."""
+
+    enabled = False
+    trace_id = None
+
+    def event(self, stage: str, decision: str, **data):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+class SynthesisTrace:
+    """Ordered list of decisions made while synthesizing one recipe."""
+
+    enabled = True
+
+    def __init__(self, max_events: int = TRACE_MAX_EVENTS):
+        self.trace_id = str(uuid.uuid4())
+        self.max_events = max_events
+        self.events: List[Dict[str, Any]] = []
+        self.dropped = 0
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    def event(self, stage: str, decision: str, **data):
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        entry = {
+            "t_ms": round((time.perf_counter() - self._start) * 1000.0, 3),
+            "stage": stage,
+            "decision": decision,
+        }
+        entry.update(data)
+        self.events.append(entry)
+
+    def finish(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000.0, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "duration_ms": self.duration_ms,
+            "events": list(self.events),
+            "dropped_events": self.dropped,
+        }
+
+    def write(self, directory: str = TRACE_DIR) -> str:
+        """Write the trace as <directory>/<trace_id>.json and return the path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.trace_id}.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(self.to_dict(), fh, ensure_ascii=False, indent=1, default=str)
+        return path
+
+
+_current: ContextVar = ContextVar("kitchenmind_synthesis_trace", default=NULL_TRACE)
+
+
+def current_trace():
+    """Return the trace of the synthesis running in this context (the null trace if none)."""
+    return _current.get()
+
+
+@contextmanager
+def tracing(trace):
+    """Make trace the current trace for the duration of the block."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def should_trace(requested: Optional[bool] = None, sample_rate: float = TRACE_SAMPLE_RATE) -> bool:
+    """True/False from the caller wins; otherwise sample at sample_rate."""
+    if requested is not None:
+        return bool(requested)
+    return sample_rate > 0 and random.random() < sample_rate
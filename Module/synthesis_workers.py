@@ -0,0 +1,181 @@
+"""
+Process pool for CPU-bound recipe synthesis.
+
+Synthesis is regex, tokenization and (with a model) torch work that holds the
+GIL for most of its run. Running it on the API's request threads lets a few
+concurrent /recipe/synthesize calls starve every cheap endpoint. With workers
+enabled, Synthesizer.synthesize runs in a dedicated pool of processes instead;
+each worker builds its own Synthesizer and preloads its models once, and the
+request thread only waits on a future (without holding the GIL).
+
+Sources and results cross the process boundary pickled (Recipe/Ingredient are
+plain dataclasses). Each worker has its own model pool, fingerprint caches
+and pipeline statistics; the synthesis cache stays in the API process.
+
+A worker that dies (e.g. OOM while loading a model) breaks the executor; the
+pool is then rebuilt and the request retried once.
+
+Configuration (environment):
+    KITCHENMIND_SYNTH_WORKERS          number of worker processes (0 = synthesize in the request thread)
+    KITCHENMIND_SYNTH_WORKER_PRELOAD   comma separated models each worker loads at start
+                                       (default: KITCHENMIND_PRELOAD_MODELS)
+    KITCHENMIND_SYNTH_WORKER_START     multiprocessing start method (spawn | forkserver | fork)
+    KITCHENMIND_SYNTH_TIMEOUT_S        seconds a request waits for its result (0 = no limit)
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+from .model_pool import PRELOAD_MODELS
+
+SYNTH_WORKERS = int(os.getenv("KITCHENMIND_SYNTH_WORKERS", "0"))
+SYNTH_WORKER_PRELOAD = [
+    name.strip()
+    for name in os.getenv("KITCHENMIND_SYNTH_WORKER_PRELOAD", ",".join(PRELOAD_MODELS)).split(",")
+    if name.strip()
+]
+SYNTH_WORKER_START = os.getenv("KITCHENMIND_SYNTH_WORKER_START", "spawn")
+SYNTH_TIMEOUT_S = float(os.getenv("KITCHENMIND_SYNTH_TIMEOUT_S", "0"))
+
+# --- worker process side -------------------------------------------------------
+
+_worker_synth = None
+
+
+def _init_worker(preload: List[str]):
+    """Executor initializer: one Synthesizer and the preloaded models per worker process."""
+    global _worker_synth
+    from .synthesizer import Synthesizer
+    from .model_pool import get_model_pool
+    _worker_synth = Synthesizer()
+    if preload:
+        loaded = get_model_pool().preload(preload)
+        print(f"[DEBUG] SynthesisWorker pid={os.getpid()}: models preloaded {loaded}")
+
+
+def _worker_synthesize(top_recipes, requested_servings: int, kwargs: Dict[str, Any]):
+    global _worker_synth
+    if _worker_synth is None:
+        _init_worker([])
+    return _worker_synth.synthesize(top_recipes, requested_servings, **kwargs)
+
+
+def _worker_ping() -> int:
+    return os.getpid()
+
+
+# --- API process side ------------------------------------------------------------
+
+class SynthesisWorkerPool:
+    """Runs Synthesizer.synthesize in a pool of worker processes."""
+
+    def __init__(self, workers: int = SYNTH_WORKERS, preload: Optional[List[str]] = None,
+                 start_method: str = SYNTH_WORKER_START, timeout_s: float = SYNTH_TIMEOUT_S):
+        self.workers = max(int(workers), 0)
+        self.preload = list(SYNTH_WORKER_PRELOAD if preload is None else preload)
+        self.start_method = start_method
+        self.timeout_s = timeout_s
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "restarts": 0,
+                      "in_flight": 0, "total_s": 0.0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                    initargs=(self.preload,),
+                )
+            return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self.stats["restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def start(self) -> List[int]:
+        """Spawn the workers now (instead of on the first request); returns their pids."""
+        if not self.enabled:
+            return []
+        executor = self._get_executor()
+        # One ping per worker makes the executor start all of them and run their initializers
+        futures = [executor.submit(_worker_ping) for _ in range(self.workers)]
+        return sorted({f.result() for f in futures})
+
+    def submit(self, top_recipes, requested_servings: int, **kwargs) -> Future:
+        """Queue a synthesis; the future resolves to the synthesized Recipe."""
+        executor = self._get_executor()
+        start = time.perf_counter()
+        future = executor.submit(_worker_synthesize, list(top_recipes), requested_servings, kwargs)
+        with self._lock:
+            self.stats["submitted"] += 1
+            self.stats["in_flight"] += 1
+
+        def _done(f: Future):
+            with self._lock:
+                self.stats["in_flight"] -= 1
+                self.stats["total_s"] += time.perf_counter() - start
+                if f.cancelled() or f.exception() is not None:
+                    self.stats["failed"] += 1
+                else:
+                    self.stats["completed"] += 1
+
+        future.add_done_callback(_done)
+        return future
+
+    def synthesize(self, top_recipes, requested_servings: int, **kwargs):
+        """Blocking synthesize() in a worker; retries once if the pool broke."""
+        for attempt in (1, 2):
+            executor = self._get_executor()
+            try:
+                future = self.submit(top_recipes, requested_servings, **kwargs)
+                return future.result(timeout=self.timeout_s or None)
+            except FutureTimeoutError:
+                future.cancel()
+                with self._lock:
+                    self.stats["timeouts"] += 1
+                raise RuntimeError(f"Recipe synthesis timed out after {self.timeout_s:g}s")
+            except BrokenProcessPool:
+                print(f"[DEBUG] SynthesisWorkerPool: worker pool broke (attempt {attempt}), restarting")
+                self._restart(executor)
+                if attempt == 2:
+                    raise RuntimeError("Recipe synthesis workers crashed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"workers": self.workers, "running": self._executor is not None, **self.stats}
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_workers: Optional[SynthesisWorkerPool] = None
+_workers_lock = threading.Lock()
+
+
+def get_synthesis_workers() -> SynthesisWorkerPool:
+    """Return the process-wide worker pool, configured from the environment on first use."""
+    global _workers
+    if _workers is None:
+        with _workers_lock:
+            if _workers is None:
+                _workers = SynthesisWorkerPool()
+    return _workers
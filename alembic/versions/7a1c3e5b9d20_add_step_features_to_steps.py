@@ -0,0 +1,39 @@
+"""add_step_features_to_steps
+
+Revision ID: 7a1c3e5b9d20
+Revises: 33d9e1d02e3f
+Create Date: 2026-10-17 10:12:44.208311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a1c3e5b9d20'
+down_revision: Union[str, Sequence[str], None] = '33d9e1d02e3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Precomputed synthesis features (Module/step_features.py); existing rows stay NULL
+    # until backfilled with `python -m Module.step_features --backfill` or validated again
+    op.add_column('steps', sa.Column('canonical_text', sa.Text(), nullable=True))
+    op.add_column('steps', sa.Column('phase', sa.String(), nullable=True))
+    op.add_column('steps', sa.Column('fingerprint', sa.Text(), nullable=True))
+    op.add_column('steps', sa.Column('temperature', sa.String(), nullable=True))
+    op.add_column('steps', sa.Column('features_version', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('steps') as batch_op:
+        batch_op.drop_column('features_version')
+        batch_op.drop_column('temperature')
+        batch_op.drop_column('fingerprint')
+        batch_op.drop_column('phase')
+        batch_op.drop_column('canonical_text')
@@ -0,0 +1,52 @@
+"""add_dish_ingredient_aggregates
+
+Revision ID: b4e8f2a61c57
+Revises: 7a1c3e5b9d20
+Create Date: 2026-10-17 14:03:18.550921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4e8f2a61c57'
+down_revision: Union[str, Sequence[str], None] = '7a1c3e5b9d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Running per-dish ingredient totals (Module/dish_aggregates.py); fill them for existing
+    # recipes with `python -m Module.dish_aggregates --rebuild`
+    op.create_table(
+        'dish_ingredient_aggregates',
+        sa.Column('dish_key', sa.String(), nullable=False),
+        sa.Column('ingredient', sa.String(), nullable=False),
+        sa.Column('dimension', sa.String(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('total', sa.Float(), nullable=True),
+        sa.Column('count', sa.Integer(), nullable=True),
+        sa.Column('position_total', sa.Float(), nullable=True),
+        sa.Column('unit_counts', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('dish_key', 'ingredient', 'dimension'),
+    )
+    op.create_table(
+        'dish_aggregate_members',
+        sa.Column('version_id', sa.String(), nullable=False),
+        sa.Column('dish_key', sa.String(), nullable=True),
+        sa.Column('contributions', sa.Text(), nullable=True),
+        sa.Column('added_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('version_id'),
+    )
+    op.create_index(op.f('ix_dish_aggregate_members_dish_key'), 'dish_aggregate_members', ['dish_key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_dish_aggregate_members_dish_key'), table_name='dish_aggregate_members')
+    op.drop_table('dish_aggregate_members')
+    op.drop_table('dish_ingredient_aggregates')
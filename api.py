@@ -249,6 +249,22 @@ def startup_event():
     km_instance = KitchenMind()
     print("✓ Database initialized")
     print("✓ KitchenMind instance created")
+    from Module.model_pool import get_model_pool, PRELOAD_MODELS
+    from Module.synthesis_workers import get_synthesis_workers
+    workers = get_synthesis_workers()
+    if workers.enabled:
+        # Synthesis runs in worker processes, each preloading its own models
+        print(f"✓ Synthesis workers started: pids {workers.start()}")
+    elif PRELOAD_MODELS:
+        # Optionally warm the shared model pool so the first synthesis does not pay the load
+        loaded = get_model_pool().preload(PRELOAD_MODELS)
+        print(f"✓ Models preloaded: {loaded}")
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    from Module.synthesis_workers import get_synthesis_workers
+    get_synthesis_workers().shutdown(wait=False)
 
 
 # ============================================================================
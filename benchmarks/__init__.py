@@ -0,0 +1,6 @@
+"""
+Benchmarks for the KitchenMind synthesis pipeline.
+
+Run from the repository root, e.g.:
+    python -m benchmarks.bench_step_patterns
+"""
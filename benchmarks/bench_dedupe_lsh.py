@@ -0,0 +1,87 @@
+"""
+Benchmark for the MinHash/LSH near-duplicate index (Module/near_duplicates.py).
+
+On a synthetic corpus (default 10k steps, ~30% planted near-duplicates):
+
+- index: replays the fingerprint keys through ExactIndex and MinHashLSHIndex
+  side by side and reports recall (queries where the exact scan found a
+  match and LSH returned the same key), LSH false negatives, candidates
+  verified per query and time per query;
+- dedupe: runs Synthesizer._dedupe_steps in exact and lsh mode and reports
+  wall time, output size and how many of the steps the exact scan dropped
+  as near-duplicates LSH dropped too.
+
+    python -m benchmarks.bench_dedupe_lsh [--steps N] [--seed S] [--bands B --rows R]
+"""
+
+import argparse
+import time
+
+from Module import near_duplicates as nd
+from Module import step_fingerprints as fp
+from Module.synthesizer import Synthesizer
+from benchmarks.synthetic_steps import generate_steps
+
+
+def _replay(index, keyed):
+    """Query-then-add every distinct key; return (matches, seconds)."""
+    matches = []
+    start = time.perf_counter()
+    for key, tokens in keyed:
+        matches.append(index.first_match(tokens))
+        index.add(key, tokens)
+    return matches, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--steps', type=int, default=10000, help='synthetic steps to deduplicate')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--bands', type=int, default=nd.DEDUPE_LSH_BANDS)
+    parser.add_argument('--rows', type=int, default=nd.DEDUPE_LSH_ROWS)
+    args = parser.parse_args()
+
+    steps, planted = generate_steps(args.steps, seed=args.seed)
+    print(f"{len(steps)} steps, {planted} planted near-duplicates")
+
+    keyed, seen = [], set()
+    for s in steps:
+        key = fp.fingerprint(s)
+        if key and key not in seen:
+            seen.add(key)
+            keyed.append((key, fp.key_tokens(key)))
+
+    exact_matches, exact_s = _replay(nd.ExactIndex(), keyed)
+    lsh = nd.MinHashLSHIndex(bands=args.bands, rows=args.rows)
+    lsh_matches, lsh_s = _replay(lsh, keyed)
+
+    expected = sum(1 for m in exact_matches if m is not None)
+    same = sum(1 for e, l in zip(exact_matches, lsh_matches) if e is not None and e == l)
+    missed = sum(1 for e, l in zip(exact_matches, lsh_matches) if e is not None and l is None)
+    queries = max(len(keyed), 1)
+    print(f"\nindex ({len(keyed)} distinct keys, lsh {args.bands} bands x {args.rows} rows)")
+    print(f"  exact: {exact_s * 1e6 / queries:9.1f} us/query, {expected} matches")
+    print(f"  lsh:   {lsh_s * 1e6 / queries:9.1f} us/query, "
+          f"{lsh.stats['candidates'] / queries:.1f} candidates/query")
+    print(f"  recall {same / expected if expected else 1.0:.4f} ({missed} missed), "
+          f"speedup {exact_s / lsh_s if lsh_s else float('inf'):.1f}x")
+
+    synth = Synthesizer()
+    results = {}
+    print("\ndedupe (Synthesizer._dedupe_steps)")
+    for mode in ('exact', 'lsh'):
+        fp.clear_caches()
+        start = time.perf_counter()
+        out = synth._dedupe_steps(steps, mode=mode)
+        elapsed = time.perf_counter() - start
+        results[mode] = out
+        print(f"  {mode:<6}{elapsed * 1000:10.1f} ms  {len(out)} steps kept")
+    kept_exact, kept_lsh = set(results['exact']), set(results['lsh'])
+    dropped_exact = set(steps) - kept_exact
+    dropped_both = dropped_exact - kept_lsh
+    print(f"  identical output: {results['exact'] == results['lsh']}; "
+          f"lsh also dropped {len(dropped_both)}/{len(dropped_exact)} of the steps exact dropped")
+
+
+if __name__ == '__main__':
+    main()
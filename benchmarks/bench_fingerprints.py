@@ -0,0 +1,59 @@
+"""
+Benchmark for memoized step fingerprints (Module/step_fingerprints.py).
+
+For each golden case, reports how many fingerprints one fallback synthesis
+asks for versus how many distinct strings actually get tokenized, and the
+time per synthesis when the cache is cleared before every run (cold: the
+per-request saving only) and when it is kept (warm: repeat requests for the
+same dish).
+
+    python -m benchmarks.bench_fingerprints [--repeat N]
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+from Module import step_fingerprints as fp
+from Module.model_pool import get_model_pool
+from Module.synthesizer import Synthesizer
+from benchmarks.bench_step_patterns import RULES_ONLY_MODEL, _NoModel
+from benchmarks.golden_recipes import GOLDEN_CASES
+
+
+def _ms_per_run(synth, sources, servings, repeat, cold):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if cold:
+            fp.clear_caches()
+        synth.synthesize(sources, servings, llm_model=RULES_ONLY_MODEL)
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200, help='synthesis runs per case and mode')
+    args = parser.parse_args()
+
+    synth = Synthesizer()
+    get_model_pool().register(RULES_ONLY_MODEL, _NoModel())
+
+    rows = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, sources, servings in GOLDEN_CASES:
+            fp.clear_caches()
+            synth.synthesize(sources, servings, llm_model=RULES_ONLY_MODEL)
+            info = fp.cache_info()
+            requested = info['fingerprint_hits'] + info['fingerprint_misses']
+            cold = _ms_per_run(synth, sources, servings, args.repeat, cold=True)
+            warm = _ms_per_run(synth, sources, servings, args.repeat, cold=False)
+            rows.append((name, requested, info['fingerprint_misses'], cold, warm))
+
+    print(f"{'case':<14}{'requested':>11}{'tokenized':>11}{'cold ms':>10}{'warm ms':>10}")
+    for name, requested, computed, cold, warm in rows:
+        print(f"{name:<14}{requested:>11}{computed:>11}{cold:>10.3f}{warm:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Cold-start import time of the API and the maintenance scripts.
+
+Each target's imports run in a fresh interpreter under `python -X importtime`.
+The report gives, per target, the median import time and wall time over
+--repeat runs, the packages that take the most import time, and which heavy optional
+dependencies (torch, transformers, numpy, openai, ...) got loaded, none of
+which the maintenance scripts should need.
+
+    python -m benchmarks.bench_import_time [--repeat N] [--top N] [--json] [--budget-ms MS]
+
+With --budget-ms, exits non-zero if a target's median import time exceeds
+the budget or a maintenance target loads a heavy dependency.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (statement, maintenance script?)
+TARGETS = {
+    'api:app': ("import api", False),
+    'Module': ("import Module", True),
+    'alembic env': ("from Module.database import Base", True),
+    'populate_recipe_scores': ("import populate_recipe_scores", True),
+    'list_all_recipes': ("import list_all_recipes", True),
+    # update_step_minutes runs its updates at import time, so only its imports are measured
+    'update_step_minutes': ("from sqlalchemy import create_engine, text; from dotenv import load_dotenv", True),
+}
+
+HEAVY_MODULES = ('torch', 'transformers', 'numpy', 'openai', 'optimum', 'onnxruntime')
+
+# Printed after the target statement: heavy packages that actually ended up loaded
+_REPORT_HEAVY = (
+    "; import sys as _s; print(','.join(m for m in %r if m in _s.modules))" % (HEAVY_MODULES,)
+)
+
+
+def parse_importtime(stderr: str, skip=frozenset()):
+    """(total µs, {package: self µs summed over its modules}) for the imports not under skip.
+
+    skip holds top-level import names (e.g. interpreter startup); they and
+    everything they import are left out.
+    """
+    total, packages, pending = 0, {}, []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, _, rest = line.partition(':')
+        try:
+            self_us, cumulative, name = rest.split('|')
+            self_us, cumulative_us = int(self_us), int(cumulative)
+        except ValueError:
+            continue
+        pending.append((name.strip().split('.')[0], self_us))
+        # importtime prints children before their parent, so a top-level line closes a group
+        if name.startswith('  '):
+            continue
+        if name.strip() not in skip:
+            total += cumulative_us
+            for package, us in pending:
+                packages[package] = packages.get(package, 0) + us
+        pending = []
+    return total, packages
+
+
+def _run(statement: str):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    return proc, (time.perf_counter() - start) * 1000.0
+
+
+def interpreter_startup_modules():
+    """Top-level imports every interpreter does before running anything (site, encodings, ...)."""
+    proc, _ = _run("pass")
+    return frozenset(
+        line.split('|')[-1].strip()
+        for line in proc.stderr.splitlines()
+        if line.startswith('import time:') and 'cumulative' not in line and not line.split('|')[-1].startswith('  ')
+    )
+
+
+def measure(statement: str, skip=frozenset()):
+    proc, wall_ms = _run(statement + _REPORT_HEAVY)
+    total_us, top = parse_importtime(proc.stderr, skip)
+    lines = proc.stdout.strip().splitlines()
+    heavy = [m for m in lines[-1].split(',') if m] if lines else []
+    error = None
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ['failed'])[-1]
+    return wall_ms, total_us / 1000.0, top, heavy, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per target')
+    parser.add_argument('--top', type=int, default=5, help='heaviest top-level imports to list')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--budget-ms', type=float, default=0.0, help='fail above this median import time')
+    args = parser.parse_args()
+
+    startup = interpreter_startup_modules()
+    report = {}
+    for name, (statement, maintenance) in TARGETS.items():
+        runs = [measure(statement, startup) for _ in range(args.repeat)]
+        _, _, top, heavy, error = runs[-1]
+        report[name] = {
+            "statement": statement,
+            "import_ms": round(statistics.median(r[1] for r in runs), 1),
+            "wall_ms": round(statistics.median(r[0] for r in runs), 1),
+            "heaviest": [
+                {"module": mod, "ms": round(us / 1000.0, 1)}
+                for mod, us in sorted(top.items(), key=lambda kv: -kv[1])[:args.top]
+            ],
+            "heavy_modules": heavy,
+            "maintenance": maintenance,
+            "error": error,
+        }
+
+    failed = []
+    if args.budget_ms:
+        for name, row in report.items():
+            if row["import_ms"] > args.budget_ms:
+                failed.append(f"{name}: {row['import_ms']} ms > {args.budget_ms:g} ms")
+            if row["maintenance"] and row["heavy_modules"]:
+                failed.append(f"{name}: loads {', '.join(row['heavy_modules'])}")
+
+    if args.json:
+        print(json.dumps({"targets": report, "failed": failed}, indent=1))
+    else:
+        print(f"{'target':<24}{'import ms':>10}{'wall ms':>9}  heavy deps | heaviest packages (ms)")
+        for name, row in report.items():
+            heaviest = ", ".join(f"{h['module']} {h['ms']:.0f}" for h in row["heaviest"])
+            heavy = ", ".join(row["heavy_modules"]) or "-"
+            print(f"{name:<24}{row['import_ms']:>10.1f}{row['wall_ms']:>9.1f}  {heavy} | {heaviest}")
+            if row["error"]:
+                print(f"{'':<24}  import failed: {row['error']}")
+        for line in failed:
+            print(f"over budget: {line}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
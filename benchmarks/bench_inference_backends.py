@@ -0,0 +1,111 @@
+"""
+Parity and latency of the inference backends (Module/inference_backends.py).
+
+Loads the model once per backend, synthesizes the golden recipes (idli, rava
+idli, besan chilla) with each, and compares the steps against fp32: exact
+match, and the mean token Jaccard similarity of the step lists. Also reports
+load time, resident memory added by the load and milliseconds per synthesis.
+Exits non-zero when a backend's similarity to fp32 falls below
+--min-similarity, so it can gate a build after the export step.
+
+    python -m benchmarks.bench_inference_backends [--backend fp32 int8 onnx] [--repeat N]
+
+Needs transformers and torch (and optimum[onnxruntime] for onnx).
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+from Module.inference_backends import BACKENDS, FP32
+from Module.model_pool import DEFAULT_MODEL_NAME, get_model_pool
+from Module.near_duplicates import jaccard
+from Module.step_fingerprints import token_set
+from Module.synthesizer import Synthesizer
+from benchmarks.golden_recipes import GOLDEN_CASES
+
+
+def _rss_mb() -> float:
+    """Resident set size of this process (Linux; 0 elsewhere)."""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def _similarity(steps, reference) -> float:
+    """Mean best-match token Jaccard of each reference step against steps."""
+    if not reference:
+        return 1.0 if not steps else 0.0
+    got = [token_set(s) for s in steps]
+    total = 0.0
+    for ref in reference:
+        ref_tokens = token_set(ref)
+        total += max((jaccard(ref_tokens, g) for g in got), default=0.0)
+    return total / len(reference)
+
+
+def _run_backend(synth, model_name, backend, repeat):
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    llm = Synthesizer.FreeOpenLLM(model_name=model_name, backend=backend)
+    load_s = time.perf_counter() - start
+    if not llm.available():
+        raise RuntimeError(f"{backend}: model not available ({llm._init_error!r})")
+    pool_name = f"{model_name}#{backend}"
+    get_model_pool().register(pool_name, llm)
+
+    outputs, ms = {}, {}
+    for name, sources, servings in GOLDEN_CASES:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            recipe = synth.synthesize(sources, servings, llm_model=pool_name)
+        ms[name] = (time.perf_counter() - start) / repeat * 1000.0
+        outputs[name] = recipe.steps
+    rss_mb = _rss_mb() - rss_before
+    get_model_pool().evict(pool_name)
+    return outputs, ms, load_s, rss_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=DEFAULT_MODEL_NAME)
+    parser.add_argument('--backend', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--repeat', type=int, default=3, help='syntheses per case and backend')
+    parser.add_argument('--min-similarity', type=float, default=0.8,
+                        help='fail when a backend is less similar to fp32 than this')
+    args = parser.parse_args()
+
+    backends = [FP32] + [b for b in args.backend if b != FP32]
+    synth = Synthesizer()
+    results = {}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for backend in backends:
+            results[backend] = _run_backend(synth, args.model, backend, args.repeat)
+
+    reference = results[FP32][0]
+    failed = False
+    print(f"{'backend':<8}{'load s':>8}{'+RSS MB':>9}  {'':10}" + "".join(f"{name:>14}" for name, _, _ in GOLDEN_CASES))
+    for backend in backends:
+        outputs, ms, load_s, rss_mb = results[backend]
+        print(f"{backend:<8}{load_s:>8.1f}{rss_mb:>9.0f}  ms/synth  "
+              + "".join(f"{ms[name]:>14.1f}" for name, _, _ in GOLDEN_CASES))
+        if backend == FP32:
+            continue
+        cells = []
+        for name, _, _ in GOLDEN_CASES:
+            sim = _similarity(outputs[name], reference[name])
+            exact = outputs[name] == reference[name]
+            failed |= sim < args.min_similarity
+            cells.append(f"{'=' if exact else '~'}{sim:.3f}")
+        print(f"{'':<8}{'':>8}{'':>9}  vs fp32   " + "".join(f"{c:>14}" for c in cells))
+    if failed:
+        print(f"parity FAILED: similarity below {args.min_similarity}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
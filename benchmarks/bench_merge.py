@@ -0,0 +1,91 @@
+"""
+Benchmark for the unit-aware weighted ingredient merge (Module/ingredient_merge.py).
+
+Merges N synthetic source recipes (mixed g/kg, ml/l/cup, pc units) for an
+event-sized serving count and reports microseconds per merge for the
+previous plain-mean implementation and for both aggregation backends, plus a
+check that the backends agree.
+
+    python -m benchmarks.bench_merge [--sources N] [--ingredients M] [--servings S] [--repeat R]
+"""
+
+import argparse
+import random
+import time
+
+from Module import ingredient_merge as im
+from Module.models import Ingredient, Recipe
+from Module.synthesizer import Synthesizer
+
+_UNITS = [('g', 1.0), ('kg', 0.001), ('ml', 1.0), ('l', 0.001), ('cup', 1 / 240.0), ('pc', 1.0)]
+
+
+def make_sources(n: int, m: int, seed: int = 3):
+    rng = random.Random(seed)
+    base = [(f"ingredient {i}", rng.choice(_UNITS[::2]), rng.uniform(5, 400)) for i in range(m)]
+    recipes = []
+    for k in range(n):
+        ings = []
+        for name, (unit, _), qty in base:
+            if unit == 'g' and rng.random() < 0.3:
+                unit, scale = 'kg', 0.001
+            elif unit == 'ml' and rng.random() < 0.3:
+                unit, scale = rng.choice([('l', 0.001), ('cup', 1 / 240.0)])
+            else:
+                scale = 1.0
+            ings.append(Ingredient(name, round(qty * rng.uniform(0.8, 1.2) * scale, 4), unit))
+        recipes.append(Recipe(id=f"src{k}", title="Bench", ingredients=ings, steps=[], servings=rng.randint(2, 8)))
+    weights = [rng.uniform(2.0, 5.0) for _ in range(n)]
+    return recipes, weights
+
+
+def legacy_merge(recipes, requested_servings):
+    grouped = {}
+    for r in recipes:
+        for ing in r.ingredients:
+            key = Synthesizer.canonical_name(ing.name).strip().lower()
+            data = grouped.setdefault(key, {"per_serving": [], "units": []})
+            data["per_serving"].append(ing.quantity / r.servings)
+            data["units"].append(ing.unit)
+    return [
+        (key, round(sum(d["per_serving"]) / len(d["per_serving"]) * requested_servings, 3),
+         max(set(d["units"]), key=d["units"].count))
+        for key, d in grouped.items()
+    ]
+
+
+def _us(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sources', type=int, default=48)
+    parser.add_argument('--ingredients', type=int, default=25)
+    parser.add_argument('--servings', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    recipes, weights = make_sources(args.sources, args.ingredients)
+    rows = args.sources * args.ingredients
+    name = Synthesizer.canonical_name
+    print(f"{args.sources} sources x {args.ingredients} ingredients ({rows} rows), {args.servings} servings")
+
+    results = {}
+    print(f"  {'legacy (plain mean)':<22}{_us(lambda: legacy_merge(recipes, args.servings), args.repeat):10.1f} us")
+    for backend in ('python', 'numpy'):
+        if backend == 'numpy' and im.numpy_module() is None:
+            print(f"  {'numpy':<22}{'n/a (numpy not installed)':>10}")
+            continue
+        results[backend] = im.merge_quantities(recipes, args.servings, name, weights, backend=backend)
+        us = _us(lambda: im.merge_quantities(recipes, args.servings, name, weights, backend=backend), args.repeat)
+        print(f"  {backend:<22}{us:10.1f} us")
+    if len(results) == 2:
+        print(f"  backends agree: {results['python'] == results['numpy']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Micro-benchmark for the precompiled pattern layer (Module/synth_patterns.py).
+
+Compares the per-step cost of the old inline-regex implementations of
+canonicalize_step_text, classify_phase and the _normalize_for_dedupe rewrite
+chain against the current ones, then reports the per-step cost of the whole
+rule-based (fallback) synthesis path on the golden recipes.
+
+    python -m benchmarks.bench_step_patterns [--repeat N]
+"""
+
+import argparse
+import contextlib
+import os
+import re
+import time
+
+from Module.model_pool import get_model_pool
+from Module.synthesizer import Synthesizer
+from benchmarks.golden_recipes import GOLDEN_CASES
+
+RULES_ONLY_MODEL = 'bench/rules-only'
+
+
+class _NoModel:
+    """Adapter that is never available, so synthesize() takes the fallback path."""
+
+    def available(self):
+        return False
+
+
+# --- implementations as they were before the pattern registry -----------------
+
+def legacy_canonicalize(text):
+    out = text
+    for alias, canon in Synthesizer.CANONICAL_NAMES.items():
+        pattern = r'\b' + re.escape(alias) + r'\b'
+        out = re.sub(pattern, canon.title(), out, flags=re.I)
+    return out
+
+
+def legacy_classify_phase(step):
+    low = step.lower()
+    if re.search(r'\bstir[- ]?fry\b', low):
+        return 'cook'
+    for phase in ['cook', 'rest', 'finish', 'prep', 'mix']:
+        for kw in Synthesizer.PHASE_KEYWORDS.get(phase, []):
+            if kw in low:
+                return phase
+    if re.search(r'\b(min|minute|minutes|hr|hour|°c|°f|degrees|°)\b', low):
+        return 'cook'
+    return 'mix'
+
+
+def legacy_dedupe_rewrites(s):
+    s = re.sub(r'\b(\w+)(?: \1\b)+', r'\1', s, flags=re.I).lower()
+    s = re.sub(r'\bsoaked\b', 'soak', s)
+    s = re.sub(r'\b(beaten|beaten eggs|egg mixture)\b', 'beaten_eggs', s)
+    s = re.sub(r'\b(grind(?:ing)?|ground)\b', 'grind', s)
+    s = re.sub(r'\b\d+\s*(?:[-–]\s*\d+)?\s*(?:hours?|hrs?|minutes?|mins?)\b', ' time ', s, flags=re.I)
+    s = re.sub(r'\b\d+\s*(?:°\s?[cf]|°c|°f)\b', ' temp ', s, flags=re.I)
+    s = re.sub(r'[^a-z\s]', ' ', s)
+    return re.sub(r'\s+', ' ', s).strip()
+
+
+def current_dedupe_rewrites(s):
+    from Module import synth_patterns as rx
+    s = rx.REPEATED_WORDS.sub(r'\1', s).lower()
+    s = rx.SOAKED.sub('soak', s)
+    s = rx.BEATEN_EGG_VARIANTS.sub('beaten_eggs', s)
+    s = rx.GRIND_VARIANTS.sub('grind', s)
+    s = rx.DURATION_I.sub(' time ', s)
+    s = rx.TEMPERATURE_I.sub(' temp ', s)
+    s = rx.NON_ALPHA.sub(' ', s)
+    return rx.WHITESPACE.sub(' ', s).strip()
+
+
+def _per_step_us(fn, steps, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for s in steps:
+            fn(s)
+    return (time.perf_counter() - start) / (repeat * len(steps)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=2000, help='iterations for the micro benchmarks')
+    parser.add_argument('--pipeline-repeat', type=int, default=50, help='iterations of the fallback pipeline')
+    args = parser.parse_args()
+
+    steps = [s for _, sources, _ in GOLDEN_CASES for r in sources for s in r.steps]
+    synth = Synthesizer()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        rows = [
+            ('canonicalize_step_text', lambda s: legacy_canonicalize(s), synth.canonicalize_step_text),
+            ('classify_phase', legacy_classify_phase, Synthesizer.classify_phase),
+            ('dedupe rewrite chain', legacy_dedupe_rewrites, current_dedupe_rewrites),
+        ]
+        results = [(name, _per_step_us(old, steps, args.repeat), _per_step_us(new, steps, args.repeat))
+                   for name, old, new in rows]
+
+        get_model_pool().register(RULES_ONLY_MODEL, _NoModel())
+        n_steps = 0
+        start = time.perf_counter()
+        for _ in range(args.pipeline_repeat):
+            for _, sources, servings in GOLDEN_CASES:
+                synth.synthesize(sources, servings, llm_model=RULES_ONLY_MODEL)
+                n_steps += sum(len(r.steps) for r in sources)
+        pipeline_us = (time.perf_counter() - start) / n_steps * 1e6
+
+    print(f"{'function':<26}{'before us/step':>16}{'after us/step':>16}{'speedup':>10}")
+    for name, before, after in results:
+        print(f"{name:<26}{before:>16.2f}{after:>16.2f}{before / after:>9.1f}x")
+    print(f"\nfallback pipeline: {pipeline_us:.1f} us per source step "
+          f"({len(GOLDEN_CASES)} golden cases x {args.pipeline_repeat})")
+
+
+if __name__ == '__main__':
+    main()
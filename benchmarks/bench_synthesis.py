@@ -0,0 +1,183 @@
+"""
+Synthesis benchmark suite.
+
+Drives Synthesizer.synthesize directly (no server, no database) over the
+golden corpus (idli, rava idli, besan chilla) and synthetic dishes of N
+sources x M steps, on the fallback path (no model) and on the LLM path with a
+deterministic stub model (benchmarks/stub_llm.py). For every case and path it
+reports p50/p95 latency, the mean time of each pipeline stage and the peak
+memory traced during one synthesis, and can write it all as JSON and compare
+against an earlier run:
+
+    python -m benchmarks.bench_synthesis [--repeat N] [--synthetic 4x20 8x50] [--paths fallback llm]
+                                         [--stub-delay-ms MS] [--remote ADDRESS]
+                                         [--json out.json] [--compare base.json]
+
+--remote runs the LLM path against an inference server at ADDRESS (e.g. one
+started with `python -m benchmarks.stub_llm --serve ...`) instead of an
+in-process stub, to measure the cost of the round trip.
+
+Caches (step fingerprints, matchers) stay warm across the repeats, as they
+would in a long-running API process; the first run of each case is a warm-up
+and is not counted.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from Module.model_pool import get_model_pool
+from Module.synthesizer import Synthesizer
+from benchmarks.bench_step_patterns import RULES_ONLY_MODEL, _NoModel
+from benchmarks.golden_recipes import GOLDEN_CASES
+from benchmarks.stub_llm import STUB_MODEL, StubLLM
+from benchmarks.synthetic_steps import generate_recipes
+
+PATH_MODELS = {'fallback': RULES_ONLY_MODEL, 'llm': STUB_MODEL}
+
+
+def percentile(sorted_values, q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), int(round(q / 100.0 * len(sorted_values) + 0.5))))
+    return sorted_values[rank - 1]
+
+
+def build_cases(synthetic_specs, seed):
+    cases = [(name, sources, servings) for name, sources, servings in GOLDEN_CASES]
+    for spec in synthetic_specs:
+        num_sources, num_steps = (int(x) for x in spec.lower().split('x'))
+        cases.append((f"synthetic_{num_sources}x{num_steps}",
+                      generate_recipes(num_sources, num_steps, seed=seed), 4))
+    return cases
+
+
+def _peak_kb(synth, sources, servings, model) -> float:
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    synth.synthesize(sources, servings, llm_model=model)
+    _, peak = tracemalloc.get_traced_memory()
+    if started:
+        tracemalloc.stop()
+    return round(max(0, peak - base) / 1024.0, 1)
+
+
+def run_case(synth, name, sources, servings, path, repeat):
+    model = PATH_MODELS[path]
+    recipe = synth.synthesize(sources, servings, llm_model=model)  # warm-up
+    latencies, stage_totals = [], {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        recipe = synth.synthesize(sources, servings, llm_model=model)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        for stage, ms in recipe.metadata.get('stage_timings_ms', {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+    latencies.sort()
+    return {
+        "case": name,
+        "path": path,
+        "method": recipe.metadata.get('synthesis_method'),
+        "sources": len(sources),
+        "source_steps": sum(len(r.steps) for r in sources),
+        "output_steps": len(recipe.steps),
+        "repeat": repeat,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "stages_ms": {stage: round(total / repeat, 3) for stage, total in stage_totals.items()},
+        "peak_kb": _peak_kb(synth, sources, servings, model),
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding='utf-8') as fh:
+        baseline = {(r["case"], r["path"]): r for r in json.load(fh)["results"]}
+    print(f"\nvs {baseline_path} (ratio new/old; < 1 is faster / smaller)")
+    print(f"{'case':<22}{'path':<10}{'p50':>8}{'p95':>8}{'peak':>8}")
+    for r in results:
+        old = baseline.get((r["case"], r["path"]))
+        if old is None:
+            print(f"{r['case']:<22}{r['path']:<10}{'new':>8}")
+            continue
+        ratios = [r[k] / old[k] if old[k] else float('nan') for k in ("p50_ms", "p95_ms", "peak_kb")]
+        print(f"{r['case']:<22}{r['path']:<10}" + "".join(f"{x:>8.2f}" for x in ratios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=30, help='timed syntheses per case and path')
+    parser.add_argument('--synthetic', nargs='*', default=['4x20', '8x50'],
+                        help='synthetic dishes as SOURCESxSTEPS')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--paths', nargs='+', default=list(PATH_MODELS), choices=list(PATH_MODELS))
+    parser.add_argument('--stub-delay-ms', type=float, default=0.0,
+                        help='simulated generation time of the stub model')
+    parser.add_argument('--remote', help='inference server address for the LLM path (see Module/inference_server.py)')
+    parser.add_argument('--json', dest='json_out', help='write the results to this file')
+    parser.add_argument('--compare', help='JSON of an earlier run to compare against')
+    args = parser.parse_args()
+
+    pool = get_model_pool()
+    pool.register(RULES_ONLY_MODEL, _NoModel())
+    if args.remote:
+        from Module.inference_server import RemoteLLM
+        pool.register(STUB_MODEL, RemoteLLM(STUB_MODEL, args.remote))
+    else:
+        pool.register(STUB_MODEL, StubLLM(delay_ms=args.stub_delay_ms))
+    synth = Synthesizer()
+    cases = build_cases(args.synthetic, args.seed)
+
+    results = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for name, sources, servings in cases:
+            for path in args.paths:
+                results.append(run_case(synth, name, sources, servings, path, args.repeat))
+
+    print(f"{'case':<22}{'path':<10}{'steps':>11}{'p50 ms':>9}{'p95 ms':>9}{'peak KB':>9}  slowest stages (ms)")
+    for r in results:
+        slowest = sorted(r["stages_ms"].items(), key=lambda kv: -kv[1])[:3]
+        print(f"{r['case']:<22}{r['path']:<10}{r['source_steps']:>5} -> {r['output_steps']:<3}"
+              f"{r['p50_ms']:>9.3f}{r['p95_ms']:>9.3f}{r['peak_kb']:>9.1f}  "
+              + ", ".join(f"{stage} {ms:.2f}" for stage, ms in slowest))
+
+    if args.json_out:
+        report = {
+            "meta": {
+                "created_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                "git_commit": _git_commit(),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "args": vars(args),
+            },
+            "results": results,
+        }
+        with open(args.json_out, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=1)
+        print(f"\nwrote {args.json_out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
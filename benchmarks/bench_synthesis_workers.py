@@ -0,0 +1,98 @@
+"""
+Benchmark for the synthesis process pool (Module/synthesis_workers.py).
+
+Runs C concurrent synthesis loops on threads, the way the API's threadpool
+would, either in-process or through the worker pool, and meanwhile measures
+the latency of a cheap request handler on another thread (a stand-in for
+/recipes or /protected). With in-process synthesis the cheap handler queues
+behind the GIL; with workers the synthesizing threads only wait on futures.
+
+    python -m benchmarks.bench_synthesis_workers [--concurrency C] [--workers W] [--seconds S]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import threading
+import time
+
+from Module.model_pool import get_model_pool
+from Module.synthesis_workers import SynthesisWorkerPool
+from Module.synthesizer import Synthesizer
+from benchmarks.bench_step_patterns import RULES_ONLY_MODEL, _NoModel
+from benchmarks.golden_recipes import GOLDEN_CASES
+
+_PAYLOAD = {"status": True, "message": "Recipes fetched successfully.", "data": [{"id": i} for i in range(50)]}
+
+
+def _cheap_request() -> float:
+    start = time.perf_counter()
+    json.dumps(_PAYLOAD)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def _run(label, synthesize, concurrency, seconds):
+    stop = threading.Event()
+    done = [0]
+
+    def loop():
+        i = 0
+        while not stop.is_set():
+            _, sources, servings = GOLDEN_CASES[i % len(GOLDEN_CASES)]
+            if synthesize is None:
+                time.sleep(0.01)
+            else:
+                synthesize(sources, servings)
+            done[0] += 1
+            i += 1
+
+    threads = [threading.Thread(target=loop, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        # what a request waiting for its turn on the GIL sees: wake-up delay plus work
+        start = time.perf_counter()
+        time.sleep(0.001)
+        _cheap_request()
+        latencies.append((time.perf_counter() - start) * 1000.0 - 1.0)
+    stop.set()
+    for t in threads:
+        t.join()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    rate = f"{done[0] / seconds:9.1f}" if synthesize is not None else f"{'-':>9}"
+    print(f"  {label:<12}{rate} synth/s   cheap request p50 {statistics.median(latencies):7.3f} ms"
+          f"  p99 {p99:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent synthesis requests')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"{args.concurrency} concurrent syntheses, {args.workers} workers, rules-only path")
+    synth = Synthesizer()
+    get_model_pool().register(RULES_ONLY_MODEL, _NoModel())
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        pool = SynthesisWorkerPool(workers=args.workers, preload=[])
+        pool.start()
+    try:
+        _run('idle', None, args.concurrency, args.seconds)
+        _run('in-process', lambda s, n: synth.synthesize(s, n, llm_model=RULES_ONLY_MODEL),
+             args.concurrency, args.seconds)
+        # workers have no rules-only adapter registered; an unknown model fails to load and
+        # the synthesizer takes the same fallback path
+        _run('workers', lambda s, n: pool.synthesize(s, n, llm_model='bench/no-such-model'),
+             args.concurrency, args.seconds)
+    finally:
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Golden source recipes used by the benchmarks and parity checks.
+
+These mirror typical trainer submissions (same dish, slightly different
+quantities and wording) so merge, dedupe and reordering all have work to do.
+"""
+
+from Module.models import Ingredient, Recipe
+
+
+def _recipe(recipe_id, title, ingredients, steps, servings):
+    return Recipe(
+        id=recipe_id,
+        title=title,
+        ingredients=[Ingredient(name=n, quantity=q, unit=u) for n, q, u in ingredients],
+        steps=steps,
+        servings=servings,
+    )
+
+
+IDLI = [
+    _recipe('golden-idli-1', 'Idli',
+            [('Rice', 300, 'g'), ('Urad Dal', 100, 'g'), ('Water', 350, 'ml'), ('Salt', 5, 'g')],
+            ['Soak rice and urad dal separately for 4 hours.',
+             'Grind both into a smooth batter.',
+             'Let the batter ferment overnight.',
+             'Add salt and steam for 12 minutes.'],
+            4),
+    _recipe('golden-idli-2', 'Idli',
+            [('Rice', 250, 'g'), ('Urad Dal', 120, 'g'), ('Water', 300, 'ml'), ('Salt', 6, 'g'), ('Fenugreek', 2, 'g')],
+            ['Rinse rice and urad dal, then soak for 3 hours.',
+             'Grind rice and dal separately into fine batter.',
+             'Mix both batters with salt and fenugreek.',
+             'Ferment for 6-8 hours.',
+             'Pour into idli molds and steam for 10 minutes.'],
+            5),
+]
+
+RAVA_IDLI = [
+    _recipe('golden-rava-1', 'Rava Idli',
+            [('Semolina', 200, 'g'), ('Yogurt', 150, 'g'), ('Water', 120, 'ml'), ('Eno', 3, 'g')],
+            ['Mix semolina and yogurt to make a batter.',
+             'Add water gradually.',
+             'Add Eno and steam the batter.'],
+            3),
+    _recipe('golden-rava-2', 'Rava Idli',
+            [('Semolina', 180, 'g'), ('Curd', 160, 'g'), ('Water', 100, 'ml'), ('Eno', 4, 'g'), ('Salt', 3, 'g')],
+            ['Whisk semolina with curd and salt.',
+             'Rest the batter for 15 minutes.',
+             'Add Eno and steam for 12 minutes.'],
+            3),
+]
+
+BESAN_CHILLA = [
+    _recipe('golden-chilla-1', 'Besan Chilla',
+            [('Gram flour', 200, 'g'), ('Water', 180, 'ml'), ('Onion', 1, 'pc'), ('Green chilli', 1, 'pc'), ('Salt', 4, 'g')],
+            ['Chop onion and green chilli.',
+             'Mix gram flour with water to make a pourable batter.',
+             'Season with salt and mix well.',
+             'Fry ladlefuls of batter until golden on both sides.'],
+            4),
+    _recipe('golden-chilla-2', 'Besan Chilla',
+            [('Besan', 150, 'g'), ('Water', 150, 'ml'), ('Tomato', 1, 'pc'), ('Salt', 3, 'g'), ('Oil', 10, 'ml')],
+            ['Chop tomato finely.',
+             'Whisk besan with water and salt into a smooth batter.',
+             'Heat oil on a tawa and cook each chilla for 2 minutes per side.'],
+            3),
+]
+
+# (name, sources, requested servings)
+GOLDEN_CASES = [
+    ('idli', IDLI, 4),
+    ('rava_idli', RAVA_IDLI, 3),
+    ('besan_chilla', BESAN_CHILLA, 5),
+]
@@ -0,0 +1,76 @@
+"""
+Deterministic stand-in for the flan-t5 adapter, so the LLM path of the
+synthesizer can be benchmarked (and exercised) without transformers.
+
+It answers like the real model does on a good day: it reads the "Source
+actions" list out of the synthesizer's prompt and returns up to max_steps of
+them as numbered lines, plus a serving step, after an optional fixed delay
+that stands in for generation time.
+
+It can also be served as the inference server (Module/inference_server.py),
+answering for every model name, to run the API against a sidecar locally:
+
+    python -m benchmarks.stub_llm --serve unix:/tmp/km-infer.sock [--delay-ms 200]
+    KITCHENMIND_INFERENCE_SERVER=unix:/tmp/km-infer.sock ./run_api.sh
+"""
+
+import argparse
+import re
+import time
+
+STUB_MODEL = 'bench/stub-llm'
+
+_SOURCE_ACTIONS = re.compile(r"Source actions:\n(.*?)\n\n", re.S)
+
+
+class StubLLM:
+    """FreeOpenLLM look-alike: available(), generate(prompt, **gen_kwargs) -> str and generate_batch."""
+
+    def __init__(self, delay_ms: float = 0.0, max_steps: int = 8):
+        self.model_name = STUB_MODEL
+        self.delay_ms = delay_ms
+        self.max_steps = max_steps
+        self.calls = 0
+        self.batch_calls = 0
+
+    def available(self) -> bool:
+        return True
+
+    def generate(self, prompt: str, **gen_kwargs) -> str:
+        self.calls += 1
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000.0)
+        return self._answer(prompt)
+
+    def generate_batch(self, prompts, **gen_kwargs):
+        """One delay for the whole batch, like one padded forward pass."""
+        self.batch_calls += 1
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000.0)
+        return [self._answer(prompt) for prompt in prompts]
+
+    def _answer(self, prompt: str) -> str:
+        match = _SOURCE_ACTIONS.search(prompt)
+        actions = [line[2:] for line in (match.group(1).split("\n") if match else []) if line.startswith("- ")]
+        lines = actions[:self.max_steps - 1] + ["Serve hot."]
+        return "\n".join(f"{i}. {line}" for i, line in enumerate(lines, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the stub model as the inference server.")
+    parser.add_argument('--serve', required=True, help='unix:/path/to.sock or tcp:host:port')
+    parser.add_argument('--delay-ms', type=float, default=0.0, help='simulated generation time')
+    args = parser.parse_args()
+    from Module.inference_server import InferenceServer
+    from Module.model_pool import ModelPool
+    server = InferenceServer(args.serve, pool=ModelPool(loader=lambda name: StubLLM(delay_ms=args.delay_ms)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
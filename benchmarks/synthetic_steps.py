@@ -0,0 +1,131 @@
+"""
+Synthetic recipe steps (and whole source recipes) for benchmarks that need more
+input than the golden corpus.
+
+Steps are built from a verb, two to four ingredients/tools and an optional
+duration, in the phrasing real sources use ("Soak rice and urad dal for 4
+hours."). A fraction of the steps are planted near-duplicates of an earlier
+step: same ingredients with another verb, one ingredient swapped or added, or
+a different duration. Output is deterministic for a given seed.
+"""
+
+import random
+from typing import List, Tuple
+
+from Module.models import Ingredient, Recipe
+
+VERBS = [
+    'Mix', 'Whisk', 'Stir', 'Combine', 'Add', 'Fold in', 'Blend', 'Grind', 'Soak',
+    'Steam', 'Bake', 'Fry', 'Cook', 'Heat', 'Simmer', 'Roast', 'Toss', 'Knead',
+]
+BASE_INGREDIENTS = [
+    'rice', 'urad dal', 'moong dal', 'chana dal', 'besan', 'rava', 'semolina', 'poha', 'flour',
+    'atta', 'maida', 'milk', 'curd', 'yogurt', 'ghee', 'butter', 'oil', 'water', 'salt', 'sugar',
+    'jaggery', 'eggs', 'onion', 'tomato', 'potato', 'carrot', 'peas', 'beans', 'spinach',
+    'cabbage', 'capsicum', 'cauliflower', 'paneer', 'tofu', 'chicken', 'mutton', 'fish',
+    'prawns', 'garlic', 'ginger', 'chili', 'cumin', 'mustard seeds', 'curry leaves',
+    'coriander', 'mint', 'turmeric', 'fenugreek', 'cardamom', 'cinnamon', 'cloves',
+    'pepper', 'hing', 'tamarind', 'coconut', 'cashews', 'raisins', 'almonds', 'lemon',
+    'vinegar', 'soy sauce', 'noodles', 'bread', 'cheese', 'cream', 'honey', 'vanilla',
+    'cocoa', 'baking powder', 'yeast', 'sesame', 'peanuts', 'oats', 'corn', 'mushrooms',
+]
+TOOLS = ['pan', 'tawa', 'kadai', 'bowl', 'steamer', 'oven', 'mixer', 'pressure cooker', 'tray', 'moulds']
+DURATIONS = ['', '', ' for 5 minutes', ' for 10 minutes', ' for 20 minutes', ' for 4 hours', ' overnight']
+
+
+def _vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Base ingredients plus made-up regional names, so large corpora stay diverse.
+
+    Extra names are single words: qualifiers shared across many names ("roasted
+    cumin", "roasted peanuts") would make unrelated steps look alike.
+    """
+    syllables = ['ka', 'ra', 'mu', 'li', 'pa', 'to', 'shi', 'na', 've', 'do', 'ga', 'chu', 'ban', 'mo']
+    vocab = set(BASE_INGREDIENTS)
+    while len(vocab) < size:
+        vocab.add(''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))))
+    return sorted(vocab)
+
+
+def _phrase(verb: str, items: List[str], tool: str, duration: str) -> str:
+    body = items[0] if len(items) == 1 else ', '.join(items[:-1]) + ' and ' + items[-1]
+    tail = f" in the {tool}" if tool else ''
+    return f"{verb} {body}{tail}{duration}."
+
+
+def generate_steps(n: int, seed: int = 7, duplicate_rate: float = 0.3,
+                   vocabulary_size: int = 2000) -> Tuple[List[str], int]:
+    """Return (steps, planted) where planted counts the near-duplicates inserted."""
+    rng = random.Random(seed)
+    vocab = _vocabulary(vocabulary_size, rng)
+    originals: List[Tuple[List[str], str]] = []
+    steps: List[str] = []
+    planted = 0
+    for _ in range(n):
+        if originals and rng.random() < duplicate_rate:
+            items, tool = rng.choice(originals)
+            items = list(items)
+            variant = rng.random()
+            if variant < 0.33 and len(items) > 2:
+                items[rng.randrange(len(items))] = rng.choice(vocab)
+            elif variant < 0.66:
+                items.append(rng.choice(vocab))
+            rng.shuffle(items)
+            planted += 1
+        else:
+            items = rng.sample(vocab, rng.randint(2, 4))
+            tool = rng.choice(TOOLS) if rng.random() < 0.4 else ''
+            originals.append((items, tool))
+        steps.append(_phrase(rng.choice(VERBS), items, tool, rng.choice(DURATIONS)))
+    return steps, planted
+
+
+_UNITS = [('g', 50, 400), ('ml', 50, 500), ('pc', 1, 4), ('tsp', 1, 3), ('tbsp', 1, 4), ('cup', 1, 3)]
+
+
+def generate_recipes(num_sources: int, num_steps: int, seed: int = 7, num_ingredients: int = 8,
+                     variation: float = 0.3) -> List[Recipe]:
+    """num_sources submissions of one made-up dish, each with about num_steps steps.
+
+    Every source starts from the same base method and ingredient list; a
+    `variation` fraction of its steps get another verb, tool or duration, or
+    mention a different ingredient, and quantities vary by up to +-25%, so
+    merge, dedupe and coverage see the kind of overlap real submissions have.
+    """
+    rng = random.Random(seed)
+    dish_ings = rng.sample(BASE_INGREDIENTS, min(num_ingredients, len(BASE_INGREDIENTS)))
+    amounts = {}
+    for name in dish_ings:
+        unit, low, high = rng.choice(_UNITS)
+        amounts[name] = (unit, rng.randint(low, high))
+    base_steps = [
+        (rng.choice(VERBS), rng.sample(dish_ings, rng.randint(1, 3)),
+         rng.choice(TOOLS) if rng.random() < 0.4 else '', rng.choice(DURATIONS))
+        for _ in range(num_steps)
+    ]
+
+    recipes = []
+    for s in range(num_sources):
+        steps = []
+        for verb, items, tool, duration in base_steps:
+            if rng.random() < variation:
+                roll = rng.random()
+                if roll < 0.4:
+                    verb = rng.choice(VERBS)
+                elif roll < 0.7:
+                    items = items[:-1] + [rng.choice(dish_ings)] if len(items) > 1 else [rng.choice(dish_ings)]
+                else:
+                    tool, duration = rng.choice(TOOLS), rng.choice(DURATIONS)
+            steps.append(_phrase(verb, list(dict.fromkeys(items)), tool, duration))
+        used = [name for name in dish_ings if rng.random() > variation / 3] or dish_ings[:1]
+        recipes.append(Recipe(
+            id=f"synthetic-{seed}-{s}",
+            title="Synthetic Dish",
+            ingredients=[
+                Ingredient(name=name.title(), quantity=round(amounts[name][1] * rng.uniform(0.75, 1.25), 1),
+                           unit=amounts[name][0])
+                for name in used
+            ],
+            steps=steps,
+            servings=rng.randint(2, 6),
+        ))
+    return recipes
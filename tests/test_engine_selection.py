@@ -0,0 +1,107 @@
+import contextlib
+import copy
+import io
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.golden_recipes import GOLDEN_CASES
+from benchmarks.stub_llm import STUB_MODEL, StubLLM
+from Module import model_pool
+from Module.controller import KitchenMind
+from Module.model_pool import ModelPool, UnavailableModel
+from Module.synthesis_cache import SynthesisCache, synthesis_cache_key
+from Module.synthesis_pipeline import ENGINE_AUTO, ENGINE_LLM, ENGINE_RULES, FALLBACK, LLM, engine_name
+from Module.synthesizer import Synthesizer
+
+MISSING = "missing/model"
+
+
+class Loader:
+    def __init__(self):
+        self.loads = []
+        self.stub = StubLLM()
+
+    def __call__(self, name):
+        self.loads.append(name)
+        return self.stub if name == STUB_MODEL else UnavailableModel(name, "no weights")
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    loader = Loader()
+    pool = ModelPool(loader=loader, retry_backoff_s=60)
+    monkeypatch.setattr(model_pool, "_pool", pool)
+    yield loader
+    pool.clear()
+
+
+def _sources():
+    _, sources, _ = copy.deepcopy(GOLDEN_CASES[0])
+    for i, r in enumerate(sources):
+        r.metadata["version_id"] = f"v{i}"
+    return sources
+
+
+def _kitchen(model_name, workers=False):
+    km = KitchenMind(recipe_repo=object(), db_session=object())
+    km.llm_model = model_name
+    km.synthesis_cache = SynthesisCache()
+    km.synthesis_workers = SimpleNamespace(enabled=workers)
+    return km
+
+
+def _plan(km, engine):
+    with contextlib.redirect_stdout(io.StringIO()):
+        top_n, kwargs, key = km._plan_synthesis("Idli", 4, _sources(), True, None, engine=engine)
+    return kwargs["engine"], key, synthesis_cache_key(top_n, 4, True, km.llm_model, kwargs["weights"])
+
+
+def test_engine_name():
+    assert engine_name(" RULES ") == ENGINE_RULES
+    assert engine_name(None) in (ENGINE_AUTO, ENGINE_RULES, ENGINE_LLM)
+    with pytest.raises(ValueError):
+        engine_name("gpt")
+
+
+def test_rules_never_touches_the_model_pool(loader):
+    engine, key, model_key = _plan(_kitchen(STUB_MODEL), ENGINE_RULES)
+    assert engine == ENGINE_RULES and key != model_key
+    assert Synthesizer.resolve_engine(ENGINE_RULES, STUB_MODEL) == (FALLBACK, None)
+    assert loader.loads == []
+
+
+@pytest.mark.parametrize("engine", [ENGINE_AUTO, ENGINE_LLM])
+def test_model_engines_with_the_model_loaded(loader, engine):
+    planned, key, model_key = _plan(_kitchen(STUB_MODEL), engine)
+    assert planned == engine and key == model_key
+    assert Synthesizer.resolve_engine(engine, STUB_MODEL) == (LLM, loader.stub)
+
+
+def test_auto_settles_to_rules_before_the_cache_key(loader):
+    km = _kitchen(MISSING)
+    engine, key, model_key = _plan(km, ENGINE_AUTO)
+    _, rules_key, _ = _plan(km, ENGINE_RULES)
+    assert engine == ENGINE_RULES
+    assert key == rules_key != model_key  # a rule-based result is never cached as the model's
+    assert loader.loads == [MISSING]  # the failed load is remembered, not retried per request
+
+
+def test_auto_left_to_the_worker_process(loader):
+    engine, _, _ = _plan(_kitchen(MISSING, workers=True), ENGINE_AUTO)
+    assert engine == ENGINE_AUTO
+    assert loader.loads == []
+
+
+def test_llm_fails_when_the_model_cannot_load(loader):
+    with pytest.raises(RuntimeError, match="not available"):
+        Synthesizer.resolve_engine(ENGINE_LLM, MISSING)
+    with contextlib.redirect_stdout(io.StringIO()), pytest.raises(RuntimeError, match="not available"):
+        Synthesizer().synthesize(_sources(), 4, llm_model=MISSING, engine=ENGINE_LLM)
+
+
+def test_auto_falls_back_when_the_model_cannot_load(loader):
+    with contextlib.redirect_stdout(io.StringIO()):
+        recipe = Synthesizer().synthesize(_sources(), 4, llm_model=MISSING, engine=ENGINE_AUTO)
+    assert recipe.metadata["synthesis_method"] == "fallback:no-llm"
+    assert loader.stub.calls == 0
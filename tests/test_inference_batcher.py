@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+from Module.inference_batcher import MicroBatcher
+
+
+def _upper(prompts, gen_kwargs):
+    return [p.upper() for p in prompts]
+
+
+def test_concurrent_prompts_share_a_batch():
+    batcher = MicroBatcher(_upper, window_ms=50)
+    results = {}
+    threads = [threading.Thread(target=lambda p=p: results.__setitem__(p, batcher.generate(p, {})))
+               for p in ("idli", "dosa", "vada")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+    assert results == {"idli": "IDLI", "dosa": "DOSA", "vada": "VADA"}
+    assert batcher.stats["batches"] == 1
+
+
+def test_submit_racing_close_never_hangs():
+    for _ in range(100):
+        batcher = MicroBatcher(_upper, window_ms=0.5)
+        futures = []
+
+        def submit():
+            for _ in range(20):
+                try:
+                    futures.append(batcher.submit("x", {}))
+                except RuntimeError:
+                    return
+
+        t = threading.Thread(target=submit)
+        t.start()
+        batcher.close()
+        t.join()
+        for fut in futures:
+            # resolved one way or the other, never left pending
+            assert fut.exception(timeout=2) is None or isinstance(fut.exception(), RuntimeError)
+        with pytest.raises(RuntimeError):
+            batcher.submit("late", {})
+
+
+def test_generate_gives_up_after_its_timeout():
+    release = threading.Event()
+
+    def slow(prompts, gen_kwargs):
+        release.wait(2)
+        return prompts
+
+    batcher = MicroBatcher(slow, window_ms=0, timeout_s=0.05)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        batcher.generate("idli", {})
+    assert time.monotonic() - start < 1
+    release.set()
+    batcher.close()
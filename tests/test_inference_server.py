@@ -0,0 +1,132 @@
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from Module.inference_server import (MAX_FRAME_BYTES, OP_GENERATE_BATCH, STATUS_ERROR, STATUS_OK, InferenceServer,
+                                     ProtocolError, RemoteLLM, decode_request, decode_response, encode_request,
+                                     encode_response, parse_address, recv_frame, send_frame)
+from Module.model_pool import ModelPool, UnavailableModel
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class EchoLLM:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._init_error = None if model_name != "missing" else "no weights"
+
+    def available(self):
+        return self._init_error is None
+
+    def generate(self, prompt, **gen_kwargs):
+        return f"{prompt}|{gen_kwargs.get('max_new_tokens')}"
+
+    def generate_batch(self, prompts, **gen_kwargs):
+        return [p[::-1] for p in prompts]
+
+    def count_tokens(self, texts):
+        return [len(t.split()) for t in texts]
+
+
+def _wait_until(check, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def server(tmp_path):
+    srv = InferenceServer(f"unix:{tmp_path}/infer.sock", pool=ModelPool(loader=EchoLLM, retry_backoff_s=0))
+    srv.start()
+    yield srv
+    srv.close()
+
+
+def test_request_and_response_round_trip():
+    body = encode_request(OP_GENERATE_BATCH, "google/flan-t5-base", {"num_beams": 2}, ["dosa", "ऊपर", ""])
+    assert decode_request(body) == (OP_GENERATE_BATCH, "google/flan-t5-base", {"num_beams": 2}, ["dosa", "ऊपर", ""])
+    assert decode_response(encode_response(STATUS_ERROR, ["boom"])) == (STATUS_ERROR, ["boom"])
+    assert decode_response(encode_response(STATUS_OK, [])) == (STATUS_OK, [])
+
+
+def test_frames_over_a_socket():
+    a, b = socket.socketpair()
+    with a, b:
+        send_frame(a, b"hello")
+        send_frame(a, b"")
+        assert recv_frame(b) == b"hello"
+        assert recv_frame(b) == b""
+        a.sendall(b"\x00\x00\x00\x09abc")
+        a.shutdown(socket.SHUT_WR)
+        with pytest.raises(ProtocolError):
+            recv_frame(b)
+        assert recv_frame(b) is None
+
+
+def test_oversized_frame_is_refused():
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall((MAX_FRAME_BYTES + 1).to_bytes(4, "big"))
+        with pytest.raises(ProtocolError):
+            recv_frame(b)
+
+
+def test_parse_address():
+    assert parse_address("unix:/run/km.sock") == (socket.AF_UNIX, "/run/km.sock")
+    assert parse_address("/run/km.sock") == (socket.AF_UNIX, "/run/km.sock")
+    assert parse_address("tcp:127.0.0.1:9000") == (socket.AF_INET, ("127.0.0.1", 9000))
+
+
+def test_remote_model_generates_on_the_server(server):
+    remote = RemoteLLM("m", server.address, timeout_s=5)
+    assert remote.available()
+    assert remote.generate("idli", max_new_tokens=16) == "idli|16"
+    assert remote.generate_batch(["ab", "cd"]) == ["ba", "dc"]
+    assert remote.count_tokens(["soak the rice", "grind"]) == [3, 1]
+    assert server.stats["requests"] == 4
+    remote.close()
+
+
+def test_unavailable_model_on_the_server(server):
+    remote = RemoteLLM("missing", server.address, timeout_s=5)
+    assert not remote.available()
+    with pytest.raises(RuntimeError, match="no weights"):
+        remote.generate("idli")
+
+
+def test_pool_backs_off_when_the_server_dies(tmp_path):
+    address = f"unix:{tmp_path}/crash.sock"
+    cmd = [sys.executable, "-m", "benchmarks.stub_llm", "--serve", address]
+
+    def serve():
+        proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _wait_until(lambda: RemoteLLM("m", address, timeout_s=1).available())
+        return proc
+
+    pool = ModelPool(loader=lambda name: RemoteLLM(name, address, timeout_s=5), retry_backoff_s=0.2)
+    proc = serve()
+    try:
+        llm = pool.get("m")
+        assert llm.generate("Source actions:\n- Soak rice\n\n") == "1. Soak rice\n2. Serve hot."
+
+        proc.terminate()
+        proc.wait(5)
+        with pytest.raises((OSError, ProtocolError)):
+            llm.generate("anything")
+        assert not llm._available
+        assert pool.get("m") is llm  # handed out once more, and marked failed
+        assert isinstance(pool.get("m"), UnavailableModel)
+        assert "m" in pool.snapshot()["unavailable"]
+
+        proc = serve()
+        _wait_until(lambda: pool.get("m").available())
+        assert pool.stats["recoveries"] >= 1
+    finally:
+        proc.terminate()
+        proc.wait(5)
+        pool.clear()
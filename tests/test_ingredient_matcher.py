@@ -0,0 +1,61 @@
+import random
+import re
+
+from Module.ingredient_matcher import AhoCorasick, IngredientMatcher
+
+
+def _naive(terms, text):
+    found = set()
+    for idx, term in enumerate(terms):
+        for m in re.finditer(f"(?={re.escape(term)})", text):
+            found.add((m.start(), idx))
+    return found
+
+
+def test_find_reports_overlapping_occurrences():
+    ac = AhoCorasick(["he", "she", "his", "hers"])
+    assert set(ac.find("ushers")) == {(1, 1), (2, 0), (2, 3)}
+
+
+def test_find_matches_naive_search():
+    rng = random.Random(5)
+    terms = ["ab", "abc", "bca", "c", "aab", "cab"]
+    ac = AhoCorasick(terms)
+    for _ in range(200):
+        text = "".join(rng.choice("abc ") for _ in range(rng.randrange(0, 30)))
+        assert set(ac.find(text)) == _naive(ac.terms, text)
+
+
+def test_scan_separates_substring_and_whole_word_hits():
+    matcher = IngredientMatcher(["Urad Dal", "Rice"])
+    table = matcher.scan(["Soak the rice and urad dal.", "Add ricebran oil", "Grind to a smooth batter"])
+    assert table.lines_with("rice") == [0, 1]
+    assert table.lines_with("rice", whole_word=True) == [0]
+    assert table.covers("Urad Dal")
+    assert table.first("grind") == 2
+    assert table.ingredients_by_line() == {"Urad Dal": [0], "Rice": [0]}
+
+
+def test_multiword_terms_ignore_whitespace_runs():
+    table = IngredientMatcher([]).scan(["Add   soy\tsauce", "soy sauces"])
+    assert table.lines_with("soy sauce", whole_word=True) == [0]
+    assert table.lines_with("soy sauce") == [0, 1]
+
+
+def test_table_tracks_line_edits():
+    matcher = IngredientMatcher(["Rice", "Water"])
+    lines = ["Wash rice", "Boil water", "Add rice to water"]
+    table = matcher.scan(lines)
+
+    lines.insert(0, lines.pop(2))
+    table.move_line(2, 0)
+    table.delete_lines([1])
+    del lines[1]
+    lines[0] = "Add rice"
+    table.update_line(0, lines[0])
+
+    fresh = matcher.scan(lines)
+    for term in ("rice", "water"):
+        assert table.lines_with(term) == fresh.lines_with(term)
+        assert table.lines_with(term, whole_word=True) == fresh.lines_with(term, whole_word=True)
+    assert table.num_lines == len(lines)
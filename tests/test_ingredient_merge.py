@@ -0,0 +1,58 @@
+import pytest
+
+from Module.ingredient_merge import merge_quantities
+from Module.models import Ingredient, Recipe
+from Module.synthesis_trace import SynthesisTrace, tracing
+
+
+def _recipe(*ingredients, servings=1):
+    return Recipe(id="r", title="t", ingredients=[Ingredient(*i) for i in ingredients], steps=[], servings=servings)
+
+
+def _merge(*recipes, servings=1, **kwargs):
+    return merge_quantities(list(recipes), servings, lambda name: name, **kwargs)
+
+
+def test_converts_units_of_one_dimension():
+    merged = _merge(_recipe(("Flour", 0.2, "kg")), _recipe(("Flour", 180, "g")))
+    assert merged == [("Flour", 190.0, "g")]
+
+
+def test_scales_per_serving_and_keeps_shared_unit():
+    merged = _merge(_recipe(("Oil", 2, "tbsp"), servings=2), _recipe(("Oil", 3, "tbsp"), servings=3), servings=4)
+    assert merged == [("Oil", 4.0, "tbsp")]
+
+
+def test_weights_sources():
+    merged = _merge(_recipe(("Sugar", 100, "g")), _recipe(("Sugar", 200, "g")), weights=[3, 1])
+    assert merged == [("Sugar", 125.0, "g")]
+
+
+def test_tie_between_volume_and_weight_converts_by_density():
+    # 6 g of salt at 1.2 g/ml is ~1.01 tsp, not dropped in favour of the first-seen "1 tsp"
+    merged = _merge(_recipe(("Salt", 1, "tsp")), _recipe(("Salt", 6, "g")))
+    assert merged == [("Salt", 1.007, "tsp")]
+
+
+def test_unconvertible_quantity_is_dropped_and_reported():
+    trace = SynthesisTrace()
+    with tracing(trace):
+        merged = _merge(_recipe(("Onion", 2, "pcs")), _recipe(("Onion", 150, "g")), _recipe(("Onion", 100, "g")))
+    assert merged == [("Onion", 125.0, "g")]
+    dropped = [e for e in trace.events if e["decision"] == "dropped_quantity"]
+    assert len(dropped) == 1
+    assert dropped[0]["ingredient"] == "Onion"
+    assert dropped[0]["kept_dimension"] == "g"
+    assert dropped[0]["per_serving"] == 2.0
+
+
+def test_rejects_invalid_servings():
+    with pytest.raises(ValueError):
+        _merge(_recipe(("Rice", 1, "cup"), servings=0))
+
+
+def test_backends_agree():
+    pytest.importorskip("numpy")
+    recipes = [_recipe((f"Item {i}", i + 1, "g"), (f"Item {i + 1}", 2 * i + 1, "kg")) for i in range(80)]
+    weights = [1 + i % 3 for i in range(80)]
+    assert _merge(*recipes, weights=weights, backend="numpy") == _merge(*recipes, weights=weights, backend="python")
@@ -0,0 +1,60 @@
+import random
+
+from Module.near_duplicates import ExactIndex, MinHasher, MinHashLSHIndex, jaccard, make_index
+
+
+def _tokens(*words):
+    return frozenset(words)
+
+
+def test_jaccard():
+    assert jaccard(_tokens("a", "b"), _tokens("b", "c")) == 1 / 3
+    assert jaccard(frozenset(), frozenset()) == 0.0
+
+
+def test_signature_is_stable_across_hashers():
+    tokens = _tokens("soak", "rice", "hours")
+    assert MinHasher(12, seed=7).signature(tokens) == MinHasher(12, seed=7).signature(tokens)
+
+
+def test_lsh_returns_first_kept_match():
+    index = MinHashLSHIndex(bands=32, rows=2)
+    index.add("first", _tokens("soak", "rice", "urad", "dal"))
+    index.add("second", _tokens("soak", "rice", "urad", "dal", "overnight"))
+    assert index.first_match(_tokens("soak", "rice", "urad", "dal")) == "first"
+    assert index.first_match(_tokens("fry", "mustard", "seeds")) is None
+
+
+def test_lsh_remove_drops_key_from_buckets():
+    index = MinHashLSHIndex(bands=16, rows=2)
+    tokens = _tokens("grind", "batter", "smooth")
+    index.add("k", tokens)
+    index.remove("k")
+    assert "k" not in index
+    assert index.candidates(tokens) == set()
+    assert all(not buckets for buckets in index._buckets)
+
+
+def test_lsh_matches_exact_index():
+    rng = random.Random(3)
+    vocab = [f"w{i}" for i in range(20)]
+    steps = [frozenset(rng.sample(vocab, 6)) for _ in range(200)]
+    exact, lsh = ExactIndex(), MinHashLSHIndex()
+    agree = 0
+    for i, tokens in enumerate(steps):
+        want = exact.first_match(tokens)
+        got = lsh.first_match(tokens)
+        # a verified candidate is always a real match, never a false positive
+        if got is not None:
+            assert jaccard(tokens, lsh._keys[got][0]) >= lsh.threshold
+        agree += want == got
+        if want is None:
+            exact.add(str(i), tokens)
+            lsh.add(str(i), tokens)
+    assert agree >= 0.95 * len(steps)
+
+
+def test_make_index_modes():
+    assert isinstance(make_index(10, "exact"), ExactIndex)
+    assert isinstance(make_index(10, "lsh"), MinHashLSHIndex)
+    assert isinstance(make_index(1, "auto"), ExactIndex)
@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+
+from Module.models import Ingredient
+from Module.postprocess_rules import LineTest, RewriteLines, RuleEngine, default_rules
+from Module.synthesis_pipeline import FALLBACK, LLM
+
+
+@pytest.fixture
+def engine():
+    return RuleEngine(default_rules())
+
+
+def _idli_ctx():
+    return SimpleNamespace(merged_ings=[Ingredient("Idli Rice", 2, "cup"), Ingredient("Urad Dal", 1, "cup")])
+
+
+def test_soak_moves_before_grind(engine):
+    lines = ["Grind the rice to a batter.", "Soak the rice for 4 hours."]
+    out = engine.apply("soak_before_grind", lines, path=FALLBACK)
+    assert out == ["Soak the rice for 4 hours.", "Grind the rice to a batter."]
+    assert engine.snapshot()["fired"] == {"soak_before_grind": 1}
+
+
+def test_ferment_moves_before_cooking(engine):
+    lines = ["Steam the idlis.", "Grease the moulds.", "Ferment the batter overnight."]
+    out = engine.apply("order_rules", lines, path=FALLBACK)
+    assert out == ["Ferment the batter overnight.", "Steam the idlis.", "Grease the moulds."]
+
+
+def test_untriggered_rules_leave_the_list_alone(engine):
+    lines = ["Chop the onions.", "Fry the onions."]
+    assert engine.apply("order_rules", lines, path=FALLBACK) == lines
+    assert engine.snapshot()["fired"] == {}
+
+
+def test_soy_dedupe_keeps_last_mention(engine):
+    lines = ["Add vegetables and soy sauce.", "Stir fry for 2 minutes.", "Add soy sauce and toss."]
+    out = engine.apply("finish_rules", lines, path=LLM)
+    assert out == ["Add vegetables.", "Stir fry for 2 minutes.", "Add soy sauce and toss."]
+
+
+def test_idli_rules_only_for_idli_batter(engine):
+    lines = ["Soak rice, urad dal and fenugreek for 4 hours.", "Grind to a smooth batter."]
+    assert engine.apply("finish_rules", lines, ctx=SimpleNamespace(merged_ings=[]), path=LLM) == lines
+    out = engine.apply("finish_rules", lines, ctx=_idli_ctx(), path=LLM)
+    assert out == ["Soak rice, urad dal for 4 hours.",
+                   "Grind to a smooth batter; include fenugreek while grinding; add water as needed to reach a smooth batter."]
+
+
+def test_idli_water_hint_not_repeated(engine):
+    lines = ["Grind with a little water."]
+    assert engine.apply("finish_rules", lines, ctx=_idli_ctx(), path=LLM) == lines
+
+
+def test_rules_respect_their_paths(engine):
+    lines = ["Add vegetables and soy sauce.", "Add soy sauce and toss."]
+    assert engine.apply("finish_rules", lines, path=FALLBACK) == lines
+
+
+def test_disabled_rule_is_skipped(engine):
+    engine.disable("ferment_before_cook")
+    lines = ["Steam the idlis.", "Ferment the batter overnight."]
+    assert engine.apply("order_rules", lines, path=FALLBACK) == lines
+    assert engine.snapshot()["disabled"] == ["ferment_before_cook"]
+    engine.enable("ferment_before_cook")
+    assert engine.apply("order_rules", lines, path=FALLBACK)[0] == "Ferment the batter overnight."
+
+
+def test_unknown_and_duplicate_rules_are_rejected(engine):
+    with pytest.raises(ValueError):
+        engine.disable("no_such_rule")
+    with pytest.raises(ValueError):
+        engine.add_rule(RewriteLines("soy_dedupe", "finish_rules", LineTest(any_of=("soy",)), str.upper))
+    with pytest.raises(ValueError):
+        LineTest()
+
+
+def test_added_rule_joins_its_stage(engine):
+    engine.add_rule(RewriteLines("shout_ghee", "finish_rules", LineTest(any_of=("ghee",), whole_word=True), str.upper),
+                    before="soy_dedupe")
+    assert engine.rules_for("finish_rules")[0].name == "shout_ghee"
+    assert engine.apply("finish_rules", ["Drizzle ghee.", "Serve gheeless."], path=LLM) == ["DRIZZLE GHEE.", "Serve gheeless."]
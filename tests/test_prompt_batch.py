@@ -0,0 +1,92 @@
+import threading
+
+from Module.prompt_batch import NULL_PARTICIPANT, current_prompt_batch, run_batched
+
+
+class FakeLLM:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.batches = []
+        self.singles = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, **gen_kwargs):
+        with self._lock:
+            self.singles.append(prompt)
+        return prompt.upper()
+
+    def generate_batch(self, prompts, **gen_kwargs):
+        if self.fail:
+            raise RuntimeError("model crashed")
+        with self._lock:
+            self.batches.append((sorted(prompts), gen_kwargs))
+        return [p.upper() for p in prompts]
+
+
+class SingleLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, **gen_kwargs):
+        self.calls += 1
+        return prompt[::-1]
+
+
+def _ask(llm, prompt, **gen_kwargs):
+    return lambda: current_prompt_batch().generate(llm, prompt, **gen_kwargs)
+
+
+def test_null_participant_outside_a_batch():
+    assert current_prompt_batch() is NULL_PARTICIPANT
+    assert not current_prompt_batch().enabled
+    assert current_prompt_batch().generate(SingleLLM(), "abc") == "cba"
+
+
+def test_all_prompts_run_as_one_batch():
+    llm = FakeLLM()
+    results = run_batched([_ask(llm, f"dish {i}", max_new_tokens=8) for i in range(5)])
+    assert results == [f"DISH {i}" for i in range(5)]
+    assert llm.batches == [(sorted(f"dish {i}" for i in range(5)), {"max_new_tokens": 8})]
+    assert llm.singles == []
+
+
+def test_participants_without_a_prompt_release_the_barrier():
+    llm = FakeLLM()
+
+    def boom():
+        raise ValueError("no sources")
+
+    results = run_batched([_ask(llm, "idli"), lambda: "cached", boom])
+    assert results[:2] == ["IDLI", "cached"]
+    assert isinstance(results[2], ValueError)
+    assert llm.batches == [(["idli"], {})]
+
+
+def test_generation_settings_split_the_batch():
+    llm = FakeLLM()
+    run_batched([_ask(llm, "a", num_beams=1), _ask(llm, "b", num_beams=4), _ask(llm, "c", num_beams=1)])
+    assert sorted(llm.batches, key=lambda b: b[1]["num_beams"]) == [(["a", "c"], {"num_beams": 1}),
+                                                                    (["b"], {"num_beams": 4})]
+
+
+def test_model_without_batching_is_called_per_prompt():
+    llm = SingleLLM()
+    assert run_batched([_ask(llm, "ab"), _ask(llm, "cd")]) == ["ba", "dc"]
+    assert llm.calls == 2
+
+
+def test_model_error_reaches_every_participant():
+    results = run_batched([_ask(FakeLLM(fail=True), p) for p in ("a", "b")])
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_second_prompt_of_a_participant_goes_straight_to_the_model():
+    llm = FakeLLM()
+
+    def two_prompts():
+        batch = current_prompt_batch()
+        return batch.generate(llm, "first"), batch.generate(llm, "second")
+
+    assert run_batched([two_prompts, _ask(llm, "other")]) == [("FIRST", "SECOND"), "OTHER"]
+    assert llm.singles == ["second"]
+    assert llm.batches == [(["first", "other"], {})]
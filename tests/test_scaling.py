@@ -0,0 +1,65 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from Module import scaling
+
+
+def _version(base_servings, confidence=0.0, submitted_at=None, name=None):
+    return SimpleNamespace(name=name, base_servings=base_servings, ai_confidence_score=confidence,
+                           submitted_at=submitted_at)
+
+
+@pytest.fixture(autouse=True)
+def policy(monkeypatch):
+    monkeypatch.setattr(scaling, "SCALE_ON_READ", True)
+    monkeypatch.setattr(scaling, "SCALE_MAX_FACTOR", 4.0)
+
+
+@pytest.mark.parametrize("base, servings, allowed", [
+    (2, 8, True),
+    (8, 2, True),
+    (2, 9, False),
+    (9, 2, False),
+    (4, 4, True),
+    (0, 4, False),
+    (None, 4, False),
+    (4, 0, False),
+])
+def test_allows_scaling_within_the_factor_both_ways(base, servings, allowed):
+    assert scaling.allows_scaling(base, servings) is allowed
+
+
+def test_scale_on_read_can_be_switched_off(monkeypatch):
+    monkeypatch.setattr(scaling, "SCALE_ON_READ", False)
+    assert not scaling.allows_scaling(4, 4)
+    assert scaling.best_version([_version(4)], 4) is None
+
+
+def test_best_version_is_closest_by_factor():
+    versions = [_version(2, name="two"), _version(8, name="eight"), _version(5, name="five")]
+    assert scaling.best_version(versions, 4).name == "five"
+    # 2 -> 4 and 8 -> 4 are equally far; the tie goes to confidence, then recency
+    versions = [_version(2, confidence=3.0, name="two"), _version(8, confidence=4.0, name="eight")]
+    assert scaling.best_version(versions, 4).name == "eight"
+    older, newer = datetime(2026, 1, 1), datetime(2026, 6, 1)
+    versions = [_version(2, submitted_at=older, name="old"), _version(8, submitted_at=newer, name="new"),
+                _version(2, name="undated")]
+    assert scaling.best_version(versions, 4).name == "new"
+
+
+def test_best_version_none_when_too_far():
+    assert scaling.best_version([_version(1), _version(21)], 5) is None
+
+
+def test_scaled_ingredients():
+    rows = [SimpleNamespace(name="Rice", quantity=2, unit="cup"),
+            SimpleNamespace(name="Salt", quantity=None, unit="to taste"),
+            SimpleNamespace(name="Urad Dal", quantity=1, unit="cup")]
+    assert scaling.scaled_ingredients(rows, 3, 4) == [
+        {"name": "Rice", "quantity": 2.667, "unit": "cup"},
+        {"name": "Salt", "quantity": None, "unit": "to taste"},
+        {"name": "Urad Dal", "quantity": 1.333, "unit": "cup"},
+    ]
+    assert scaling.scaled_ingredients(rows[:1], 0, 4) == [{"name": "Rice", "quantity": 2, "unit": "cup"}]
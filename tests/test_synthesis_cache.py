@@ -0,0 +1,152 @@
+import contextlib
+import io
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from Module import synthesis_cache
+from Module.database import Base
+from Module.models import Ingredient, Recipe
+from Module.synthesis_cache import SynthesisCache, synthesis_cache_key
+from Module.synthesis_deadline import DEADLINE_METHOD
+
+
+def _source(recipe_id, version_id):
+    return Recipe(id=recipe_id, title="Idli", ingredients=[], steps=[], servings=2,
+                  metadata={"version_id": version_id})
+
+
+def _result(title="Idli"):
+    return Recipe(id="synth", title=title, ingredients=[Ingredient("Rice", 2, "cup")], steps=["Soak rice."],
+                  servings=4, metadata={"synthesis_method": "llm"})
+
+
+class Compute:
+    def __init__(self, title="Idli"):
+        self.title = title
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return _result(f"{self.title} {self.calls}")
+
+
+SOURCES = [_source("r1", "v1"), _source("r2", "v2")]
+BASE = dict(servings=4, reorder=True, model_name="flan", weights=[0.9, 0.4],
+            profile=[Ingredient("Rice", 1.5, "cup")])
+
+
+def _key(sources=SOURCES, **changes):
+    return synthesis_cache_key(sources, **{**BASE, **changes})
+
+
+def test_same_request_is_a_hit():
+    cache, compute = SynthesisCache(), Compute()
+    first = cache.get_or_compute(_key(), ["r1", "r2"], compute)
+    second = cache.get_or_compute(_key(sources=list(reversed(SOURCES)), weights=[0.4, 0.9]), ["r1", "r2"], compute)
+    assert compute.calls == 1
+    assert second == first and second is not first  # callers get copies
+    assert cache.stats["hits"] == 1
+
+
+@pytest.mark.parametrize("changes", [
+    {"sources": [_source("r1", "v1"), _source("r2", "v3")]},
+    {"servings": 5},
+    {"reorder": False},
+    {"model_name": "flan-int8"},
+    {"weights": [0.9, 0.5]},
+    {"weights": None},
+    {"profile": [Ingredient("Rice", 1.6, "cup")]},
+    {"profile": None},
+])
+def test_any_key_field_changed_is_a_miss(changes):
+    cache, compute = SynthesisCache(), Compute()
+    cache.get_or_compute(_key(), ["r1", "r2"], compute)
+    cache.get_or_compute(_key(**changes), ["r1", "r2"], compute)
+    assert compute.calls == 2
+
+
+def test_sources_without_a_version_are_not_cached():
+    assert _key(sources=[_source("r1", None)]) is None
+    cache, compute = SynthesisCache(), Compute()
+    cache.get_or_compute(None, ["r1"], compute)
+    cache.get_or_compute(None, ["r1"], compute)
+    assert compute.calls == 2 and len(cache) == 0
+
+
+def test_lru_eviction():
+    cache = SynthesisCache(max_size=2)
+    for servings in (1, 2, 3):
+        cache.put(_key(servings=servings), ["r1"], _result())
+    assert len(cache) == 2 and cache.stats["evictions"] == 1
+    compute = Compute()
+    cache.get_or_compute(_key(servings=1), ["r1"], compute)
+    assert compute.calls == 1
+
+
+def test_deadline_fallback_is_not_stored():
+    cache = SynthesisCache()
+    fallback = _result()
+    fallback.metadata["synthesis_method"] = DEADLINE_METHOD
+    cache.put(_key(), ["r1"], fallback)
+    assert len(cache) == 0
+
+
+def test_invalidation_drops_entries_of_the_recipe():
+    cache = SynthesisCache()
+    cache.put(_key(), ["r1", "r2"], _result())
+    cache.put(_key(sources=[_source("r3", "v9")]), ["r3"], _result())
+    assert cache.invalidate_recipe("r2") == 1
+    assert len(cache) == 1 and cache.invalidate_recipe("r2") == 0
+
+
+def test_approving_a_version_invalidates(monkeypatch):
+    from Module.repository_postgres import PostgresRecipeRepository
+
+    cache = SynthesisCache()
+    monkeypatch.setattr(synthesis_cache, "_cache", cache)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    repo = PostgresRecipeRepository(sessionmaker(bind=engine)())
+    with contextlib.redirect_stdout(io.StringIO()):
+        recipe = repo.create_recipe("Idli", [Ingredient("Rice", 2, "cup")], ["Soak rice."], 2)
+        cache.put(_key(sources=[recipe]), [recipe.id], _result())
+        recipe.approved = True
+        repo.update(recipe)
+    assert len(cache) == 0
+
+
+def test_expired_entry_served_stale_with_one_refresh():
+    cache = SynthesisCache(ttl_s=0.05, stale_while_revalidate_s=10)
+    cache.get_or_compute(_key(), ["r1"], Compute("old"))
+    time.sleep(0.06)
+
+    release = threading.Event()
+    refresh = Compute("new")
+
+    def slow_refresh():
+        release.wait(2)
+        return refresh()
+
+    stale = [cache.get_or_compute(_key(), ["r1"], slow_refresh) for _ in range(3)]
+    assert [r.title for r in stale] == ["old 1"] * 3
+    assert cache.stats["stale_hits"] == 3
+    release.set()
+    deadline = time.monotonic() + 2
+    while cache._entries[_key()].recipe.title != "new 1":
+        assert time.monotonic() < deadline, "background refresh did not store its result"
+        time.sleep(0.005)
+    assert refresh.calls == 1
+    assert cache.get_or_compute(_key(), ["r1"], Compute("unused")).title == "new 1"
+
+
+def test_expired_entry_past_the_grace_period_is_recomputed():
+    cache, compute = SynthesisCache(ttl_s=0.01), Compute()
+    cache.get_or_compute(_key(), ["r1"], compute)
+    time.sleep(0.02)
+    cache.get_or_compute(_key(), ["r1"], compute)
+    assert compute.calls == 2 and cache.stats["misses"] == 2
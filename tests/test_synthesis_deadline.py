@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from Module import synthesis_deadline
+from Module.synthesis_deadline import DEADLINE_METHOD, is_deadline_fallback, race
+from Module.synthesis_trace import SynthesisTrace, current_trace, tracing
+
+
+@pytest.fixture(autouse=True)
+def deadline_pool(monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-deadline")
+    monkeypatch.setattr(synthesis_deadline, "_executor", executor)
+    monkeypatch.setattr(synthesis_deadline, "stats", {k: 0 for k in synthesis_deadline.stats})
+    monkeypatch.setattr(synthesis_deadline, "DEADLINE_MAX_LATE", 1)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def _wait_for(check, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not check():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_model_within_budget_wins():
+    fallback_calls = []
+    result, missed = race(lambda: "llm", lambda: fallback_calls.append(1) or "rules", budget_ms=1000)
+    assert (result, missed) == ("llm", False)
+    assert fallback_calls == [1]  # the speculative result is computed either way
+    assert synthesis_deadline.stats["met"] == 1
+
+
+def test_miss_returns_fallback_and_delivers_late_result():
+    release = threading.Event()
+    late = []
+    result, missed = race(lambda: release.wait(2) and "llm", lambda: "rules", budget_ms=20, on_late=late.append)
+    assert (result, missed) == ("rules", True)
+    assert synthesis_deadline.stats["late_running"] == 1
+    release.set()
+    _wait_for(lambda: late == ["llm"])
+    assert synthesis_deadline.stats["late_running"] == 0
+    assert synthesis_deadline.stats["late_done"] == 1
+
+
+def test_model_error_within_budget_is_raised():
+    def broken():
+        raise RuntimeError("model crashed")
+
+    with pytest.raises(RuntimeError, match="model crashed"):
+        race(broken, lambda: "rules", budget_ms=1000)
+
+
+def test_failed_fallback_waits_for_the_model():
+    def broken():
+        raise ValueError("no sources")
+
+    result, missed = race(lambda: time.sleep(0.05) or "llm", broken, budget_ms=1)
+    assert (result, missed) == ("llm", False)
+
+
+def test_queued_generation_is_cancelled_on_a_miss(deadline_pool):
+    release = threading.Event()
+    deadline_pool.submit(release.wait, 2)  # the only pool thread is busy
+    started = []
+    result, missed = race(lambda: started.append(1) or "llm", lambda: "rules", budget_ms=10)
+    release.set()
+    deadline_pool.shutdown(wait=True)
+    assert (result, missed) == ("rules", True)
+    assert started == []
+    assert synthesis_deadline.stats["cancelled"] == 1
+    assert synthesis_deadline.stats["late_running"] == 0
+
+
+def test_sheds_to_the_fallback_while_too_many_run_late():
+    release = threading.Event()
+    race(lambda: release.wait(2) and "llm", lambda: "rules", budget_ms=10)
+    started = []
+    result, missed = race(lambda: started.append(1) or "llm", lambda: "rules", budget_ms=1000)
+    release.set()
+    assert (result, missed) == ("rules", True)
+    assert started == []
+    assert synthesis_deadline.stats["shed"] == 1
+
+
+def test_generation_runs_in_the_callers_context():
+    trace = SynthesisTrace()
+    with tracing(trace):
+        result, _ = race(lambda: current_trace(), lambda: None, budget_ms=1000)
+    assert result is trace
+
+
+def test_is_deadline_fallback():
+    assert is_deadline_fallback(SimpleNamespace(metadata={"synthesis_method": DEADLINE_METHOD}))
+    assert not is_deadline_fallback(SimpleNamespace(metadata={"synthesis_method": "llm"}))
+    assert not is_deadline_fallback(SimpleNamespace(metadata=None))
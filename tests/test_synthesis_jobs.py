@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from Module import synthesis_jobs
+from Module.synthesis_jobs import DONE, FAILED, QueueFull, SynthesisJobQueue
+
+
+def _wait(job, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, f"job {job.job_id} still {job.status}"
+        time.sleep(0.005)
+    return job
+
+
+def test_runs_jobs_and_records_failures():
+    jobs = SynthesisJobQueue(workers=2)
+    ok = _wait(jobs.submit(lambda a, b=0: a + b, 2, b=3, owner="u1"))
+    assert (ok.status, ok.result, ok.owner) == (DONE, 5, "u1")
+    assert ok.created_at <= ok.started_at <= ok.finished_at
+    assert ok.finished_at.utcoffset().total_seconds() == 5.5 * 3600
+
+    def boom():
+        raise ValueError("bad dish")
+
+    failed = _wait(jobs.submit(boom))
+    assert (failed.status, failed.error) == (FAILED, "bad dish")
+    assert jobs.get(failed.job_id) is failed
+
+
+def test_refuses_jobs_beyond_capacity():
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(2)
+
+    jobs = SynthesisJobQueue(workers=1, max_queued=1)
+    running = jobs.submit(block)
+    assert started.wait(2)
+    queued = jobs.submit(block)
+    with pytest.raises(QueueFull):
+        jobs.submit(block)
+    assert jobs.stats["rejected"] == 1
+    release.set()
+    _wait(running), _wait(queued)
+    assert jobs.snapshot()["jobs"] == {DONE: 2}
+
+
+def test_sweep_forgets_expired_and_oldest_jobs():
+    jobs = SynthesisJobQueue(workers=1, max_kept=3)
+    done = [_wait(jobs.submit(int, i)) for i in range(6)]
+    assert jobs.get(done[0].job_id) is None
+    assert [jobs.get(j.job_id) for j in done[3:]] == done[3:]
+
+    jobs.ttl_s = 0
+    time.sleep(0.01)
+    assert jobs.get(done[-1].job_id) is None
+    assert jobs.stats["expired"] == 6
+
+
+def test_sweep_while_a_job_finishes(monkeypatch):
+    release = threading.Event()
+    finishing = threading.Event()
+    polled = threading.Event()
+    clock = synthesis_jobs.get_india_time
+
+    def slow_clock():
+        # the worker stamping finished_at waits until the test has polled
+        if finishing.is_set() and threading.current_thread().name.startswith("synthesis-job"):
+            polled.wait(2)
+        return clock()
+
+    def fn():
+        release.wait(2)
+        finishing.set()
+        return "ok"
+
+    monkeypatch.setattr(synthesis_jobs, "get_india_time", slow_clock)
+    jobs = SynthesisJobQueue(workers=1, max_kept=0)
+    job = jobs.submit(fn)
+    release.set()
+    assert finishing.wait(2)
+    deadline = time.monotonic() + 0.2
+    while time.monotonic() < deadline:
+        seen = jobs.get(job.job_id)
+        assert seen is job
+        assert job.status not in (DONE, FAILED) or job.finished_at is not None
+    polled.set()
+    _wait(job)
+    assert (job.status, job.result) == (DONE, "ok")
+    assert jobs.get(job.job_id) is None